@@ -18,7 +18,7 @@ class Deploy:
     """
 
     def __init__(self, configure=False, execute_only=True, backup=False, sync_log=False, start_session=True, tar=False,
-                 exam=False):
+                 exam=False, full=False, multiplex=True, bytecode=False):
         """
         Initializes Deploy-Script, creates all necessary folders and files, loads environment defaults
         :param configure: bool
@@ -28,6 +28,9 @@ class Deploy:
         :param start_session: bool
         :param tar: bool
         :param exam: bool
+        :param full: bool
+        :param multiplex: bool
+        :param bytecode: bool
         """
         # Flags and variables setup
         self.configure = configure
@@ -37,6 +40,9 @@ class Deploy:
         self.start_session = start_session
         self.tar = tar
         self.exam = exam
+        self.full = full
+        self.multiplex = multiplex
+        self.bytecode = bytecode
         self.settings = dict()
 
         # Path and File setup
@@ -62,34 +68,55 @@ class Deploy:
                              self.base_path,
                              self.bin_path,
                              self.settings,
-                             self.exam)
+                             self.exam,
+                             self.multiplex)
         else:
             system = Unix(self.configure,
                           self.base_path,
                           self.bin_path,
                           self.settings,
-                          self.exam)
+                          self.exam,
+                          self.multiplex)
 
         try:
             if self.backup:
-                system.backup()
+                self.__step('backup', system.backup)
                 return
 
             if self.sync_log:
-                system.sync_log()
+                self.__step('sync log', system.sync_log)
                 return
 
             if self.execute_only:
-                if not self.tar or not system.copy_files_tar():
-                    system.copy_files()
+                if self.bytecode:
+                    self.__step('compile', system.build_bytecode)
+
+                copied = self.tar and self.__step('copy (tar)', system.copy_files_tar)
+                # exam mode replaces src on the brick, only a full copy is safe there
+                if not copied and not self.full and not self.exam:
+                    copied = self.__step('copy (changed files)', system.sync_files)
+                if not copied:
+                    self.__step('copy (all files)', system.copy_files)
 
             if self.start_session:
-                system.start_session()
+                self.__step('session', system.start_session)
         finally:
             system.cleanup()
 
         return
 
+    def __step(self, name, action, *args):
+        """
+        Runs one step of the deploy and prints how long it took
+        :param name: String
+        :param action: Callable
+        :return: result of the action
+        """
+        start_time = time.monotonic()
+        result = action(*args)
+        print('[{}] {:.2f} s'.format(name, time.monotonic() - start_time))
+        return result
+
     def __setup_deploy(self):
         """
         Creates or updates Deploy-Script configuration
@@ -130,6 +157,13 @@ if __name__ == '__main__':
         default=False)
     parser.add_argument(
         "-t", "--tar", help='Use the tar method to copy files (implies -r)', action='store_true', default=False)
+    parser.add_argument(
+        '-f', '--full', help='Copy all files instead of only the changed ones', action='store_true', default=False)
+    parser.add_argument(
+        '-n', '--no-multiplex', help='Open a new SSH connection for every step', action='store_true', default=False)
+    parser.add_argument(
+        '-p', '--precompile', help='Ship bytecode compiled for the Python version of the brick', action='store_true',
+        default=False)
     parser.add_argument(
         '-E', '--exam', help='Run in exam mode (clean src before executing)', action='store_true', default=False)
     args = parser.parse_args()
@@ -139,7 +173,8 @@ if __name__ == '__main__':
     try:
         print('If you need to change the IP address or your underlying OS, please run\n\t./deploy.py -c')
         deploy = Deploy(args.configure, args.execute_only, args.backup, args.sync_log, not args.reload and not args.tar,
-                        args.tar, args.exam)
+                        args.tar, args.exam, args.full,
+                        not args.no_multiplex, args.precompile)
         deploy.routine()
     except Exception as e:
         print(e)
@@ -4,42 +4,145 @@ import os
 import subprocess
 import tempfile
 import shutil
+import sys
 import io
 import os.path
 import socket
 import uuid
-from tarfile import TarFile
+import hashlib
+import json
+import shlex
+import time
+import zlib
+from tarfile import TarFile, TarInfo
 from pathlib import Path
 
 SERVER_HOST = "localhost"
 SERVER_PORT = 3838
 
+# Hashes of the deployed files, stored in the src folder on the brick
+MANIFEST = ".deploy-manifest.json"
 
-def should_ignore(name):
+# Prints "major.minor" and the bytecode magic number of a Python interpreter
+PYTHON_INFO = "import importlib.util, sys; print('%d.%d' % sys.version_info[:2], importlib.util.MAGIC_NUMBER.hex())"
+
+# Log files synchronized from the brick
+LOG_PATTERNS = ["*.log", "*.rlog"]
+# Inode of every synchronized log file on the brick, stored in the local logs folder
+LOG_STATE = ".sync-state.json"
+
+
+def should_ignore(name, bytecode=False):
     """
     Returns True if the given name (directory or file) should not be copied.
     :param name: String
+    :param bytecode: bool, copy the python cache (only of a bytecode bundle built for the brick)
     :return: bool
     """
 
-    # Ignore python virtual envs or the python cache
-    if name in ["venv", "__pycache__"]:
+    # Ignore python virtual envs
+    if name == "venv":
         return True
 
-    # Ignore bytecode files
-    if name.endswith(".pyc"):
-        return True
+    # Ignore the python cache and bytecode files
+    if name == "__pycache__" or name.endswith(".pyc"):
+        return not bytecode
 
     # Copy everything else
     return False
 
 
+def build_manifest(src_path, bytecode=False):
+    """
+    Hashes all files that would be copied to the brick
+    :param src_path: Pathlib
+    :param bytecode: bool, see should_ignore
+    :return: Dict, SHA-256 per file path relative to src_path
+    """
+    manifest = {}
+
+    for root, dirs, files in os.walk(str(src_path)):
+        dirs[:] = sorted(name for name in dirs if not should_ignore(name, bytecode))
+        for name in sorted(files):
+            if should_ignore(name, bytecode) or name == MANIFEST:
+                continue
+            path = Path(root) / name
+            with path.open("rb") as f:
+                manifest[path.relative_to(src_path).as_posix()] = hashlib.sha256(f.read()).hexdigest()
+
+    return manifest
+
+
+def find_interpreter(version, magic):
+    """
+    Finds a local Python that writes bytecode the brick can load
+    :param version: String, "major.minor" of the brick
+    :param magic: String, hex of the bytecode magic number of the brick
+    :return: String, path of the interpreter or None
+    """
+    candidates = [sys.executable, shutil.which("python" + version), shutil.which("python3")]
+
+    for candidate in candidates:
+        if candidate is None:
+            continue
+        result = subprocess.run([candidate, '-c', PYTHON_INFO], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode == 0 and result.stdout.decode().split() == [version, magic]:
+            return candidate
+
+    return None
+
+
+def verify_bytecode(path, magic):
+    """
+    Checks that every bytecode file of a bundle has the magic number of the brick
+    :param path: Pathlib
+    :param magic: String, hex of the bytecode magic number
+    :return: bool
+    """
+    for pyc in path.rglob("*.pyc"):
+        with pyc.open("rb") as f:
+            header = f.read(4)
+        if header.hex() != magic:
+            return False
+    return True
+
+
+class SocketWriter:
+    """
+    File-like object that sends everything written to a socket and counts the bytes
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sent = 0
+
+    def write(self, data):
+        self.sock.sendall(data)
+        self.sent += len(data)
+        return len(data)
+
+
+def diff_manifest(local, remote):
+    """
+    Compares the local files against the manifest of the last deploy
+    :param local: Dict
+    :param remote: Dict
+    :return: Tuple, changed or new files and deleted files
+    """
+    changed = [name for name, digest in local.items() if remote.get(name) != digest]
+    deleted = [name for name in remote if name not in local]
+    return changed, deleted
+
+
 class Generic:
     """
     Generic parts of the deploy class that apply to all systems
     """
 
-    def __init__(self, configure, base_path, bin_path, settings, exam):
+    # OpenSSH supports connection sharing (ControlMaster) on this system
+    MULTIPLEX_SUPPORTED = True
+
+    def __init__(self, configure, base_path, bin_path, settings, exam, multiplex=True):
         """
         Initializes deploy class and runs setup if necessary
         :param configure: bool
@@ -47,6 +150,7 @@ class Generic:
         :param bin_path: Pathlib
         :param settings: Dict
         :param exam: bool
+        :param multiplex: bool, run all ssh and scp calls over one shared connection
         """
         # Variables setup
         self.base_path = base_path
@@ -60,9 +164,17 @@ class Generic:
         self.tempdir_ssh_pub = Path(self.tempdir.name) / "brick_id_rsa.pub"
         self.tempdir_src = Path(self.tempdir.name) / "src"
         self.tempdir_trigger = Path(self.tempdir.name) / ".trigger"
+        # socket of the shared connection, kept short because of the length limit of unix sockets
+        self.tempdir_control = Path(self.tempdir.name) / "cm"
+        # set once a call may have opened the shared connection
+        self.multiplex = False
+        self.multiplex_requested = multiplex and self.MULTIPLEX_SUPPORTED
 
         # Path setup
         self.src_path = self.base_path.joinpath(self.base_path.parent, 'src')
+        # what is deployed, src or the bytecode bundle built from it
+        self.deploy_path = self.src_path
+        self.bytecode = False
         self.log_path = self.base_path.joinpath(self.base_path.parent, 'logs')
 
         if configure or not self.ssh_key.exists():
@@ -125,6 +237,37 @@ class Generic:
         print('Try to log into the brick:')
         print('\tssh -i {} robot@{}'.format(str(self.ssh_key), self.settings['ip']))
 
+    def multiplex_options(self):
+        """
+        Options for ssh and scp to share one connection: the first call opens it and keeps it open
+        in the background, all following calls skip the TCP and SSH handshake.
+        Deploys without any ssh call (tar) never open it.
+        :return: List
+        """
+        if not self.multiplex_requested:
+            return []
+
+        self.multiplex = True
+        return ['-o', 'ControlMaster=auto',
+                '-o', 'ControlPath={}'.format(str(self.tempdir_control)),
+                '-o', 'ControlPersist=yes']
+
+    def close_connection(self):
+        """
+        Closes the shared connection if a call opened it
+        :return: void
+        """
+        if not self.multiplex:
+            return
+
+        subprocess.run(
+            ['ssh',
+             '-o', 'ControlPath={}'.format(str(self.tempdir_control)),
+             '-O', 'exit',
+             'robot@{}'.format(self.settings['ip'])
+             ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.multiplex = False
+
     def backup(self):
         """
         Backup existing files on the brick
@@ -137,12 +280,62 @@ class Generic:
             ['ssh',
              '-i', str(self.tempdir_ssh_key),
              '-o', 'StrictHostKeyChecking=no',
+             ] + self.multiplex_options() + [
              'robot@{}'.format(self.settings['ip']),
              'robolab-backup'
              ])
 
         print('Done.')
 
+    def build_bytecode(self):
+        """
+        Compiles src for the Python version of the brick into a bundle that is deployed instead of src,
+        keeps deploying the plain source if no local interpreter writes matching bytecode
+        :return: bool
+        """
+        print('Compiling bytecode for the brick...')
+
+        result = subprocess.run(
+            ['ssh',
+             '-i', str(self.tempdir_ssh_key),
+             '-o', 'IdentitiesOnly=yes',
+             '-o', 'StrictHostKeyChecking=no',
+             ] + self.multiplex_options() + [
+             'robot@{}'.format(self.settings['ip']),
+             'python3 -c {}'.format(shlex.quote(PYTHON_INFO))
+             ], stdout=subprocess.PIPE)
+        info = result.stdout.decode().split()
+        if result.returncode != 0 or len(info) != 2:
+            print('Could not ask the brick for its Python version, deploying source only.')
+            return False
+        version, magic = info
+
+        interpreter = find_interpreter(version, magic)
+        if interpreter is None:
+            print('No local Python {} found, deploying source only.'.format(version))
+            return False
+
+        bundle = Path(self.tempdir.name) / "bundle" / "src"
+        shutil.copytree(str(self.src_path), str(bundle), ignore=lambda src, names: [
+            name for name in names if should_ignore(name)])
+
+        # Python 3.5 on the brick validates bytecode by the modification time and size of the source,
+        # every copy method keeps the modification time of the files; hash based bytecode exists since 3.7
+        invalidation = []
+        if tuple(int(part) for part in version.split(".")) >= (3, 7):
+            invalidation = ['--invalidation-mode', 'checked-hash']
+        result = subprocess.run([interpreter, '-m', 'compileall', '-q'] + invalidation +
+                                ['-d', '/home/robot/src', str(bundle)])
+
+        if result.returncode != 0 or not verify_bytecode(bundle, magic):
+            print('Bytecode does not match Python {} on the brick, deploying source only.'.format(version))
+            return False
+
+        self.deploy_path = bundle
+        self.bytecode = True
+        print('Done. Bytecode for Python {} by {}.'.format(version, interpreter))
+        return True
+
     def copy_files(self):
         """
         Copy local files to brick
@@ -157,10 +350,13 @@ class Generic:
             :param names: String
             :return: List
             """
-            return [name for name in names if should_ignore(name)]
+            return [name for name in names if should_ignore(name, self.bytecode)]
 
         # Copy files into temporary directory first
-        shutil.copytree(str(self.src_path), str(self.tempdir_src), ignore=filter)
+        shutil.copytree(str(self.deploy_path), str(self.tempdir_src), ignore=filter)
+        # the next incremental sync starts from this copy
+        with (self.tempdir_src / MANIFEST).open("w") as f:
+            json.dump(build_manifest(self.deploy_path, self.bytecode), f)
 
         # Connect with SSH-PubKey and copy files
         subprocess.run(
@@ -168,7 +364,9 @@ class Generic:
              '-i', str(self.tempdir_ssh_key),
              '-o', 'IdentitiesOnly=yes',
              '-o', 'StrictHostKeyChecking=no',
-             '-r', "src",
+             ] + self.multiplex_options() + [
+             # keep the modification times, the bytecode is validated by the one of its source
+             '-p', '-r', "src",
              # this file must be copied last, it triggers the reloader on the brick
              ".trigger",
              'robot@{}:/home/robot/'.format(self.settings['ip'])
@@ -178,12 +376,10 @@ class Generic:
 
     def copy_files_tar(self):
         """
-        Copy local files to brick using tar
-        :return: void
+        Copy local files to brick using tar, the archive is streamed to the socket while it is written
+        :return: bool
         """
         print('Copying new files with tar method...')
-        out_stream = io.BytesIO(bytearray())
-        tarfile = TarFile(fileobj=out_stream, mode="w")
 
         def filter(tar_info):
             """
@@ -194,28 +390,110 @@ class Generic:
             # set owner to robot user/group
             tar_info.uid = 1000
             tar_info.gid = 1000
-            if should_ignore(os.path.basename(tar_info.name)):
+            if should_ignore(os.path.basename(tar_info.name), self.bytecode):
                 return None
 
             print(tar_info.name)
             return tar_info
 
-        tarfile.add(self.src_path, "src", filter=filter)
-        tarfile.close()
+        start_time = time.monotonic()
 
         try:
             with socket.socket() as s:
                 s.connect((SERVER_HOST, SERVER_PORT))
-                s.sendall(out_stream.getbuffer())
+                out_stream = SocketWriter(s)
+
+                with TarFile.open(fileobj=out_stream, mode="w|") as tarfile:
+                    tarfile.add(self.deploy_path, "src", filter=filter)
+
+                    manifest = json.dumps(build_manifest(self.deploy_path, self.bytecode)).encode()
+                    tar_info = TarInfo("src/" + MANIFEST)
+                    tar_info.size = len(manifest)
+                    tar_info.mtime = time.time()
+                    tar_info.uid = 1000
+                    tar_info.gid = 1000
+                    tarfile.addfile(tar_info, io.BytesIO(manifest))
+
+                archive_size = tarfile.offset
                 s.close()
         except (ConnectionError, OSError):
             return False
 
+        elapsed = time.monotonic() - start_time
+        print('Done. {} bytes sent ({} bytes archive) in {:.2f} s, {:.0f} kB/s.'.format(
+            out_stream.sent, archive_size, elapsed, out_stream.sent / 1000 / elapsed))
+
+        return True
+
+    def sync_files(self):
+        """
+        Copy only the files changed since the last deploy to the brick,
+        the manifest of the last deploy is stored on the brick
+        :return: bool, False if the brick could not be reached
+        """
+        print('Copying changed files...')
+
+        ssh = ['ssh',
+               '-i', str(self.tempdir_ssh_key),
+               '-o', 'IdentitiesOnly=yes',
+               '-o', 'StrictHostKeyChecking=no',
+               ] + self.multiplex_options() + ['robot@{}'.format(self.settings['ip'])]
+
+        local = build_manifest(self.deploy_path, self.bytecode)
+
+        # a missing or broken manifest means that everything has to be copied
+        result = subprocess.run(ssh + ['cat /home/robot/src/{} 2>/dev/null || true'.format(MANIFEST)],
+                                stdout=subprocess.PIPE)
+        if result.returncode != 0:
+            return False
+        try:
+            remote = json.loads(result.stdout.decode() or "{}")
+        except ValueError:
+            remote = {}
+
+        changed, deleted = diff_manifest(local, remote)
+        for name in changed:
+            print('\t+ ' + name)
+        for name in deleted:
+            print('\t- ' + name)
+
+        out_stream = io.BytesIO(bytearray())
+        tarfile = TarFile(fileobj=out_stream, mode="w")
+
+        def add(name, data, mtime=None):
+            tar_info = TarInfo(name)
+            tar_info.size = len(data)
+            tar_info.mtime = time.time() if mtime is None else mtime
+            tar_info.uid = 1000
+            tar_info.gid = 1000
+            tarfile.addfile(tar_info, io.BytesIO(data))
+
+        for name in changed:
+            path = self.deploy_path.joinpath(name)
+            with path.open("rb") as f:
+                # the modification time of the source validates its bytecode on the brick
+                add("src/" + name, f.read(), path.stat().st_mtime)
+        add("src/" + MANIFEST, json.dumps(local).encode())
+        # tar extracts in order, this file must be written last, it triggers the reloader on the brick
+        add(".trigger", b"")
+        tarfile.close()
+
+        command = 'cd /home/robot && tar -xf -'
+        if deleted:
+            command = 'cd /home/robot && rm -f -- {} && tar -xf -'.format(
+                ' '.join(shlex.quote("src/" + name) for name in deleted))
+
+        result = subprocess.run(ssh + [command], input=out_stream.getvalue())
+        if result.returncode != 0:
+            return False
+
+        print('Done. {} changed, {} deleted, {} unchanged.'.format(
+            len(changed), len(deleted), len(local) - len(changed)))
         return True
 
     def sync_log(self):
         """"
-        Sync tmux log files from the brick
+        Sync tmux log files from the brick, only the bytes appended since the last sync are fetched
         :return: void
         """
         print('Synchronizing log files...')
@@ -229,17 +507,103 @@ class Generic:
                 print('Something went wrong!')
                 return
 
-        # Connect with SSH-PubKey and synchronize files
-        subprocess.run(
-            ['scp',
-             '-i', str(self.tempdir_ssh_key),
-             '-o', 'IdentitiesOnly=yes',
-             '-o', 'StrictHostKeyChecking=no',
-             'robot@{}:/home/robot/logs/*.log'.format(self.settings['ip']),
-             str(self.log_path)
-             ])
+        ssh = ['ssh',
+               '-i', str(self.tempdir_ssh_key),
+               '-o', 'IdentitiesOnly=yes',
+               '-o', 'StrictHostKeyChecking=no',
+               ] + self.multiplex_options() + ['robot@{}'.format(self.settings['ip'])]
 
-        print('Done.')
+        start_time = time.monotonic()
+
+        # name, size and inode tell what is missing locally
+        result = subprocess.run(ssh + ['cd /home/robot/logs && stat -c "%s %i %n" {} 2>/dev/null || true'.format(
+            ' '.join(LOG_PATTERNS))], stdout=subprocess.PIPE)
+        if result.returncode != 0:
+            print('Something went wrong!')
+            return
+
+        state_file = Path(self.log_path) / LOG_STATE
+        try:
+            with state_file.open() as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        # name, offset and number of bytes to fetch
+        tails = []
+        for line in result.stdout.decode().splitlines():
+            size, inode, name = line.split(" ", 2)
+            size, inode = int(size), int(inode)
+            local_file = Path(self.log_path) / name
+
+            # the local file holds everything fetched so far, also of interrupted transfers
+            offset = local_file.stat().st_size if local_file.exists() else 0
+            if state.get(name) != inode or offset > size:
+                # new, recreated, truncated or rotated on the brick, start over
+                offset = 0
+                local_file.write_bytes(b"")
+
+            state[name] = inode
+            if size > offset:
+                tails.append((name, offset, size - offset))
+
+        with state_file.open("w") as f:
+            json.dump(state, f)
+
+        if not tails:
+            print('Done. Nothing new.')
+            return
+
+        # the missing bytes of every file, one after another, compressed for the link;
+        # each file is preceded by the number of bytes actually sent, a file may have shrunk meanwhile
+        command = 'cd /home/robot/logs && t=$(mktemp) && trap \'rm -f "$t"\' EXIT && {{ {}; }} | gzip -1 -c'.format(
+            '; '.join('tail -c +{} {} | head -c {} > "$t"; wc -c < "$t"; cat "$t"'.format(
+                offset + 1, shlex.quote(name), length) for name, offset, length in tails))
+        process = subprocess.Popen(ssh + [command], stdout=subprocess.PIPE)
+
+        decompressor = zlib.decompressobj(wbits=31)
+        received = 0
+        # bytes appended to every file, the length header of the next file while it is incomplete
+        appended = []
+        header = b""
+        remaining = None
+        local_file = None
+
+        for chunk in iter(lambda: process.stdout.read(65536), b""):
+            received += len(chunk)
+            data = decompressor.decompress(chunk)
+
+            while data:
+                if remaining is None:
+                    line, newline, data = data.partition(b"\n")
+                    header += line
+                    if not newline:
+                        break
+                    remaining = int(header)
+                    header = b""
+                    appended.append(0)
+                    local_file = (Path(self.log_path) / tails[len(appended) - 1][0]).open("ab")
+                else:
+                    part, data = data[:remaining], data[remaining:]
+                    local_file.write(part)
+                    appended[-1] += len(part)
+                    remaining -= len(part)
+
+                if remaining == 0:
+                    local_file.close()
+                    local_file = None
+                    remaining = None
+
+        if local_file is not None:
+            local_file.close()
+        process.wait()
+
+        for (name, _, _), length in zip(tails, appended):
+            print('\t{}: +{} bytes'.format(name, length))
+        print('Done. {} bytes appended, {} bytes on the wire in {:.2f} s.'.format(
+            sum(appended), received, time.monotonic() - start_time))
+        if len(appended) < len(tails) or remaining is not None:
+            print('Transfer interrupted, the next sync resumes it.')
 
     def start_session(self, port_forwarding=True):
         """
@@ -266,6 +630,7 @@ class Generic:
              ] + port_forwarding_args + [
                 '-o', 'StrictHostKeyChecking=no',
                 '-o', 'IdentitiesOnly=yes',
+            ] + self.multiplex_options() + [
                 'robot@{}'.format(self.settings['ip']),
                 '-t', '{}robolab-tmux'.format(exam_extra_command)
             ])
@@ -273,4 +638,5 @@ class Generic:
         print('Done.')
 
     def cleanup(self):
+        self.close_connection()
         self.tempdir.cleanup()
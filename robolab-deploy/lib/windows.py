@@ -7,3 +7,6 @@ class Windows(Generic):
     """
     Deploy class for Windows systems
     """
+
+    # the OpenSSH client of Windows cannot share connections
+    MULTIPLEX_SUPPORTED = False
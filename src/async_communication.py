@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from communication import Communication
+from messages import DoneMessage, PathMessage, PathSelectMessage, PlanetMessage
+from planet import Direction
+
+
+class AsyncCommunication:
+    """
+    asyncio front-end for Communication
+    paho keeps running on its own network thread, every parsed server message is handed over
+    to the event loop. Requests await the matching answer of the server with a timeout, so
+    waiting, planning and messaging can be composed with asyncio.gather/wait_for instead of sleeps.
+    Has to be created from within a running event loop.
+    """
+
+    def __init__(self, communication: Communication):
+        """
+        Initializes the front-end and takes over the message listeners of the communication
+        :param communication: Communication
+        """
+        self.com = communication
+        self.loop = asyncio.get_running_loop()
+
+        # all server messages in order of arrival, consumed by events()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+        # futures waiting for the next message of a type
+        self.waiters: Dict[str, List[asyncio.Future]] = {}
+
+        # the event loop replaces the thread-safe queue of the synchronous interface
+        self.com.listeners = [self.on_event]
+
+    def on_event(self, event):
+        """
+        Called on the paho network thread for every parsed server message
+        :param event: Message
+        :return: void
+        """
+        self.loop.call_soon_threadsafe(self.dispatch, event)
+
+    def dispatch(self, event):
+        for waiter in self.waiters.pop(event.type, []):
+            if not waiter.done():
+                waiter.set_result(event)
+
+        self.queue.put_nowait(event)
+
+    def expect(self, msg_type: str) -> asyncio.Future:
+        """
+        Registers a future for the next message of the given type, has to be called
+        before the request is sent to not miss a fast answer
+        :param msg_type: String
+        :return: asyncio.Future
+        """
+        waiter = self.loop.create_future()
+        self.waiters.setdefault(msg_type, []).append(waiter)
+        return waiter
+
+    async def wait_for(self, msg_type: str, timeout: float = Communication.TIMEOUT):
+        """
+        Waits for the next message of the given type
+        :param msg_type: String
+        :param timeout: float
+        :return: Message, raises asyncio.TimeoutError if the server did not answer
+        """
+        return await self.wait(self.expect(msg_type), timeout)
+
+    async def wait(self, waiter: asyncio.Future, timeout: float):
+        """
+        Waits for a registered answer and, like Communication.wait_for, wakes up every PUBLISH_TIMEOUT
+        to publish unacknowledged messages again
+        :param waiter: asyncio.Future, see expect
+        :param timeout: float
+        :return: Message, raises asyncio.TimeoutError if the server did not answer
+        """
+        deadline = self.loop.time() + timeout
+
+        while True:
+            remaining = deadline - self.loop.time()
+            try:
+                # shielded, the waiter has to survive the wake-ups
+                return await asyncio.wait_for(asyncio.shield(waiter), max(0, min(remaining, self.com.PUBLISH_TIMEOUT)))
+            except asyncio.TimeoutError:
+                if remaining <= self.com.PUBLISH_TIMEOUT:
+                    waiter.cancel()
+                    raise
+            self.com.retransmit_expired()
+
+    async def answer(self, waiter: asyncio.Future, timeout: float):
+        try:
+            return await self.wait(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def events(self) -> AsyncIterator:
+        """
+        Yields all server messages in order of arrival
+        """
+        while True:
+            yield await self.queue.get()
+
+    async def request_ready(self, timeout: float = Communication.TIMEOUT) -> PlanetMessage:
+        waiter = self.expect("planet")
+        self.com.send_ready()
+        return await self.wait(waiter, timeout)
+
+    async def request_path(self, start_pos: Tuple[Tuple[int, int], Direction], end_pos: Tuple[Tuple[int, int], Direction],
+                           path_status: str, timeout: float = Communication.TIMEOUT) -> PathMessage:
+        waiter = self.expect("path")
+        self.com.send_path(start_pos, end_pos, path_status)
+        return await self.wait(waiter, timeout)
+
+    async def select_path(self, start_pos: Tuple[Tuple[int, int], Direction],
+                          timeout: float = Communication.TIMEOUT) -> Optional[PathSelectMessage]:
+        """
+        Sends our path selection, the server only answers if it overrides the direction
+        :return: PathSelectMessage or None if our selection was accepted
+        """
+        waiter = self.expect("pathSelect")
+        self.com.send_pathSelect(start_pos)
+        return await self.answer(waiter, timeout)
+
+    async def target_reached(self, timeout: float = Communication.TIMEOUT) -> Optional[DoneMessage]:
+        waiter = self.expect("done")
+        self.com.send_targetReached()
+        return await self.answer(waiter, timeout)
+
+    async def exploration_completed(self, timeout: float = Communication.TIMEOUT) -> Optional[DoneMessage]:
+        waiter = self.expect("done")
+        self.com.send_explorationCompleted()
+        return await self.answer(waiter, timeout)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Runs many replayed explorations of generated planets in a process pool to compare exploration strategies
+
+Run from src: python -m batch_simulation [--runs 1000] [--size 10] [--strategies smartest depth_first] [--output results.csv]
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+from typing import Iterable, List, Optional, Tuple, Union
+
+from exploration_replay import replay_exploration
+from planet import Direction, Planet
+from planet_generator import generate_planet
+
+
+def depth_first_direction(planet: Planet, start: Tuple[int, int]) -> Union[None, Direction]:
+    """
+    Tour-like strategy: finishes the most recently discovered part of the planet before going back
+    """
+    if planet.target:
+        if start == planet.target:
+            return None
+
+        shortest_path = planet.shortest_path(start, planet.target)
+        if shortest_path is not None:
+            _, direction = shortest_path[0]
+            return direction
+
+    if planet.unexplored_directions.get(start):
+        return planet.unexplored_directions[start][-1]
+
+    candidates = planet.unveiled_nodes[::-1] + [node for node in planet.explored_nodes[::-1]
+                                                if planet.unexplored_directions.get(node)]
+    for node in candidates:
+        shortest_path = planet.shortest_path(start, node)
+        if shortest_path:
+            _, direction = shortest_path[0]
+            return direction
+
+    return None
+
+
+STRATEGIES = {
+    "smartest": Planet.smartest_direction,
+    "depth_first": depth_first_direction,
+}
+
+COLUMNS = ["run", "strategy", "seed", "width", "height", "target", "nodes_visited", "decisions", "weight_driven",
+           "completed", "reached_target", "planner_seconds", "decisions_per_second"]
+
+
+def simulate(task: Tuple[int, str, int, int, int, bool]) -> dict:
+    """
+    One exploration of a generated planet, runs in a worker process
+    :param task: Tuple, run number, strategy name, seed, width, height and whether the server sends a target
+    :return: Dict, one row of the results
+    """
+    run, strategy, seed, width, height, with_target = task
+    truth, start = generate_planet(width, height, seed=seed)
+
+    target = None
+    if with_target:
+        target = random.Random(seed).choice(list(truth.get_paths().keys()))
+
+    result = replay_exploration(truth, start, target=target, strategy=STRATEGIES[strategy])
+    planner_seconds = sum(result.decision_times)
+
+    return {
+        "run": run,
+        "strategy": strategy,
+        "seed": seed,
+        "width": width,
+        "height": height,
+        "target": "" if target is None else f"{target[0]},{target[1]}",
+        "nodes_visited": len(result.visited),
+        "decisions": result.decisions,
+        "weight_driven": result.path_cost,
+        "completed": int(result.completed),
+        "reached_target": int(result.reached_target),
+        "planner_seconds": f"{planner_seconds:.6f}",
+        "decisions_per_second": f"{result.decisions / planner_seconds:.1f}" if planner_seconds else "",
+    }
+
+
+def make_tasks(runs: int, strategies: List[str], width: int, height: int, seed: int = 0,
+               targets: bool = False) -> List[Tuple[int, str, int, int, int, bool]]:
+    """
+    Every strategy explores the same planets, so their results can be compared run by run
+    """
+    return [(run, strategy, seed + run, width, height, targets) for run in range(runs) for strategy in strategies]
+
+
+def run_batch(tasks: Iterable[Tuple[int, str, int, int, int, bool]], output: str,
+              processes: Optional[int] = None) -> int:
+    """
+    Simulates the tasks on all cores and streams the results into a CSV file, one column per metric
+    :param tasks: Iterable, see simulate
+    :param output: String, path of the results file
+    :param processes: int, worker processes, all cores by default
+    :return: int, number of finished runs
+    """
+    tasks = list(tasks)
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (processes * 8))
+
+    count = 0
+    with open(output, 'w', newline='') as results, multiprocessing.Pool(processes) as pool:
+        writer = csv.DictWriter(results, fieldnames=COLUMNS)
+        writer.writeheader()
+
+        for row in pool.imap_unordered(simulate, tasks, chunksize=chunksize):
+            writer.writerow(row)
+            results.flush()
+            count += 1
+
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=1000, help="planets per strategy")
+    parser.add_argument('--size', type=int, nargs=2, default=[10, 10], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--targets', action='store_true', help="the server sends a random target")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default='batch_results.csv')
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.runs, args.strategies, args.size[0], args.size[1], args.seed, args.targets)
+    count = run_batch(tasks, args.output, args.processes)
+    print(f"{count} runs written to {args.output}")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""
+Encode and decode cost per message type for every available JSON backend
+
+Run from src: python -m benchmarks.bench_codec
+"""
+
+import timeit
+
+import codec
+from messages import DoneMessage, PathMessage, PathSelectMessage, PathUnveiledMessage, PlanetMessage, TargetMessage
+
+PATH = {"startX": 12, "startY": -3, "startDirection": 90, "endX": 13, "endY": -1, "endDirection": 180,
+        "pathStatus": "free", "pathWeight": 7}
+
+# sample payloads of the server and the message class they are parsed into
+SERVER_MESSAGES = {
+    "planet": ({"planetName": "Kuehlelement", "startX": 12, "startY": -3, "startOrientation": 0}, PlanetMessage),
+    "path": (PATH, PathMessage),
+    "pathSelect": ({"startDirection": 270}, lambda payload: PathSelectMessage(payload, (12, -3))),
+    "pathUnveiled": (PATH, PathUnveiledMessage),
+    "target": ({"targetX": 4, "targetY": 2}, TargetMessage),
+    "done": ({"message": "Exploration completed!"}, DoneMessage),
+}
+
+# sample payloads of our own messages
+CLIENT_MESSAGES = {
+    "ready": None,
+    "path": {key: value for key, value in PATH.items() if key != "pathWeight"},
+    "pathSelect": {"startX": 12, "startY": -3, "startDirection": 270},
+    "targetReached": {"message": "Found it!"},
+}
+
+NUMBER = 20000
+
+
+def run():
+    for name, (encode, decode) in codec.BACKENDS.items():
+        print(f"backend {name}")
+
+        for msg_type, payload in CLIENT_MESSAGES.items():
+            message = {"from": "client", "type": msg_type}
+            if payload is not None:
+                message["payload"] = payload
+
+            seconds = timeit.timeit(lambda: encode(message), number=NUMBER)
+            print(f"  encode {msg_type:>14}: {seconds / NUMBER * 1e6:6.2f} us")
+
+        for msg_type, (payload, message_class) in SERVER_MESSAGES.items():
+            data = encode({"from": "server", "type": msg_type, "payload": payload}).encode('utf-8')
+
+            seconds = timeit.timeit(lambda: message_class(decode(data)["payload"]), number=NUMBER)
+            print(f"  decode {msg_type:>14}: {seconds / NUMBER * 1e6:6.2f} us")
+
+
+if __name__ == '__main__':
+    run()
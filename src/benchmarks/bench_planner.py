@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""
+Planner cost on generated planets of 10^2 to 10^5 nodes: time per decision, peak memory and path cost
+of a replayed exploration. The replay stops after the planner spent the time budget, so the larger
+planets report the cost of a partial exploration.
+
+Run from src: python -m benchmarks.bench_planner [--nodes 100 1000 ...] [--seed 0] [--budget 30]
+"""
+
+import argparse
+import math
+import statistics
+import time
+import tracemalloc
+
+from exploration_replay import replay_exploration
+from planet_generator import generate_planet
+
+
+def run(nodes: int, seed: int, budget: float):
+    side = max(2, round(math.sqrt(nodes)))
+
+    start_time = time.perf_counter()
+    truth, start = generate_planet(side, side, seed=seed)
+    generated = time.perf_counter() - start_time
+    path_count = sum(len(directions) for directions in truth.get_paths().values()) // 2
+
+    result = replay_exploration(truth, start, time_budget=budget)
+
+    start_time = time.perf_counter()
+    result.planet.dijkstra(start[0])
+    dijkstra_time = time.perf_counter() - start_time
+
+    # tracing slows the planner down, so memory is measured in a second replay of the same decisions
+    tracemalloc.start()
+    replay_exploration(truth, start, max_decisions=result.decisions)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = result.decision_times
+    percentiles = statistics.quantiles(times, n=100) if len(times) > 1 else times * 99
+
+    print(f"{side}x{side} planet ({side * side} nodes, {path_count} paths, generated in {generated:.2f} s)")
+    print(f"  {result.decisions} decisions, {len(result.visited)} nodes visited, path cost {result.path_cost}, "
+          f"{'completed' if result.completed else 'stopped after ' + str(budget) + ' s'}")
+    print(f"  decision: mean {statistics.mean(times) * 1000:.3f} ms, p50 {percentiles[49] * 1000:.3f} ms, "
+          f"p99 {percentiles[98] * 1000:.3f} ms, max {max(times) * 1000:.3f} ms")
+    print(f"  dijkstra on explored planet: {dijkstra_time * 1000:.3f} ms")
+    if result.completed:
+        print(f"  exploration_completed: {result.completion_time * 1000:.3f} ms")
+    print(f"  peak memory: {peak / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=30, help="seconds of planner time per planet")
+    args = parser.parse_args()
+
+    for nodes in args.nodes:
+        run(nodes, args.seed, args.budget)
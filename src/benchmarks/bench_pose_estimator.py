@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+CPU cost of the pose estimator per update, next to the tacho sample the odometry stores anyway
+
+Run from src, also on the brick: python3 -m benchmarks.bench_pose_estimator
+"""
+
+import math
+import timeit
+
+from pose_estimator import PoseEstimator
+
+WHEEL_DIAMETER = 5.6
+AXIS_LENGTH = 11.6
+COUNT_PER_ROT = 360
+
+NUMBER = 20000
+
+
+def samples(number: int):
+    """
+    Tacho samples of a robot following a slightly curved line
+    """
+    left = right = 0.0
+    for i in range(number):
+        left += 4 + math.sin(i / 50)
+        right += 4 - math.sin(i / 50)
+        yield round(left), round(right)
+
+
+def run():
+    estimator = PoseEstimator(WHEEL_DIAMETER, AXIS_LENGTH, COUNT_PER_ROT, COUNT_PER_ROT)
+    estimator.observe_node((0, 0))
+    estimator.observe_heading(0)
+    stream = list(samples(NUMBER))
+
+    data = []
+    results = {
+        "store sample (odometry)": timeit.timeit(lambda: [data.append(sample) for sample in stream], number=1),
+        "predict": timeit.timeit(lambda: [estimator.predict(*sample) for sample in stream], number=1),
+    }
+    driven = f"after {NUMBER} samples: position +-{estimator.position_std():.1f} cm, " \
+             f"heading +-{estimator.heading_std():.1f} deg"
+
+    for name, update in [("observe_node", lambda: estimator.observe_node((3, 4))),
+                         ("observe_heading", lambda: estimator.observe_heading(math.radians(90))),
+                         ("nearest_node", lambda: estimator.nearest_node(1))]:
+        results[name] = timeit.timeit(update, number=NUMBER)
+
+    for name, seconds in results.items():
+        print(f"{name:>24}: {seconds / NUMBER * 1e6:6.2f} us, {NUMBER / seconds:10.0f} per second")
+    print(driven)
+
+
+if __name__ == '__main__':
+    run()
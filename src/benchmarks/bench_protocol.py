@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Message throughput and round trip latency of the exploration protocol against the local mothership
+
+Run from src: python -m benchmarks.bench_protocol [grid size]
+"""
+
+import statistics
+import sys
+import time
+import unittest.mock
+import uuid
+
+import paho.mqtt.client as mqtt
+
+from communication import Communication
+from planet import Direction, Planet
+from tests.fake_mothership import FakeBroker, FakeMothership, wait_connected
+
+
+def grid_planet(size: int) -> Planet:
+    """
+    Square grid of nodes, every neighbour connected with weight 1
+    """
+    planet = Planet()
+    for x in range(size):
+        for y in range(size):
+            if x + 1 < size:
+                planet.add_path(((x, y), Direction.EAST), ((x + 1, y), Direction.WEST), 1)
+            if y + 1 < size:
+                planet.add_path(((x, y), Direction.NORTH), ((x, y + 1), Direction.SOUTH), 1)
+    return planet
+
+
+def report(name: str, latencies):
+    if len(latencies) < 2:
+        return
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{name:>12}: {len(latencies):5d} round trips, p50 {percentiles[49] * 1000:6.2f} ms, "
+          f"p90 {percentiles[89] * 1000:6.2f} ms, p99 {percentiles[98] * 1000:6.2f} ms")
+
+
+def run(size: int):
+    planet = grid_planet(size)
+
+    broker = FakeBroker()
+    mothership = FakeMothership(broker, planet, ((0, 0), Direction.NORTH))
+    mothership.echo_path_select = True
+
+    client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+    com = Communication(client, unittest.mock.MagicMock(), host=broker.host, port=broker.port, tls=False)
+    wait_connected(client)
+
+    start_time = time.perf_counter()
+
+    com.send_ready()
+    com.wait_for("planet")
+
+    # every path of the planet once, like a complete exploration
+    for coords, directions in planet.get_paths().items():
+        for direction, (end_coords, end_direction, _) in directions.items():
+            com.send_path((coords, direction), (end_coords, end_direction), "free")
+            com.wait_for("path")
+            com.send_pathSelect((end_coords, end_direction))
+            com.wait_for("pathSelect")
+
+    com.send_explorationCompleted()
+    com.wait_for("done")
+
+    elapsed = time.perf_counter() - start_time
+
+    client.disconnect()
+    client.loop_stop()
+    broker.stop()
+
+    print(f"{size}x{size} planet: {broker.published} messages in {elapsed:.2f} s, "
+          f"{broker.published / elapsed:.0f} messages/s")
+    for msg_type, latencies in com.round_trips.items():
+        report(msg_type, latencies)
+    print("publish pipeline: " + ", ".join(f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+                                          for name, value in com.publish_stats().items()))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import json
+
+# faster JSON backend, optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Encoding and decoding of the JSON messages exchanged with the server.
+# Messages are encoded exactly once into a compact string, pretty printing is only
+# done for the debug log and only if the debug level is actually enabled.
+
+
+def json_encode(message: dict) -> str:
+    return json.dumps(message, separators=(',', ':'))
+
+
+def json_decode(data) -> dict:
+    return json.loads(data)
+
+
+def orjson_encode(message: dict) -> str:
+    return orjson.dumps(message).decode('utf-8')
+
+
+def orjson_decode(data) -> dict:
+    return orjson.loads(data)
+
+
+BACKENDS = {"json": (json_encode, json_decode)}
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson_encode, orjson_decode)
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+encode, decode = BACKENDS[BACKEND]
+
+
+def pretty(message) -> str:
+    """
+    Pretty prints an encoded or decoded message for the debug log
+    :param message: String, bytes or Dict
+    :return: String
+    """
+    if not isinstance(message, dict):
+        message = decode(message)
+    return json.dumps(message, indent=2)
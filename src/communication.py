@@ -1,24 +1,55 @@
 #!/usr/bin/env python3
 
 # Attention: Do not import the ev3dev.ev3 module in this file
-from dataclasses import dataclass
-import json
-import platform
+import queue
+from collections import deque
 import ssl
-from typing import Tuple
-from xmlrpc import client
+import sys
+import threading
+from typing import Callable, Dict, List
 import logging
 import time
 
 # make mqtt available
 import paho.mqtt.client as mqtt
 
-from planet import Direction
+import codec
+from messages import (DoneMessage, PathMessage, PathSelectMessage, PathUnveiledMessage, PlanetMessage,
+    TargetMessage, UnveiledBatch)
+from run_log import Record, Recorder
 
 # Fix: SSL certificate problem on macOS
-if all(platform.mac_ver()):
+if sys.platform == "darwin":
     from OpenSSL import SSL
 
+MOTHERSHIP_HOST = 'mothership.inf.tu-dresden.de'
+MOTHERSHIP_PORT = 8883
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest rank percentile, 0 for no values
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class InFlight:
+    """
+    Published message waiting for PUBACK (QoS 1) or PUBCOMP (QoS 2)
+    """
+    __slots__ = ("topic", "message", "qos", "sent_time", "first_sent_time", "retries")
+
+    def __init__(self, topic: str, message: str, qos: int):
+        self.topic = topic
+        self.message = message
+        self.qos = qos
+        self.sent_time = time.monotonic()
+        self.first_sent_time = self.sent_time
+        self.retries = 0
+
 class Communication:
     """
     Class to hold the MQTT client communication
@@ -26,56 +57,110 @@ class Communication:
     thereby solve the task according to the specifications
     """
 
-    def __init__(self, mqtt_client, logger):
+    # message types the server sends to us
+    MESSAGE_TYPES = ["planet", "path", "pathSelect", "pathUnveiled", "target", "done"]
+
+    # seconds to wait for an answer of the server
+    TIMEOUT = 3
+
+    # QoS per client message type: duplicates of these are harmless, every other type uses QoS 2
+    QOS = {"pathSelect": 1, "targetReached": 1, "explorationCompleted": 1, "testplanet": 1}
+
+    # seconds until an unacknowledged QoS 1 message is published again, and how often,
+    # paho retries QoS 2 messages itself and a second publish would reach the server twice
+    PUBLISH_TIMEOUT = 1
+    MAX_RETRIES = 2
+
+    def __init__(self, mqtt_client, logger, host: str = MOTHERSHIP_HOST, port: int = MOTHERSHIP_PORT, tls: bool = True,
+                 recorder: Recorder = None):
         """
         Initializes communication module, connect to server, subscribe, etc.
         :param mqtt_client: paho.mqtt.client.Client
         :param logger: logging.Logger
+        :param host: String, broker to connect to, the mothership by default
+        :param port: int
+        :param tls: bool, False for a local test broker
+        :param recorder: Recorder, run log of all messages, disabled by default
         """
         # DO NOT CHANGE THE SETUP HERE
         self.client = mqtt_client
-        self.client.tls_set(tls_version=ssl.PROTOCOL_TLS)
+        if tls:
+            self.client.tls_set(tls_version=ssl.PROTOCOL_TLS)
         self.client.on_message = self.safe_on_message_handler
         # Add your client setup here
-        
+        self.client.on_publish = self.on_publish
+        self.recorder = recorder if recorder is not None else Recorder()
+
+        # bind logger
+        self.logger = logger
+
+        # publish pipeline, guarded by the lock because on_publish runs on the network thread
+        self.publish_lock = threading.RLock()
+        self.in_flight: Dict[int, InFlight] = {}
+        # acknowledgements that arrived before publish tracked their message, only kept while publishing
+        self.early_acks = set()
+        self.publishing = 0
+        self.qos = dict(self.QOS)
+        self.retransmits = 0
+        self.delivered = 0
+        # publish to PUBACK/PUBCOMP latency in seconds per QoS, the latest 1000
+        self.publish_latencies: Dict[int, deque] = {1: deque(maxlen=1000), 2: deque(maxlen=1000)}
+
+        # prepare the data to be used
+        self.planet_name = "" #= input('Please enter the name of your planet: ')
+
+        # one event per server message type, set in on_message and consumed by wait_for
+        self.received = {msg_type: threading.Event() for msg_type in self.MESSAGE_TYPES}
+        self.last_message_time = time.monotonic()
+
+        # round trip latency in seconds, keyed by the type of the server's answer
+        self.sent_times: Dict[str, float] = {}
+        self.round_trips: Dict[str, List[float]] = {msg_type: [] for msg_type in self.MESSAGE_TYPES}
+
+        # node of the last pathSelect we sent, the server's answer only has the direction
+        self.path_select_coords = None
+
+        # parsed server messages in order of arrival, drained by the main thread
+        self.event_queue = queue.Queue()
+
+        # callbacks for every parsed server message, run on the paho network thread
+        self.listeners: List[Callable] = [self.event_queue.put]
+
+        # message handlers, keyed by sender and message type
+        self.handlers = {
+            ("server", "planet"): self.handle_planet,
+            ("server", "path"): self.handle_server_message,
+            ("server", "pathSelect"): self.handle_path_select,
+            ("server", "pathUnveiled"): self.handle_server_message,
+            ("server", "target"): self.handle_server_message,
+            ("server", "done"): self.handle_server_message,
+            ("server", "error"): self.handle_error,
+            ("debug", "notice"): self.handle_notice,
+            ("debug", "syntax"): self.handle_syntax,
+        }
+
+        # message classes of the server, keyed by message type
+        self.message_classes = {
+            "planet": PlanetMessage,
+            "path": PathMessage,
+            "pathUnveiled": PathUnveiledMessage,
+            "target": TargetMessage,
+            "done": DoneMessage,
+        }
+
+        # parsing cost per message type: [count, total seconds, max seconds]
+        self.parse_stats: Dict[str, List[float]] = {}
+
         # from example code with own data
         self.client.username_pw_set('022', password='y9DTnkXeHX')
-        self.client.connect('mothership.inf.tu-dresden.de', port=8883)
+        self.client.connect(host, port=port)
         self.client.subscribe('explorer/022', qos=2)
         self.client.subscribe('controller/022', qos=2)
         self.client.subscribe('comtest/022', qos=2)
 
-        # start the listening
+        # start the listening last, the handlers may run as soon as the client is connected
         self.client.loop_start()
 
-        # bind logger?
-        self.logger = logger
-
-        # prepare the data to be used
-        self.planet_name = "" #= input('Please enter the name of your planet: ')
-
-        # check variable for receiving msg
-        self.ready_msg_rcv = False
-        self.path_msg_rcv = False
-        self.path_msg_rcv = False
-        self.pathSel_msg_rcv = False
-        self.pathUnv_msg_rcv = False
-        self.target_msg_rcv = False
-        self.done_msg_rcv = False
-        self.path_status = "free"
-        self.path_weight = 0
-        self.unv_path_status = "free"
-        self.unv_path_weight = 0
-
-        # make position tuples available
-        self.start_pos: Tuple[Tuple[int, int], Direction]
-        self.end_pos: Tuple[Tuple[int, int], Direction]
-        self.unv_start_pos: Tuple[Tuple[int, int], Direction]
-        self.unv_end_pos: Tuple[Tuple[int, int], Direction]
-        self.target_pos: Tuple[int, int]
-
-        self.unv_paths = []
-
     # DO NOT EDIT THE METHOD SIGNATURE
     def on_message(self, client, data, message):
         """
@@ -85,94 +170,177 @@ class Communication:
         :param message: Object
         :return: void
         """
-        data = json.loads(message.payload.decode('utf-8'))
-        self.logger.debug(json.dumps(data, indent=2))
+        start_time = time.perf_counter()
+        self.recorder.record_bytes(Record.MESSAGE_IN, message.payload)
+
+        data = codec.decode(message.payload)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(codec.pretty(data))
+
+        self.last_message_time = time.monotonic()
 
         #print('Got message with topic "{}":'.format(message.topic))
 
-        # make data accessible
-        self.data = data
-
-        # check for which message is received and call respective function
-        if self.data["from"] == "server":
-
-            payload = self.data["payload"]
-
-            if self.data["type"] == "planet":
-                #print('Got a message for the testplanet. \n')
-                self.planet_name = payload["planetName"]
-                self.start_pos = (payload["startX"], payload["startY"]), payload["startOrientation"]
-                self.client.subscribe('planet/{}/022'.format(self.planet_name))
-                print(f"[COM] first node pos: {self.start_pos}")
-                self.ready_msg_rcv = True
-
-            elif data["type"] == "path":
-                #print('Got a message for an updated path. \n')
-                self.start_pos = (payload["startX"], payload["startY"]), payload["startDirection"]
-                self.end_pos = (payload["endX"], payload["endY"]), payload["endDirection"]
-                self.path_status = payload["pathStatus"]
-                self.path_weight = payload["pathWeight"]
-                print(f"[COM] path: start:{self.start_pos}, end:{self.end_pos}, status:{self.path_status}, weight: {self.path_weight}")
-                self.path_msg_rcv = True
-
-            elif data["type"] == "pathSelect":
-                #print('got a message for pathselection. \n')
-                start_coords, _ = self.start_pos
-                self.start_pos = start_coords, payload["startDirection"]
-                print(f"[COM] pathSelect: start: {self.start_pos}")
-                self.pathSel_msg_rcv = True
-
-            elif data["type"] == "pathUnveiled":
-                #print('got a message for pathcorrection. \n')
-                self.unv_start_pos = (payload["startX"],payload["startY"]), payload["startDirection"]
-                self.unv_end_pos = (payload["endX"], payload["endY"]), payload["endDirection"]
-                self.unv_path_status = payload["pathStatus"]
-                self.unv_path_weight = payload["pathWeight"]
-
-                self.unv_paths.append((self.unv_start_pos, self.unv_end_pos, self.unv_path_status, self.unv_path_weight))
-
-                print(f"[COM] pathUnv: start:{self.unv_start_pos}, end:{self.unv_end_pos}, status:{self.unv_path_status}, weight: {self.unv_path_weight}")
-                self.pathUnv_msg_rcv = True
-
-            elif data["type"] == "target":
-                #print('Finally a goal in life. \n')
-                self.target_pos = payload["targetX"], payload["targetY"]
-                print(f"NEW TARGET: {self.target_pos}")
-                self.target_msg_rcv = True
-
-            elif data["type"] == "done":
-                print("[COM] finale has been confirmed.")
-                print(payload["message"])
-                self.done_msg_rcv = True
-
-            elif data["type"] == "error":
-                print("[COM] debug: {}".format(self.data["debug"]))
-                print(payload["errors"])
-        
-        elif data["from"] == "debug":
-            
-            if data["type"] == "notice":
-                print('active planet is actually {}.'.format(self.planet_name))
-            
-            elif data["type"] == "syntax":
-                if self.data["message"] == "Correct":
-                    print('all good!')
-                    self.send_ready()
-                else:
-                    print(payload["errors"])
-        elif data["from"] == "client":
-            pass
+        msg_type = data["type"]
+        handler = self.handlers.get((data["from"], msg_type))
+
+        if handler is None:
+            # our own messages are echoed on the channel
+            if data["from"] != "client":
+                self.logger.warning(f"[COM] unknown message: {data['from']}/{msg_type}")
+            return
+
+        handler(data)
+
+        elapsed = time.perf_counter() - start_time
+        stats = self.parse_stats.setdefault(msg_type, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def handle_server_message(self, data: dict):
+        """
+        Parses a message of the server and hands it to the main thread
+        :param data: Dict
+        :return: void
+        """
+        event = self.message_classes[data["type"]](data["payload"])
+        self.logger.info(f"[COM] {event}")
+        self.emit(event)
+
+    def handle_path_select(self, data: dict):
+        event = PathSelectMessage(data["payload"], self.path_select_coords)
+        self.logger.info(f"[COM] {event}")
+        self.emit(event)
+
+    def handle_planet(self, data: dict):
+        event = PlanetMessage(data["payload"])
+        self.planet_name = event.planet_name
+        self.client.subscribe('planet/{}/022'.format(self.planet_name))
+        self.logger.info(f"[COM] {event}")
+        self.emit(event)
+
+    def emit(self, event):
+        """
+        Hands a parsed server message to all listeners and wakes up waiting threads
+        :param event: Message
+        :return: void
+        """
+        for listener in self.listeners:
+            listener(event)
+        self.set_received(event.type)
+
+    def handle_error(self, data: dict):
+        self.logger.warning("[COM] debug: {}".format(data["debug"]))
+        self.logger.warning(data["payload"]["errors"])
+
+    def handle_notice(self, data: dict):
+        self.logger.info('active planet is actually {}.'.format(self.planet_name))
+
+    def handle_syntax(self, data: dict):
+        if data["message"] == "Correct":
+            self.logger.info('all good!')
+            self.send_ready()
         else:
-            print('not set yet, go away \n' )
+            self.logger.warning(data["payload"]["errors"])
 
-    # functions for generating messages
-    def create_payload(self, **content):
-        payload = {}
+    def drain_events(self) -> list:
+        """
+        Removes and returns all parsed server messages in order of arrival,
+        consecutive pathUnveiled messages are returned as one UnveiledBatch
+        :return: List
+        """
+        events = []
+        while True:
+            try:
+                event = self.event_queue.get_nowait()
+            except queue.Empty:
+                return events
+
+            # coalesce a burst of unveiled paths into one batch
+            if isinstance(event, PathUnveiledMessage):
+                if events and isinstance(events[-1], UnveiledBatch):
+                    events[-1].messages.append(event)
+                else:
+                    events.append(UnveiledBatch([event]))
+            else:
+                events.append(event)
 
-        for content_name, info in content.items():
-            payload[content_name] = info
+    def set_received(self, msg_type: str):
+        """
+        Marks a server message as received and records the round trip latency
+        if we were waiting for it
+        :param msg_type: String
+        :return: void
+        """
+        sent_time = self.sent_times.pop(msg_type, None)
+        if sent_time is not None:
+            latency = time.monotonic() - sent_time
+            self.round_trips[msg_type].append(latency)
+            self.logger.debug("round trip %s: %.1f ms", msg_type, latency * 1000)
+
+        self.received[msg_type].set()
+
+    def expect(self, msg_type: str):
+        """
+        Starts the round trip timer for the expected answer and forgets an old answer
+        :param msg_type: String
+        :return: void
+        """
+        self.received[msg_type].clear()
+        self.sent_times[msg_type] = time.monotonic()
+
+    def wait_for(self, msg_type: str, timeout: float = None) -> bool:
+        """
+        Blocks until the server sent a message of the given type or the timeout expired
+        :param msg_type: String
+        :param timeout: float, TIMEOUT by default
+        :return: bool, True if the message arrived in time
+        """
+        if timeout is None:
+            timeout = self.TIMEOUT
+
+        deadline = time.monotonic() + timeout
+
+        # wake up from time to time to publish unacknowledged messages again
+        while True:
+            remaining = deadline - time.monotonic()
+            received = self.received[msg_type].wait(max(0, min(remaining, self.PUBLISH_TIMEOUT)))
+            if received or remaining <= self.PUBLISH_TIMEOUT:
+                break
+            self.retransmit_expired()
+
+        self.received[msg_type].clear()
 
-        return payload
+        # no answer, no latency
+        self.sent_times.pop(msg_type, None)
+
+        return received
+
+    def wait_idle(self, quiet: float, timeout: float = None):
+        """
+        Blocks until no message arrived for quiet seconds, used to collect a burst of
+        messages (e.g. pathUnveiled and target after a path)
+        :param quiet: float
+        :param timeout: float, TIMEOUT by default
+        :return: void
+        """
+        if timeout is None:
+            timeout = self.TIMEOUT
+
+        deadline = time.monotonic() + timeout
+
+        while True:
+            now = time.monotonic()
+            remaining = self.last_message_time + quiet - now
+            if remaining <= 0 or now >= deadline:
+                return
+            time.sleep(min(remaining, deadline - now))
+
+    # functions for generating messages
+    def create_payload(self, **content):
+        # keyword arguments already are a new dict
+        return content
 
     def create_message(self, topic, payload):
         message = {
@@ -180,8 +348,7 @@ class Communication:
             "type": topic,
             "payload" : payload
         }
-        message = json.dumps(message)
-        return message
+        return codec.encode(message)
 
     # DO NOT EDIT THE METHOD SIGNATURE
     #
@@ -194,15 +361,123 @@ class Communication:
         :param message: Object
         :return: void
         """
-        self.logger.debug('Send to: ' + topic)
-        self.logger.debug(json.dumps(message, indent=2))
+        # only the message knows its type here, the send_* helpers pass it to send directly
+        self.send(topic, message, codec.decode(message)["type"])
+
+    def send(self, topic: str, message: str, msg_type: str):
+        """
+        Sends an encoded message with the QoS of its type
+        :param topic: String
+        :param message: String
+        :param msg_type: String, type of the message
+        :return: void
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Send to: ' + topic)
+            self.logger.debug(codec.pretty(message))
 
         # visualize what happens
         #print('Sending message with topic "{}".'.format(topic))
-        print(f"[SEND] {message}")
+        self.logger.info(f"[SEND] {message}")
+        self.recorder.record_bytes(Record.MESSAGE_OUT, message.encode('utf-8'))
 
         #actually send message
-        self.client.publish(topic, payload = message, qos=2)
+        self.publish(topic, message, self.qos.get(msg_type, 2))
+
+    def publish(self, topic: str, message: str, qos: int, in_flight: InFlight = None):
+        """
+        Publishes a message and tracks it until it is acknowledged
+        :param topic: String
+        :param message: String
+        :param qos: int
+        :param in_flight: InFlight, set for retransmissions
+        :return: void
+        """
+        with self.publish_lock:
+            self.publishing += 1
+
+        try:
+            # not under the lock, paho calls on_publish with its own locks held
+            info = self.client.publish(topic, payload=message, qos=qos)
+        except BaseException:
+            with self.publish_lock:
+                self.publishing -= 1
+            raise
+
+        # one block with the decrement, an acknowledgement in between is kept in early_acks
+        with self.publish_lock:
+            self.publishing -= 1
+            if qos > 0:
+                if in_flight is None:
+                    in_flight = InFlight(topic, message, qos)
+                self.in_flight[info.mid] = in_flight
+
+                # the acknowledgement may have been faster than we are
+                if info.mid in self.early_acks:
+                    self.acknowledge(info.mid)
+
+            self.early_acks.discard(info.mid)
+            # the rest are late acknowledgements of messages given up on or sent again
+            if self.publishing == 0:
+                self.early_acks.clear()
+
+    def on_publish(self, client, data, mid):
+        """
+        Handles PUBACK (QoS 1) and PUBCOMP (QoS 2) on the network thread
+        :param client: paho.mqtt.client.Client
+        :param data: Object
+        :param mid: int
+        :return: void
+        """
+        with self.publish_lock:
+            if mid in self.in_flight:
+                self.acknowledge(mid)
+            elif self.publishing:
+                self.early_acks.add(mid)
+
+    def acknowledge(self, mid: int):
+        in_flight = self.in_flight.pop(mid)
+        self.publish_latencies[in_flight.qos].append(time.monotonic() - in_flight.first_sent_time)
+        self.delivered += 1
+
+    def retransmit_expired(self):
+        """
+        Publishes QoS 1 messages without acknowledgement after PUBLISH_TIMEOUT again, up to MAX_RETRIES times,
+        QoS 2 messages stay in flight until paho delivered them
+        :return: void
+        """
+        now = time.monotonic()
+
+        with self.publish_lock:
+            expired = [(mid, in_flight) for mid, in_flight in self.in_flight.items()
+                       if in_flight.qos == 1 and now - in_flight.sent_time >= self.PUBLISH_TIMEOUT]
+            for mid, in_flight in expired:
+                del self.in_flight[mid]
+
+        for mid, in_flight in expired:
+            if in_flight.retries >= self.MAX_RETRIES:
+                self.logger.debug("giving up on message %s to %s", mid, in_flight.topic)
+                continue
+
+            in_flight.retries += 1
+            in_flight.sent_time = now
+            self.retransmits += 1
+            self.logger.warning(f"[COM] no acknowledgement for message {mid}, sending again")
+            self.publish(in_flight.topic, in_flight.message, in_flight.qos, in_flight)
+
+    def publish_stats(self) -> Dict[str, float]:
+        """
+        Counters of the publish pipeline, latencies in milliseconds
+        :return: Dict
+        """
+        stats = {"in_flight": len(self.in_flight), "delivered": self.delivered, "retransmits": self.retransmits}
+
+        for qos, latencies in self.publish_latencies.items():
+            latencies = list(latencies)
+            for p in (50, 90, 99):
+                stats[f"qos{qos}_p{p}"] = percentile(latencies, p) * 1000
+
+        return stats
 
     # DO NOT EDIT THE METHOD SIGNATURE OR BODY
     #
@@ -224,18 +499,20 @@ class Communication:
             raise
 
     def send_testplanet(self):
-        print("We're lost on a planet.")
-        self.send_message("explorer/022", message = self.create_message("testplanet", payload = self.create_payload(planetName = self.planet_name))) 
+        self.logger.info("We're lost on a planet.")
+        self.expect("planet")
+        self.send("explorer/022", self.create_message("testplanet", payload = self.create_payload(planetName = self.planet_name)), "testplanet")
 
     def send_ready(self):
         msgReady = {
             "from": "client",
             "type": "ready"
         }
-        msgReady = json.dumps(msgReady)
+        msgReady = codec.encode(msgReady)
+        self.expect("planet")
         # send the ready message
         #print("We're ready to go!")
-        self.send_message("explorer/022", msgReady)
+        self.send("explorer/022", msgReady, "ready")
 
     def send_path(self, start_pos, end_pos, path_status):
         # send the path message
@@ -243,31 +520,36 @@ class Communication:
         # prepare data
         (start_x, start_y), start_direction = start_pos
         (end_x, end_y), end_direction = end_pos
+        self.expect("path")
         # actually send
-        self.send_message("planet/{}/022".format(self.planet_name), 
+        self.send("planet/{}/022".format(self.planet_name), 
         self.create_message("path", 
-        self.create_payload(startX = start_x, startY = start_y, startDirection = start_direction, endX = end_x, endY = end_y, endDirection = end_direction, pathStatus = path_status)))
+        self.create_payload(startX = start_x, startY = start_y, startDirection = start_direction, endX = end_x, endY = end_y, endDirection = end_direction, pathStatus = path_status)), "path")
 
     def send_pathSelect(self, start_pos):
         # send the robo's select
         #print("The decision has been made.")
         # prepare data
         (start_x, start_y), start_direction = start_pos
+        self.path_select_coords = start_x, start_y
+        self.expect("pathSelect")
         # actually send
-        self.send_message("planet/{}/022".format(self.planet_name),
+        self.send("planet/{}/022".format(self.planet_name),
         self.create_message("pathSelect",
-        self.create_payload(startX = start_x, startY = start_y, startDirection = start_direction)))
+        self.create_payload(startX = start_x, startY = start_y, startDirection = start_direction)), "pathSelect")
 
     def send_targetReached(self):
         # send notice, if target has been reached
         #print('Target has been reached.')
-        self.send_message("explorer/022",
+        self.expect("done")
+        self.send("explorer/022",
         self.create_message("targetReached",
-        self.create_payload(message = "Found it!")))
+        self.create_payload(message = "Found it!")), "targetReached")
 
     def send_explorationCompleted(self):
         # send notice, that all available paths have been scanned
         #print('100{} exploration progress.'.format('%'))
-        self.send_message("explorer/022",
+        self.expect("done")
+        self.send("explorer/022",
         self.create_message("explorationCompleted",
-        self.create_payload(message = "I have all the Knowledge")))
\ No newline at end of file
+        self.create_payload(message = "I have all the Knowledge")), "explorationCompleted")
\ No newline at end of file
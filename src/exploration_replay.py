@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from planet import Direction, Planet
+
+
+class ExplorationResult:
+    """
+    Outcome and cost of one replayed exploration
+    """
+
+    def __init__(self):
+        self.decisions = 0
+        self.path_cost = 0
+        self.visited: List[Tuple[int, int]] = []
+        self.decision_times: List[float] = []
+        self.completion_time = 0.0
+        self.completed = False
+        self.reached_target = False
+        self.planet: Planet = None
+
+
+def scan(truth: Planet, coords: Tuple[int, int]) -> Dict[Direction, bool]:
+    """
+    What the robot would see when scanning a node of the true planet
+    """
+    paths = truth.get_paths().get(coords, {})
+    return {direction: direction in paths for direction in Direction}
+
+
+def replay_exploration(truth: Planet, start: Tuple[Tuple[int, int], Direction],
+                       target: Optional[Tuple[int, int]] = None,
+                       strategy: Callable[[Planet, Tuple[int, int]], Union[None, Direction]] = Planet.smartest_direction,
+                       max_decisions: Optional[int] = None,
+                       time_budget: Optional[float] = None) -> ExplorationResult:
+    """
+    Runs the decision loop of main.explore on a known planet without robot and server,
+    driving a path takes no time and the server answers every path with the true end and weight
+    :param truth: Planet, the whole planet as the server knows it
+    :param start: Tuple, start node and orientation
+    :param target: Tuple, target node sent by the server after the planet message
+    :param strategy: Callable, chooses the next direction like Planet.smartest_direction
+    :param max_decisions: int, stops the replay after this many decisions
+    :param time_budget: float, stops the replay after this many seconds spent in the planner
+    :return: ExplorationResult
+    """
+    result = ExplorationResult()
+    planet = Planet()
+    planet.target = target
+    result.planet = planet
+
+    coords, direction = start
+    planet.add_node_scan(coords, scan(truth, coords))
+    planet.add_explored_node(coords)
+    planet.remove_direct(coords, Direction((int(direction) - 180) % 360))
+    result.visited.append(coords)
+
+    spent = 0.0
+    while True:
+        if max_decisions is not None and result.decisions >= max_decisions:
+            return result
+        if time_budget is not None and spent >= time_budget:
+            return result
+
+        start_time = time.perf_counter()
+        best_direction = strategy(planet, coords)
+        elapsed = time.perf_counter() - start_time
+        result.decision_times.append(elapsed)
+        spent += elapsed
+
+        if best_direction is None:
+            break
+        result.decisions += 1
+
+        end_coords, end_direction, weight = truth.get_paths()[coords][best_direction]
+        if weight == -1:
+            # blocked, the robot turns around at the obstacle
+            end_coords, end_direction = coords, best_direction
+        else:
+            result.path_cost += weight
+
+        planet.add_path((coords, best_direction), (end_coords, end_direction), weight)
+
+        if planet.should_scan(end_coords):
+            planet.add_node_scan(end_coords, scan(truth, end_coords))
+        if end_coords not in planet.explored_nodes:
+            result.visited.append(end_coords)
+        planet.add_explored_node(end_coords)
+        planet.remove_unexplored_path((coords, best_direction), (end_coords, end_direction))
+
+        coords = end_coords
+
+    result.reached_target = planet.on_target(coords)
+
+    start_time = time.perf_counter()
+    result.completed = result.reached_target or planet.exploration_completed(coords)
+    result.completion_time = time.perf_counter() - start_time
+
+    return result
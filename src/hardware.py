@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+
+class Hardware:
+    """
+    Motors and sensors of the robot
+    The devices follow the interface of ev3dev.ev3 (Motor, UltrasonicSensor, ColorSensor),
+    so the robot runs unchanged on the brick and in the simulator.
+    """
+
+    def __init__(self, left_motor, right_motor, wings, ultrasonic, color_sensor):
+        self.left_motor = left_motor
+        self.right_motor = right_motor
+        self.wings = wings
+        self.ultrasonic = ultrasonic
+        self.color_sensor = color_sensor
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def time(self) -> float:
+        """
+        Monotonic time of the hardware in seconds
+        """
+        return time.monotonic()
+
+    def led_brightness(self, name: str, brightness: int):
+        pass
+
+
+class EV3Hardware(Hardware):
+    """
+    The real brick
+    """
+
+    def __init__(self):
+        # only import ev3dev if we actually run on the brick
+        import ev3dev.ev3 as ev3
+
+        left_motor = ev3.Motor(ev3.OUTPUT_B)
+        left_motor.reset()
+        right_motor = ev3.Motor(ev3.OUTPUT_A)
+        right_motor.reset()
+        ultrasonic = ev3.UltrasonicSensor(ev3.INPUT_2)
+        ultrasonic.mode = ev3.UltrasonicSensor.MODE_US_DIST_CM
+        color_sensor = ev3.ColorSensor(ev3.INPUT_4)
+        color_sensor.mode = ev3.ColorSensor.MODE_RGB_RAW
+        wings = ev3.Motor(ev3.OUTPUT_C)
+        wings.stop_action = ev3.Motor.STOP_ACTION_HOLD
+
+        super().__init__(left_motor, right_motor, wings, ultrasonic, color_sensor)
+
+    def led_brightness(self, name: str, brightness: int):
+        try:
+            handle = os.open(os.path.join(f"/sys/class/leds/led{name}:brick-status/brightness"), os.O_RDWR)
+            os.write(handle, str(brightness).encode())
+            os.lseek(handle, 0, os.SEEK_SET)
+            os.close(handle)
+        except OSError as e:
+            #print(e.strerror)
+            return
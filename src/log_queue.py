@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging for the brick: log records are handed to a writer thread through a bounded queue,
+# so a slow write to the SD card or the console never stalls the control loop or the paho
+# network thread. If the writer falls behind, records are sampled and finally dropped.
+
+# records waiting for the writer thread at most
+QUEUE_SIZE = 1000
+
+# once the queue is half full, only every SAMPLE_RATE-th record below WARNING is kept
+SAMPLE_RATE = 10
+
+# print INFO and above on the console, ROBOLAB_CONSOLE=0 turns it off during runs
+CONSOLE = os.environ.get("ROBOLAB_CONSOLE", "1") != "0"
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queues records for the writer thread, never blocks the logging thread
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_rate: int = SAMPLE_RATE):
+        super().__init__(log_queue)
+        self.sample_rate = sample_rate
+        self.overloaded = 0
+        # records not written because of sampling or a full queue
+        self.sampled = 0
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        # decided before the record is formatted, sampling has to be cheap
+        if record.levelno < logging.WARNING and self.queue.qsize() >= self.queue.maxsize // 2:
+            self.overloaded += 1
+            if self.overloaded % self.sample_rate:
+                self.sampled += 1
+                return
+
+        super().emit(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueLogging:
+    """
+    Installs the bounded queue on the root logger and writes the records to the log file
+    and the console in a background thread
+    """
+
+    def __init__(self, log_file: str, level: int = logging.DEBUG, console: bool = CONSOLE,
+                 queue_size: int = QUEUE_SIZE):
+        """
+        :param log_file: String
+        :param level: int, level of the log file
+        :param console: bool, print INFO and above on the console
+        :param queue_size: int, records waiting for the writer thread at most
+        """
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s: %(message)s'))
+        handlers = [file_handler]
+
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(logging.INFO)
+            handlers.append(console_handler)
+
+        self.handler = BoundedQueueHandler(queue.Queue(queue_size))
+        self.listener = QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(self.handler)
+        self.listener.start()
+
+    def stop(self):
+        """
+        Writes the remaining records and removes the queue from the root logger
+        """
+        if self.handler.sampled or self.handler.dropped:
+            logging.getLogger('RoboLab').warning(f"log overloaded: {self.handler.sampled} records sampled out, "
+                                                 f"{self.handler.dropped} dropped")
+
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
@@ -1,21 +1,40 @@
 #!/usr/bin/env python3
 
-from typing import Tuple
-import ev3dev.ev3 as ev3
+from typing import Dict, Tuple
 import logging
 import os
 import paho.mqtt.client as mqtt
 import uuid
 import signal
-from time import sleep
+import time
 
 from communication import Communication
-from odometry import Odometry, Node
-from planet import Direction, Planet, Weight
+from log_queue import QueueLogging
+from messages import TargetMessage, UnveiledBatch
+from odometry import Node
+from planet import Direction, Planet
 from robot import Robot
+from run_log import Record, RunRecorder
 
 client = None  # DO NOT EDIT
 
+def apply_events(com: Communication, planet: Planet) -> Dict[str, object]:
+    """
+    Drains the server messages in order of arrival, applies unveiled paths and targets to
+    the planet and returns the latest message of every other type
+    """
+    latest = {}
+
+    for event in com.drain_events():
+        if isinstance(event, UnveiledBatch):
+            planet.add_unveiled_paths(event.paths())
+        elif isinstance(event, TargetMessage):
+            planet.target = event.target
+        else:
+            latest[event.type] = event
+
+    return latest
+
 def run():
     # DO NOT CHANGE THESE VARIABLES
     #
@@ -28,38 +47,58 @@ def run():
                          clean_session=True,  # We want a clean session after disconnect or abort/crash
                          protocol=mqtt.MQTTv311  # Define MQTT protocol version
                          )
-    log_file = os.path.realpath(__file__) + '/../../logs/project.log'
-    logging.basicConfig(filename=log_file,  # Define log file
-                        level=logging.DEBUG,  # Define default mode
-                        format='%(asctime)s: %(message)s'  # Define default logging format
-                        )
-    logger = logging.getLogger('RoboLab')
-
-    # THE EXECUTION OF ALL CODE SHALL BE STARTED FROM WITHIN THIS FUNCTION.
-    # ADD YOUR OWN IMPLEMENTATION HEREAFTER.
-
-    # initialize objects
-    robot = Robot()
-    robot.calibrate()
-    planet = Planet()
-
-    com = Communication(client, logger)
-    #com.send_testplanet()
-
+    log_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'logs')
+    log_file = os.path.join(log_dir, 'project.log')
+    # written by a background thread, a slow SD card does not stall the robot
+    log = QueueLogging(log_file)
+    # the log is flushed and the recording closed even if the calibration or the connection fails
+    try:
+        logger = logging.getLogger('RoboLab')
+        recorder = RunRecorder(os.path.join(log_dir, f'run-{int(time.time())}.rlog'))
+        try:
+            # THE EXECUTION OF ALL CODE SHALL BE STARTED FROM WITHIN THIS FUNCTION.
+            # ADD YOUR OWN IMPLEMENTATION HEREAFTER.
+
+            # initialize objects
+            robot = Robot(recorder=recorder)
+            robot.calibrate()
+            planet = Planet()
+
+            com = Communication(client, logger, recorder=recorder)
+            #com.send_testplanet()
+
+            explore(robot, planet, com, logger)
+        finally:
+            recorder.close()
+    finally:
+        log.stop()
+
+def record_decision(robot: Robot, coords: Tuple[int, int], direction: Direction, follows_route: bool = False):
+    """
+    Records our choice at a node, before the server may change it
+    :param follows_route: bool, the next path of the route planned at an earlier node, see RunReplay
+    """
+    robot.recorder.record(Record.DECISION, coords[0], coords[1], -1 if direction is None else int(direction),
+                          follows_route)
+
+def explore(robot: Robot, planet: Planet, com: Communication, logger: logging.Logger, routes: bool = True) -> bool:
+    """
+    Explores the planet from the start line until the target is reached or everything is explored,
+    runs on the brick as well as in the simulator
+    :param routes: bool, drive known routes over several paths without stopping at the nodes in between
+    :return: bool, True if the server confirmed the end of the exploration
+    """
     # find first node and do routine
     node = robot.follow_line(False)
     com.send_ready()
+    com.wait_for("planet")
 
-    for _ in range(6):
-        if com.ready_msg_rcv:
-            com.ready_msg_rcv = False
-            break
-        sleep(0.5)
+    start_pos = apply_events(com, planet)["planet"].start
 
-    print(f"initial pos: {com.start_pos}")
-    robot.set_position(com.start_pos)
+    logger.info(f"initial pos: {start_pos}")
+    robot.set_position(start_pos)
 
-    first_node_coords, _ = com.start_pos
+    first_node_coords, _ = start_pos
     robot.set_first_node(first_node_coords, node)
 
     coords, direction = robot.get_position()
@@ -68,81 +107,107 @@ def run():
     planet.remove_direct(coords, Direction((int(direction) - 180) % 360))
 
     best_direction = planet.smartest_direction(coords)
+    record_decision(robot, coords, best_direction)
     com.send_pathSelect((coords, best_direction))
 
-    # TODO: use predicates to make wait loops redundant
-    for _ in range(6):
-        if com.pathSel_msg_rcv:
-            com.pathSel_msg_rcv = False
-            _, best_direction = com.start_pos
-            break
-        sleep(0.5)
+    if com.wait_for("pathSelect"):
+        _, best_direction = apply_events(com, planet)["pathSelect"].start
+
+    # remaining paths of a known route and the target it was planned for
+    route = []
+    route_target = None
 
     # main routine
     while True:
-        print("\n")
-
         old_coords, old_direction = robot.get_position()
         old_direction = best_direction
 
-        node = robot.explore_path(best_direction)
+        # known paths are driven faster, see Robot.cruise_speed
+        known_path = planet.get_paths().get(old_coords, {}).get(best_direction)
+        expected_length = None
+        if known_path is not None:
+            end_coords, end_direction, _ = known_path
+            expected_length = robot.expected_length((old_coords, best_direction), (end_coords, end_direction))
+
+        node = robot.explore_path(best_direction, planet.ports(old_coords), expected_length)
 
         new_coords, new_direction = robot.get_position()
 
-        if old_coords in planet.get_paths().keys():
-            if best_direction in planet.get_paths()[old_coords].keys():
-                known_path = planet.get_paths()[old_coords][best_direction]
-                new_coords, new_direction, _ = known_path
-                new_direction = Direction((int(new_direction) - 180) % 360)
+        if known_path is not None:
+            new_coords, new_direction, _ = known_path
+            new_direction = Direction((int(new_direction) - 180) % 360)
 
         path_status = "blocked" if node == Node.INVALID else "free"
 
         com.send_path((old_coords, old_direction), (new_coords, Direction((int(new_direction) - 180) % 360)), path_status)
 
-        sleep(3)
-        
-        com.path_msg_rcv = False
-
-        new_coords, new_direction = com.end_pos
-
-        planet.add_path((old_coords, old_direction), (new_coords, new_direction), com.path_weight)
+        # on a known route the next path is selected right away, the server answers both in one round trip
+        pipelined = (known_path is not None and path_status == "free" and bool(route)
+                     and route[0][0] == new_coords and planet.target == route_target)
+        if pipelined:
+            _, planned_direction = route.pop(0)
+            record_decision(robot, new_coords, planned_direction, follows_route=True)
+            com.send_pathSelect((new_coords, planned_direction))
+        else:
+            route = []
+
+        com.wait_for("path")
+        if not pipelined:
+            # pathUnveiled and target messages follow the path answer immediately
+            com.wait_idle(0.2)
+
+        events = apply_events(com, planet)
+        path = events.get("path")
+        if path is None:
+            logger.warning("Server did not answer our path...")
+            return False
+
+        new_coords, new_direction = path.end
+
+        planet.add_path((old_coords, old_direction), (new_coords, new_direction), path.weight)
+        if path_status == "free":
+            robot.path_lengths[(old_coords, old_direction)] = robot.last_path_length
+            robot.path_lengths[(new_coords, new_direction)] = robot.last_path_length
         robot.set_position((new_coords, Direction((int(new_direction) - 180) % 360)))
 
-        if com.unv_paths:
-            for unv_path in com.unv_paths:
-                start_pos, end_pos, _, weight = unv_path
-                start_coords, _ = start_pos
-                end_coords, _ = end_pos
-
-                planet.add_unveiled_node(start_coords)
-                planet.add_unveiled_node(end_coords)
-                planet.remove_unexplored_path(start_pos, end_pos)
-                planet.add_path(start_pos, end_pos, weight)
-
-            com.unv_paths.clear()
-
-        if com.target_msg_rcv:
-            com.target_msg_rcv = False
-            planet.target = com.target_pos
-
         if planet.should_scan(new_coords):
-            planet.add_node_scan(new_coords, robot.scan_directions())
+            planet.add_node_scan(new_coords, robot.scan_directions(planet.unknown_directions(new_coords)))
 
         planet.add_explored_node(new_coords)
         planet.remove_unexplored_path((old_coords, old_direction), (new_coords, new_direction))
 
-        best_direction = planet.smartest_direction(new_coords)
-        print(f"smartest direction: {best_direction}")
+        if pipelined:
+            # the path is already selected, the server may only change it
+            best_direction = planned_direction
+            com.wait_for("pathSelect")
+            # without wait_idle, targets sent after the path answer are only applied here
+            selected = apply_events(com, planet).get("pathSelect") or events.get("pathSelect")
+            if selected is not None:
+                _, best_direction = selected.start
+
+            # a new target or a path chosen by the server ends the route at the next node
+            if best_direction != planned_direction or planet.target != route_target:
+                route = []
+
+            logger.info(f"route direction: {best_direction}, {len(route)} paths left")
+            continue
+
+        route = planet.smartest_route(new_coords)
+        best_direction = route.pop(0)[1] if route else None
+        route_target = planet.target
+        if not routes:
+            route = []
+        record_decision(robot, new_coords, best_direction)
+        logger.info(f"smartest direction: {best_direction}")
         if best_direction is None:
             break
 
         com.send_pathSelect((new_coords, best_direction))
-        for _ in range(6):
-            if com.pathSel_msg_rcv:
-                com.pathSel_msg_rcv = False
-                _, best_direction = com.start_pos
-                break
-            sleep(0.5)
+        if com.wait_for("pathSelect"):
+            _, selected_direction = apply_events(com, planet)["pathSelect"].start
+            if selected_direction != best_direction:
+                route = []
+            best_direction = selected_direction
         
         robot.com_end_signal()
 
@@ -152,30 +217,31 @@ def run():
 
     if planet.on_target(new_coords):
         com.send_targetReached()
-        for _ in range(6):
-            if com.done_msg_rcv:
-                com.done_msg_rcv = False
-                done = True
-                break
-            sleep(0.5)
+        done = com.wait_for("done")
 
     if not done and planet.exploration_completed(new_coords):
         com.send_explorationCompleted()
-        for _ in range(6):
-            if com.done_msg_rcv:
-                com.done_msg_rcv = False
-                done = True
-                break
-            sleep(0.5)
+        done = com.wait_for("done")
 
     if not done:
-        print("Seems like there was an error...")
-        return
+        logger.warning("Seems like there was an error...")
+        return False
+
+    for msg_type, latencies in com.round_trips.items():
+        if latencies:
+            logger.debug(f"round trips {msg_type}: {len(latencies)}, avg {sum(latencies) / len(latencies) * 1000:.1f} ms")
+
+    for msg_type, (count, total, maximum) in com.parse_stats.items():
+        logger.debug(f"parsing {msg_type}: {count}, avg {total / count * 1e6:.0f} us, max {maximum * 1e6:.0f} us")
+
+    logger.debug(f"publish pipeline: {com.publish_stats()}")
 
     # celebrates finished exploration
-    print("Exploration completed!")
+    logger.info("Exploration completed!")
     robot.victory_dance()
 
+    return True
+
 # DO NOT EDIT
 def signal_handler(sig=None, frame=None, raise_interrupt=True):
     if client and client.is_connected():
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from typing import List, Tuple
+
+from planet import Direction, Weight
+
+# Parsed messages of the server, one small class per message type.
+# The objects are created on the paho network thread and handed to the main thread
+# through the event queue of Communication, they are never modified afterwards.
+
+Position = Tuple[Tuple[int, int], Direction]
+
+"""
+Coordinates of a node and a direction at that node
+"""
+
+
+def parse_position(payload: dict, prefix: str, direction_key: str = None) -> Position:
+    direction_key = direction_key or prefix + "Direction"
+    return (payload[prefix + "X"], payload[prefix + "Y"]), Direction(payload[direction_key])
+
+
+class PlanetMessage:
+    __slots__ = ("planet_name", "start")
+    type = "planet"
+
+    def __init__(self, payload: dict):
+        self.planet_name: str = payload["planetName"]
+        self.start: Position = parse_position(payload, "start", "startOrientation")
+
+    def __repr__(self):
+        return f"PlanetMessage({self.planet_name}, start: {self.start})"
+
+
+class PathMessage:
+    __slots__ = ("start", "end", "status", "weight")
+    type = "path"
+
+    def __init__(self, payload: dict):
+        self.start: Position = parse_position(payload, "start")
+        self.end: Position = parse_position(payload, "end")
+        self.status: str = payload["pathStatus"]
+        self.weight: Weight = payload["pathWeight"]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(start: {self.start}, end: {self.end}, status: {self.status}, weight: {self.weight})"
+
+
+class PathUnveiledMessage(PathMessage):
+    __slots__ = ()
+    type = "pathUnveiled"
+
+
+class UnveiledBatch:
+    """
+    Consecutive pathUnveiled messages of one burst of the server
+    """
+    __slots__ = ("messages",)
+    type = "pathUnveiled"
+
+    def __init__(self, messages: List[PathUnveiledMessage]):
+        self.messages = messages
+
+    def paths(self) -> List[Tuple[Position, Position, Weight]]:
+        return [(message.start, message.end, message.weight) for message in self.messages]
+
+    def __repr__(self):
+        return f"UnveiledBatch({self.messages})"
+
+
+class PathSelectMessage:
+    __slots__ = ("start",)
+    type = "pathSelect"
+
+    def __init__(self, payload: dict, coords: Tuple[int, int]):
+        """
+        :param payload: Dict, the server only sends the direction
+        :param coords: Tuple, node of our pending selection
+        """
+        self.start: Position = coords, Direction(payload["startDirection"])
+
+    def __repr__(self):
+        return f"PathSelectMessage(start: {self.start})"
+
+
+class TargetMessage:
+    __slots__ = ("target",)
+    type = "target"
+
+    def __init__(self, payload: dict):
+        self.target: Tuple[int, int] = payload["targetX"], payload["targetY"]
+
+    def __repr__(self):
+        return f"TargetMessage({self.target})"
+
+
+class DoneMessage:
+    __slots__ = ("message",)
+    type = "done"
+
+    def __init__(self, payload: dict):
+        self.message: str = payload["message"]
+
+    def __repr__(self):
+        return f"DoneMessage({self.message})"
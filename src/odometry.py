@@ -1,11 +1,14 @@
 # !/usr/bin/env python3
 
 from enum import IntEnum, unique
+import logging
 import math
 from typing import List, Tuple
-import ev3dev.ev3 as ev3
-from time import sleep, time
 from planet import Direction
+from pose_estimator import PoseEstimator
+from run_log import Record, Recorder
+
+logger = logging.getLogger('RoboLab.odometry')
 
 @unique
 class Node(IntEnum):
@@ -18,9 +21,11 @@ def distance_2d(vec1: Tuple[float, float], vec2: Tuple[float, float]):
 
 class Odometry:
 
-    def __init__(self, wheel_diameter: float, axis_length: float, count_per_rot_left: int, count_per_rot_right: int):
+    def __init__(self, wheel_diameter: float, axis_length: float, count_per_rot_left: int, count_per_rot_right: int,
+                 recorder: Recorder = None):
         """
         Initializes odometry module
+        :param recorder: Recorder, run log of the tacho samples and positions, disabled by default
         """
 
         self.position: Tuple[Tuple[int, int], Direction]
@@ -32,16 +37,49 @@ class Odometry:
         self.count_per_rot_left = count_per_rot_left
         self.count_per_rot_right = count_per_rot_right
 
+        self.recorder = recorder if recorder is not None else Recorder()
+        self.recorder.record(Record.ODOMETRY_CONFIG, wheel_diameter, axis_length, count_per_rot_left, count_per_rot_right)
+
+        # pose with uncertainty, only logged next to the grid rounding of calculate (in the simulator it never
+        # found a node the rounding missed), fed there with the samples of the path instead of in the control loop
+        self.estimator = PoseEstimator(wheel_diameter, axis_length, count_per_rot_left, count_per_rot_right)
+
     def get_direction(self):
         _, direction = self.position
         return direction
 
     def set_direction(self, direction: Direction):
         coords, _ = self.position
-        self.position = coords, direction
+        self.set_position((coords, direction))
+
+    def set_position(self, position: Tuple[Tuple[int, int], Direction]):
+        (x, y), direction = position
+        self.recorder.record(Record.POSITION, x, y, int(direction))
+        # the robot stands on the node, aligned on a line after turning there
+        self.estimator.turned()
+        self.estimator.observe_node((x, y))
+        self.estimator.observe_heading(math.radians(int(direction)))
+        self.position = position
+
+    def set_first_node(self, coords: Tuple[int, int], node: Node):
+        self.recorder.record(Record.FIRST_NODE, coords[0], coords[1], int(node))
+        self.first_node = coords, node
+
+    def add_motor_data(self, left_motor, right_motor):
+        sample = -left_motor.position, -right_motor.position
+        self.recorder.record(Record.TACHO, *sample)
+        self.data.append(sample)
+
+    def driven_distance(self) -> float:
+        """
+        Distance driven forward since the last node in cm, turning on the spot does not count
+        """
+        if len(self.data) < 2:
+            return 0.0
 
-    def add_motor_data(self, left_motor: ev3.Motor, right_motor: ev3.Motor):
-        self.data.append((-left_motor.position, -right_motor.position))
+        (first_left, first_right), (left, right) = self.data[0], self.data[-1]
+        # delta_motor_pos * deg * cm/deg as in calculate
+        return ((left - first_left) + (right - first_right)) / 2 * self.wheel_diameter * math.pi / 360
 
     def round_by_node_grid(self, x: float, y: float, node: Node):
         first_node_coords, first_node = self.first_node
@@ -63,6 +101,7 @@ class Odometry:
             else nearby_nodes[1])
 
     def calculate(self, node: Node):
+        self.recorder.record(Record.NODE, int(node))
         (x, y), direction = self.position
 
         # Motor.count_per_rot = 360 by default, to be measured if inaccurate
@@ -73,6 +112,9 @@ class Odometry:
         delta_x: float = 0
         delta_y: float = 0
 
+        for sample in self.data:
+            self.estimator.predict(*sample)
+
         for i in range(1, len(self.data)):
             prev_left_pos, prev_right_pos = self.data[i - 1]
             left_pos, right_pos = self.data[i]
@@ -94,7 +136,7 @@ class Odometry:
 
         delta_x /= 50
         delta_y /= 50
-        print(f"[ODOMETRY] moved approx. by ({delta_x}, {delta_y})")
+        logger.info(f"[ODOMETRY] moved approx. by ({delta_x}, {delta_y})")
 
         x += delta_x
         y += delta_y
@@ -106,4 +148,13 @@ class Odometry:
 
         self.position = new_coords, Direction(direction)
 
-        print(f"[ODOMETRY] new position: [{new_coords}, heading: {Direction(direction)}]")
\ No newline at end of file
+        logger.info(f"[ODOMETRY] new position: [{new_coords}, heading: {Direction(direction)}]")
+
+        first_node_coords, first_node = self.first_node
+        parity = sum(first_node_coords) % 2 if first_node == node else 1 - sum(first_node_coords) % 2
+        estimated = self.estimator.nearest_node(parity)
+        logger.info(f"[ODOMETRY] estimator: {estimated}, position +-{self.estimator.position_std():.1f} cm, "
+                    f"heading +-{self.estimator.heading_std():.1f} deg")
+        if estimated != new_coords:
+            logger.warning(f"[ODOMETRY] estimator expected node {estimated} instead of {new_coords}")
+        self.estimator.observe_node(new_coords)
\ No newline at end of file
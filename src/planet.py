@@ -2,10 +2,12 @@
 
 # Attention: Do not import the ev3dev.ev3 module in this file
 from copy import deepcopy
+import logging
 from enum import IntEnum, unique
-from importlib.resources import path
 from typing import List, Tuple, Dict, Union
 
+logger = logging.getLogger('RoboLab.planet')
+
 
 @unique
 class Direction(IntEnum):
@@ -51,7 +53,7 @@ class Planet():
         self.unexplored_directions[coords] = (possible_directions if coords not in self.paths.keys()
             else [direction for direction in possible_directions if direction not in self.paths[coords].keys()])
 
-        print(f"unexplored_dirs: {self.unexplored_directions[coords]}")
+        logger.info(f"unexplored_dirs: {self.unexplored_directions[coords]}")
 
     def add_unveiled_node(self, coords: Tuple[int, int]):
         if coords not in self.explored_nodes and coords not in self.unveiled_nodes:
@@ -65,6 +67,15 @@ class Planet():
 
         return not coords in self.explored_nodes
 
+    def unknown_directions(self, coords: Tuple[int, int]) -> List[Direction]:
+        # directions without a known path, only these need to be scanned
+        return [direction for direction in Direction if direction not in self.paths.get(coords, {})]
+
+    def ports(self, coords: Tuple[int, int]) -> List[Direction]:
+        # directions with a line at the node as far as known: paths and scanned, unexplored directions
+        known = set(self.paths.get(coords, {})) | set(self.unexplored_directions.get(coords, []))
+        return [direction for direction in Direction if direction in known]
+
     def on_target(self, coords: Tuple[int, int]):
         return self.target == coords
 
@@ -83,21 +94,26 @@ class Planet():
         return True
 
     def add_path(self, start: Tuple[Tuple[int, int], Direction], target: Tuple[Tuple[int, int], Direction], weight: int):
-        start_coord, start_direct = start
-        target_coord, target_direct = target
+        self.add_paths([(start, target, weight)])
 
-        if start_coord not in self.paths.keys():
-            self.paths[start_coord] = {}
+    # adds a batch of paths, unveiled nodes are only updated once per batch
+    def add_paths(self, paths: List[Tuple[Tuple[Tuple[int, int], Direction], Tuple[Tuple[int, int], Direction], int]]):
+        for start, target, weight in paths:
+            start_coord, start_direct = start
+            target_coord, target_direct = target
 
-        self.paths[start_coord][start_direct] = (target_coord, target_direct, weight)
-                    
-        # adds inverse of path to dict, because of the bidirectionality of paths 
+            if start_coord not in self.paths.keys():
+                self.paths[start_coord] = {}
 
-        if target_coord not in self.paths.keys():
-            self.paths[target_coord] = {}
+            self.paths[start_coord][start_direct] = (target_coord, target_direct, weight)
+
+            # adds inverse of path to dict, because of the bidirectionality of paths
+
+            if target_coord not in self.paths.keys():
+                self.paths[target_coord] = {}
+
+            self.paths[target_coord][target_direct] = (start_coord, start_direct, weight)
 
-        self.paths[target_coord][target_direct] = (start_coord, start_direct, weight)
-        
         updated_unveiled_nodes = []
 
         for unveiled_node in self.unveiled_nodes:
@@ -109,6 +125,18 @@ class Planet():
 
         self.unveiled_nodes = updated_unveiled_nodes
 
+    # adds a batch of paths unveiled by the server, their end nodes become unveiled nodes
+    def add_unveiled_paths(self, paths: List[Tuple[Tuple[Tuple[int, int], Direction], Tuple[Tuple[int, int], Direction], int]]):
+        for start, target, _ in paths:
+            start_coords, _ = start
+            target_coords, _ = target
+
+            self.add_unveiled_node(start_coords)
+            self.add_unveiled_node(target_coords)
+            self.remove_unexplored_path(start, target)
+
+        self.add_paths(paths)
+
     def remove_direct(self, coord: Tuple[int, int], direct: Direction):
         if coord not in self.unexplored_directions.keys():
            return
@@ -116,7 +144,7 @@ class Planet():
             self.unexplored_directions[coord].remove(direct)
 
     def remove_unexplored_path(self, start: Tuple[Tuple[int, int], Direction], target: Tuple[Tuple[int, int], Direction]):
-        print(f"path explored: start: {start}, target: {target}")
+        logger.info(f"path explored: start: {start}, target: {target}")
 
         start_coord, start_direct = start
         self.remove_direct(start_coord, start_direct)
@@ -192,22 +220,30 @@ class Planet():
         return self.backtrack(start, target, best_previous_nodes)
 
     def smartest_direction(self, start: Tuple[int, int]) -> Union[None, Direction]:
+        route = self.smartest_route(start)
+        if not route:
+            return None
+
+        _, direction = route[0]
+        return direction
+
+    def smartest_route(self, start: Tuple[int, int]) -> List[Tuple[Tuple[int, int], Direction]]:
+        # the whole way smartest_direction leads to, every path but the first one is known
         if self.target:
             if start == self.target:
-                return None
+                return []
 
             shortest_path = self.shortest_path(start, self.target)
             if shortest_path is not None:
-                _, direction = shortest_path[0]
-                return direction
+                return shortest_path
 
         #print(self.unexplored_directions)
 
         # take unexplored direciton on current node
         if start in self.unexplored_directions.keys():
             if self.unexplored_directions[start]:
-                print("taking unexplored direction on current node")
-                return self.unexplored_directions[start][0]
+                logger.info("taking unexplored direction on current node")
+                return [(start, self.unexplored_directions[start][0])]
 
         # strategy:
         # take direction to shortest path leading to either the nearest unveiled, yet unexplored node
@@ -225,11 +261,11 @@ class Planet():
             possible_nodes_costs[unveiled_node] = shortest_path_costs[unveiled_node]
 
         if not possible_nodes_costs:
-            return None
+            return []
 
         if min(possible_nodes_costs.values()) == float('inf'):
-            print("no reachable nodes...")
-            return None
+            logger.info("no reachable nodes...")
+            return []
 
         target = None
         shortest_path_cost = float('inf')
@@ -239,7 +275,5 @@ class Planet():
                 shortest_path_cost = cost
                 target = coords
 
-        _, direction = self.backtrack(start, target, best_previous_nodes)[0]
-
-        print("taking direction to nearest unexplored node or direction")
-        return direction
\ No newline at end of file
+        logger.info("taking direction to nearest unexplored node or direction")
+        return self.backtrack(start, target, best_previous_nodes)
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import random
+from typing import List, Tuple
+
+from planet import Direction, Planet
+
+# neighbour offsets of the directions
+OFFSETS = {
+    Direction.NORTH: (0, 1),
+    Direction.EAST: (1, 0),
+    Direction.SOUTH: (0, -1),
+    Direction.WEST: (-1, 0),
+}
+
+
+def opposite(direction: Direction) -> Direction:
+    return Direction((int(direction) + 180) % 360)
+
+
+def generate_planet(width: int, height: int, seed: int = 0, loop_density: float = 0.3, blocked: float = 0.1,
+                    self_loops: float = 0.02, parallel_edges: float = 0.02,
+                    max_weight: int = 10) -> Tuple[Planet, Tuple[Tuple[int, int], Direction]]:
+    """
+    Generates a connected grid planet, the same seed always gives the same planet
+    :param width: int, nodes in x direction
+    :param height: int, nodes in y direction
+    :param seed: int
+    :param loop_density: float, probability of a grid edge outside the spanning tree to exist
+    :param blocked: float, probability of such an extra edge to be blocked
+    :param self_loops: float, probability of a node to get a path back to itself
+    :param parallel_edges: float, probability of a second path between two connected neighbours
+    :param max_weight: int
+    :return: Tuple, planet and start position (node and orientation) like the server sends it
+    """
+    rng = random.Random(seed)
+    planet = Planet()
+
+    # the start line enters (0, 0) from the south
+    start = (0, 0), Direction.NORTH
+    used = {((0, 0), Direction.SOUTH)}
+    paths: List[Tuple[Tuple[Tuple[int, int], Direction], Tuple[Tuple[int, int], Direction], int]] = []
+
+    def connect(start_pos, target_pos, weight):
+        used.add(start_pos)
+        used.add(target_pos)
+        paths.append((start_pos, target_pos, weight))
+
+    def free(coords, direction):
+        return (coords, direction) not in used
+
+    grid_edges = []
+    for x in range(width):
+        for y in range(height):
+            if x + 1 < width:
+                grid_edges.append(((x, y), Direction.EAST))
+            if y + 1 < height:
+                grid_edges.append(((x, y), Direction.NORTH))
+    rng.shuffle(grid_edges)
+
+    # random spanning tree (Kruskal) keeps the planet connected
+    parents = {}
+
+    def find(coords):
+        root = coords
+        while parents.get(root, root) != root:
+            root = parents[root]
+        while coords != root:
+            parents[coords], coords = root, parents.get(coords, coords)
+        return root
+
+    extra_edges = []
+    for coords, direction in grid_edges:
+        dx, dy = OFFSETS[direction]
+        neighbour = coords[0] + dx, coords[1] + dy
+
+        root, neighbour_root = find(coords), find(neighbour)
+        if root != neighbour_root:
+            parents[root] = neighbour_root
+            connect((coords, direction), (neighbour, opposite(direction)), rng.randint(1, max_weight))
+        else:
+            extra_edges.append(((coords, direction), (neighbour, opposite(direction))))
+
+    # loops, some of them blocked
+    for start_pos, target_pos in extra_edges:
+        if rng.random() < loop_density:
+            connect(start_pos, target_pos, -1 if rng.random() < blocked else rng.randint(1, max_weight))
+
+    # second paths between neighbours over their free side ports
+    for (coords, direction), (neighbour, _), _ in list(paths):
+        if coords == neighbour or rng.random() >= parallel_edges:
+            continue
+        for side in (Direction((int(direction) + 90) % 360), Direction((int(direction) + 270) % 360)):
+            if free(coords, side) and free(neighbour, side):
+                connect((coords, side), (neighbour, side), rng.randint(1, max_weight))
+                break
+
+    for x in range(width):
+        for y in range(height):
+            if rng.random() >= self_loops:
+                continue
+            ports = [direction for direction in Direction if free((x, y), direction)]
+            if len(ports) >= 2:
+                first, second = rng.sample(ports, 2)
+                connect(((x, y), first), ((x, y), second), rng.randint(1, max_weight))
+
+    planet.add_paths(paths)
+    return planet, start
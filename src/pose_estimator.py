@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Extended Kalman filter for the pose of the robot between and at nodes
+
+The pose is x, y in cm and the heading in radians clockwise from north, as in Odometry.calculate.
+The covariance is kept as the six values of the symmetric 3x3 matrix, so one update is a few dozen
+float operations in plain Python, cheap enough for every tacho sample on the brick.
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import math
+from typing import Optional, Tuple
+
+# cm between two nodes
+GRID_SIZE = 50
+
+# variance of a wheel distance in cm^2 per cm driven
+WHEEL_NOISE = 0.02
+# standard deviation of the position where a node is detected in cm
+NODE_STD = 2.0
+# standard deviation of the heading when aligned on a line in radians
+LINE_STD = math.radians(5)
+
+# covariance of a pose nobody told us yet
+UNKNOWN_VARIANCE = 1e6
+
+
+def wrap(angle: float) -> float:
+    """
+    Angle in radians between -pi and pi
+    """
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class PoseEstimator:
+
+    def __init__(self, wheel_diameter: float, axis_length: float, count_per_rot_left: int, count_per_rot_right: int):
+        """
+        Starts with an unknown pose, the first observations set it
+        """
+        self.axis_length = axis_length
+        self.cm_per_count_left = wheel_diameter * math.pi / count_per_rot_left
+        self.cm_per_count_right = wheel_diameter * math.pi / count_per_rot_right
+
+        self.x = 0.0
+        self.y = 0.0
+        self.theta = 0.0
+        # upper triangle of the covariance: xx, xy, xt, yy, yt, tt
+        self.p = [UNKNOWN_VARIANCE, 0.0, 0.0, UNKNOWN_VARIANCE, 0.0, UNKNOWN_VARIANCE]
+
+        self.last_sample: Optional[Tuple[int, int]] = None
+
+    def predict(self, left: int, right: int):
+        """
+        Moves the pose by the tacho increments since the last sample and grows the covariance
+        :param left: int, tacho count of the left wheel, positive forward like Odometry.data
+        :param right: int
+        """
+        if self.last_sample is None:
+            self.last_sample = left, right
+            return
+
+        last_left, last_right = self.last_sample
+        self.last_sample = left, right
+        distance_left = (left - last_left) * self.cm_per_count_left
+        distance_right = (right - last_right) * self.cm_per_count_right
+        if distance_left == 0 and distance_right == 0:
+            return
+
+        # same kinematics as Odometry.calculate, the heading turns by -alpha
+        alpha = (distance_right - distance_left) / self.axis_length
+        distance = (distance_left + distance_right) / 2
+        middle = self.theta - alpha / 2
+        sin, cos = math.sin(middle), math.cos(middle)
+
+        self.x += sin * distance
+        self.y += cos * distance
+        self.theta = wrap(self.theta - alpha)
+
+        # P = F P F^T with F = [[1, 0, a], [0, 1, b], [0, 0, 1]]
+        a, b = cos * distance, -sin * distance
+        xx, xy, xt, yy, yt, tt = self.p
+        xx += 2 * a * xt + a * a * tt
+        xy += a * yt + b * xt + a * b * tt
+        xt += a * tt
+        yy += 2 * b * yt + b * b * tt
+        yt += b * tt
+
+        # + Q, wheel noise along the heading and on the heading
+        driven = abs(distance_left) + abs(distance_right)
+        along = WHEEL_NOISE * driven / 4
+        xx += along * sin * sin
+        xy += along * sin * cos
+        yy += along * cos * cos
+        tt += WHEEL_NOISE * driven / (self.axis_length * self.axis_length)
+
+        self.p = [xx, xy, xt, yy, yt, tt]
+
+    def turned(self):
+        """
+        The robot turned without tacho samples (e.g. on a node), the heading is unknown until it is observed
+        and the next sample starts a new increment
+        """
+        self.last_sample = None
+        self.p[5] = UNKNOWN_VARIANCE
+
+    def observe_position(self, x: float, y: float, std: float = NODE_STD):
+        """
+        Fuses a measured position in cm
+        """
+        xx, xy, xt, yy, yt, tt = self.p
+        variance = std * std
+
+        # S = H P H^T + R and its inverse, H takes x and y
+        s_xx, s_xy, s_yy = xx + variance, xy, yy + variance
+        determinant = s_xx * s_yy - s_xy * s_xy
+        i_xx, i_xy, i_yy = s_yy / determinant, -s_xy / determinant, s_xx / determinant
+
+        # K = P H^T S^-1, one row per state
+        k_xx, k_xy = xx * i_xx + xy * i_xy, xx * i_xy + xy * i_yy
+        k_yx, k_yy = xy * i_xx + yy * i_xy, xy * i_xy + yy * i_yy
+        k_tx, k_ty = xt * i_xx + yt * i_xy, xt * i_xy + yt * i_yy
+
+        dx, dy = x - self.x, y - self.y
+        self.x += k_xx * dx + k_xy * dy
+        self.y += k_yx * dx + k_yy * dy
+        self.theta = wrap(self.theta + k_tx * dx + k_ty * dy)
+
+        # P = (I - K H) P
+        self.p = [xx - k_xx * xx - k_xy * xy,
+                  xy - k_xx * xy - k_xy * yy,
+                  xt - k_xx * xt - k_xy * yt,
+                  yy - k_yx * xy - k_yy * yy,
+                  yt - k_yx * xt - k_yy * yt,
+                  tt - k_tx * xt - k_ty * yt]
+
+    def observe_heading(self, theta: float, std: float = LINE_STD):
+        """
+        Fuses a measured heading in radians, e.g. the direction of the line the robot is aligned on
+        """
+        xx, xy, xt, yy, yt, tt = self.p
+        s = tt + std * std
+        k_x, k_y, k_t = xt / s, yt / s, tt / s
+
+        innovation = wrap(theta - self.theta)
+        self.x += k_x * innovation
+        self.y += k_y * innovation
+        self.theta = wrap(self.theta + k_t * innovation)
+
+        self.p = [xx - k_x * xt, xy - k_x * yt, xt - k_x * tt, yy - k_y * yt, yt - k_y * tt, tt - k_t * tt]
+
+    def observe_node(self, coords: Tuple[int, int], std: float = NODE_STD):
+        """
+        Fuses the detection of a node at known coordinates, e.g. the end of a known path
+        """
+        self.observe_position(coords[0] * GRID_SIZE, coords[1] * GRID_SIZE, std)
+
+    def nearest_node(self, parity: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Most likely node for the current pose, by Mahalanobis distance so that the direction
+        the robot is unsure about counts less
+        :param parity: int, (x + y) % 2 of the node given by its colour, any node if None
+        :return: Tuple, coordinates
+        """
+        xx, xy, _, yy, _, _ = self.p
+        variance = NODE_STD * NODE_STD
+        xx, yy = xx + variance, yy + variance
+        determinant = xx * yy - xy * xy
+
+        x, y = self.x / GRID_SIZE, self.y / GRID_SIZE
+        candidates = [(node_x, node_y) for node_x in range(math.floor(x) - 1, math.ceil(x) + 2)
+                      for node_y in range(math.floor(y) - 1, math.ceil(y) + 2)
+                      if parity is None or (node_x + node_y) % 2 == parity]
+
+        def distance(node: Tuple[int, int]) -> float:
+            dx, dy = node[0] * GRID_SIZE - self.x, node[1] * GRID_SIZE - self.y
+            return (yy * dx * dx - 2 * xy * dx * dy + xx * dy * dy) / determinant
+
+        return min(candidates, key=distance)
+
+    def position_std(self) -> float:
+        """
+        Standard deviation of the position in cm along the most uncertain axis
+        """
+        xx, xy, _, yy, _, _ = self.p
+        mean = (xx + yy) / 2
+        return math.sqrt(mean + math.sqrt(((xx - yy) / 2) ** 2 + xy * xy))
+
+    def heading_std(self) -> float:
+        """
+        Standard deviation of the heading in degrees
+        """
+        return math.degrees(math.sqrt(self.p[5]))
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+"""
+Start time of the running process, the robot logs how long it took to be ready
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import os
+from typing import Optional
+
+
+def seconds_since_start() -> Optional[float]:
+    """
+    Wall clock seconds since this process was started, None if the system does not tell (not Linux)
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # the fields after the command name, starttime is field 22 of the whole line
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
@@ -1,10 +1,13 @@
-import os
-from time import sleep
-import ev3dev.ev3 as ev3
+import logging
 import math
-from typing import List, Tuple
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from hardware import EV3Hardware, Hardware
 from odometry import Odometry, Node
 from planet import Direction
+from run_log import Record, Recorder, scan_bits
+from process_start import seconds_since_start
+
+logger = logging.getLogger('RoboLab.robot')
 
 def grayscale(color: Tuple[int, int, int]):
     # weights: 30% red, 60% green, 10% blue
@@ -16,11 +19,56 @@ def color_average(color1: Tuple[int, int, int], color2: Tuple[int, int, int]):
 def euclidian_diff(color1: Tuple[int, int, int], color2: Tuple[int, int, int]):
     return math.sqrt((color1[0] - color2[0])**2 + (color1[1] - color2[1])**2 + (color1[2] - color2[2])**2)
 
+def plan_scan(offsets: List[int]) -> Tuple[int, int, int, int]:
+    """
+    Shortest rotation that sweeps over the sectors (+-45 degrees) of the given directions and ends on a direction
+    :param offsets: List, directions to scan in degrees of rotate, 0 is the current direction
+    :return: Tuple, rotation to the first sector edge, degrees and number of sector sweeps, rotation at the end
+             (all relative to the current direction)
+    """
+    best = None
+    for step in (90, -90):
+        for first in range(0, 360, 90):
+            sectors = [(first + i * step) % 360 for i in range(4)]
+            count = max(sectors.index(offset % 360) for offset in offsets) + 1
+            start = (first - step // 2 + 180) % 360 - 180
+            edge = start + count * step
+            # finish on one of the two directions next to the last edge, preferably the one we came from
+            end = min(edge - 45, edge + 45, key=lambda angle: abs((angle + 180) % 360 - 180))
+            cost = (abs(start) + count * 90 + 45, abs((end + 180) % 360 - 180))
+            if best is None or cost < best[0]:
+                best = (cost, (start, step, count, end))
+
+    return best[1]
+
+
+class LineCrossing(NamedTuple):
+    direction: Direction
+    # degrees like Direction, where the middle of the line was seen
+    angle: float
+    # 1 if the line is exactly in the direction, 0 if it is halfway to the next one
+    confidence: float
+
+
+def heading_drift(crossings: List[LineCrossing]) -> float:
+    """
+    Confidence weighted mean deviation of the crossed lines from their directions,
+    positive if the lines were seen clockwise of their directions
+    """
+    weight = sum(crossing.confidence for crossing in crossings)
+    if weight == 0:
+        return 0.0
+    return sum(((crossing.angle - int(crossing.direction) + 180) % 360 - 180) * crossing.confidence
+               for crossing in crossings) / weight
+
+
 class Robot:
 
-    def __init__(self):
+    def __init__(self, hardware: Hardware = None, recorder: Recorder = None):
         """
         Initializes robot module
+        :param hardware: Hardware, the brick by default
+        :param recorder: Recorder, run log of samples and scans, disabled by default
         """
         
         self.K_PROPORTIONAL = 4.5 / 6
@@ -33,25 +81,41 @@ class Robot:
         self.WHEEL_DIAMETER = 5.6
         self.COLOR_ERROR = 50
         self.SPEED = 200
+        # turns to a path, align_line finds the line at the end
+        self.TURN_SPEED = 400
+        self.TURN_OVERSHOOT = 20
+        # speed up on known paths, back to SPEED before the expected node (cm)
+        self.FAST_SPEED = 400
+        self.RAMP_DISTANCE = 10
+        self.SLOW_DISTANCE = 20
+        self.GRID_SIZE = 50
+        # scan with one smooth rotation instead of a stop per direction, off until it is measured on the brick:
+        # the simulator has no motor inertia, there both scans find the same lines in the same time
+        # (73.3 s and 73.4 s of scanning on 8 planets), the heading drift is only logged for that measurement
+        self.CONTINUOUS_SCAN = False
 
         # temp hardcode
         self.RED_NODE_COLOR = (126, 29, 55)#(165, 55, 75)
         self.BLUE_NODE_COLOR = (28, 100, 212)#(20, 88, 223)
         self.PATH_COLOR = (115, 161, 267)
 
-        self.left_motor = ev3.Motor(ev3.OUTPUT_B)
-        self.left_motor.reset()
-        self.right_motor = ev3.Motor(ev3.OUTPUT_A)
-        self.right_motor.reset()
-        self.ultrasonic = ev3.UltrasonicSensor(ev3.INPUT_2)
-        self.ultrasonic.mode = ev3.UltrasonicSensor.MODE_US_DIST_CM
-        self.color_sensor = ev3.ColorSensor(ev3.INPUT_4)
-        self.color_sensor.mode = ev3.ColorSensor.MODE_RGB_RAW
-        self.wings = ev3.Motor(ev3.OUTPUT_C)
-        self.wings.stop_action = ev3.Motor.STOP_ACTION_HOLD
+        self.hardware = hardware if hardware is not None else EV3Hardware()
+        self.sleep = self.hardware.sleep
+        self.recorder = recorder if recorder is not None else Recorder()
+        # lines seen by the last continuous scan
+        self.line_crossings: List[LineCrossing] = []
+        # measured length of the driven paths in cm by both of their ends
+        self.path_lengths: Dict[Tuple[Tuple[int, int], Direction], float] = {}
+        self.last_path_length = 0.0
+
+        self.left_motor = self.hardware.left_motor
+        self.right_motor = self.hardware.right_motor
+        self.ultrasonic = self.hardware.ultrasonic
+        self.color_sensor = self.hardware.color_sensor
+        self.wings = self.hardware.wings
 
         self.odometry = Odometry(self.WHEEL_DIAMETER, self.AXIS_LENGTH,
-            self.left_motor.count_per_rot, self.right_motor.count_per_rot)
+            self.left_motor.count_per_rot, self.right_motor.count_per_rot, self.recorder)
         
         self.PATH_COLOR_GRAYSCALE = grayscale(self.PATH_COLOR)
 
@@ -61,14 +125,19 @@ class Robot:
         self.led_brightness("0:red", 255)
         self.led_brightness("1:red", 255)
 
+        # motors are reset and ready for the first command
+        started = seconds_since_start()
+        if started is not None:
+            logger.info(f"robot ready {started:.2f} s after start")
+
     def get_position(self):
         return self.odometry.position
 
     def set_position(self, position: Tuple[Tuple[int, int], Direction]):
-        self.odometry.position = position
+        self.odometry.set_position(position)
 
     def set_first_node(self, position: Tuple[int, int], node: Node):
-        self.odometry.first_node = position, node
+        self.odometry.set_first_node(position, node)
 
     def calibrate(self):
         answer = input("scan? (y/n)")
@@ -76,19 +145,19 @@ class Robot:
             return
 
         input("place on red, confirm to scan")
-        self.RED_NODE = self.scan_color(); print(f"red: {self.RED_NODE}")
+        self.RED_NODE = self.scan_color(); logger.info(f"red: {self.RED_NODE}")
         input("place on blue, confirm to scan")
-        self.BLUE_NODE = self.scan_color(); print(f"blue: {self.BLUE_NODE}")
+        self.BLUE_NODE = self.scan_color(); logger.info(f"blue: {self.BLUE_NODE}")
         input("place on white, confirm to scan")
-        white = self.scan_color(); print(f"white: {white}")
+        white = self.scan_color(); logger.info(f"white: {white}")
         input("place on black/line, confirm to scan")
-        black = self.scan_color(); print(f"black: {black}")
+        black = self.scan_color(); logger.info(f"black: {black}")
         self.PATH_COLOR = color_average(white, black)
         self.PATH_COLOR_GRAYSCALE = grayscale(self.PATH_COLOR)
 
     # own implmentation of wait_until_not_moving because if speed is already 0 wait_until_not_moving does not return
-    def wait_for_stop(self, motors: List[ev3.Motor]):
-        sleep(0.1)
+    def wait_for_stop(self, motors: List):
+        self.sleep(0.1)
         while True:
             for motor in motors:
                 if motor.speed != 0:
@@ -96,17 +165,37 @@ class Robot:
             else:
                 return
         
-    def rotate(self, degrees: int, turn_left_side: bool = False, factor: float = 1):
+    def rotate(self, degrees: int, turn_left_side: bool = False, factor: float = 1, speed: int = None):
         if turn_left_side:
             degrees = degrees % 360
 
         degrees *= factor
+        speed = speed or self.SPEED
 
         # higher precision than with timing
         relative_position = degrees * self.TACHO_PER_DEGREE
 
-        self.left_motor.run_to_rel_pos(speed_sp=self.SPEED, position_sp=relative_position)
-        self.right_motor.run_to_rel_pos(speed_sp=self.SPEED, position_sp=-relative_position)
+        self.left_motor.run_to_rel_pos(speed_sp=speed, position_sp=relative_position)
+        self.right_motor.run_to_rel_pos(speed_sp=speed, position_sp=-relative_position)
+
+    def plan_turn(self, direction: Direction, ports: Iterable[Direction] = None) -> float:
+        """
+        Shortest rotation to a path that leaves the line on the side align_line turns to
+        :param direction: Direction, path to turn to
+        :param ports: Iterable, directions with a line at the node, unknown if None
+        :return: float, degrees of rotate
+        """
+        degrees = (int(self.odometry.get_direction()) - int(direction)) % 360
+
+        # align_line keeps turning this way until the line, stop short of it
+        if degrees <= 180:
+            return degrees * 0.85
+
+        # turning the other way, go past the line so align_line turns back to it,
+        # twice as far if there is no line behind it to catch by mistake
+        beyond = Direction((int(direction) + 90) % 360)
+        overshoot = self.TURN_OVERSHOOT if ports is None or beyond in ports else 2 * self.TURN_OVERSHOOT
+        return degrees - 360 - overshoot
 
     def axis_correction(self, offset: float = 0, collect_data: bool = True):
         wheel_rotation = (self.SENSOR_AXIS_DISTANCE + offset) / (self.WHEEL_DIAMETER * math.pi)
@@ -121,9 +210,44 @@ class Robot:
         self.wings.run_to_rel_pos(speed_sp=700, position_sp=self.wings.count_per_rot*3)
         self.wait_for_stop([self.wings])
 
-    def explore_path(self, direction: Direction) -> Node:
-        print(f"explore: init dir: {int(self.odometry.get_direction())}, new dir: {int(direction)}")
-        self.rotate(int(self.odometry.get_direction()) - int(direction), True, 0.85)
+    def expected_length(self, start: Tuple[Tuple[int, int], Direction],
+                        end: Tuple[Tuple[int, int], Direction]) -> float:
+        """
+        Length of a known path in cm, as measured or at least the straight line between its nodes
+        """
+        measured = self.path_lengths.get(start) or self.path_lengths.get(end)
+        if measured:
+            return measured
+
+        (x1, y1), _ = start
+        (x2, y2), _ = end
+        return math.hypot(x2 - x1, y2 - y1) * self.GRID_SIZE
+
+    def cruise_speed(self, driven: float, expected_length: float = None) -> float:
+        """
+        Speed profile of follow_line: SPEED on unknown paths, on known paths ramps up to FAST_SPEED
+        and down again to SPEED before the expected node
+        :param driven: float, cm since the last node
+        :param expected_length: float, cm, None if the path is unknown
+        """
+        if expected_length is None:
+            return self.SPEED
+
+        remaining = expected_length - driven
+        ramp = min(1.0, driven / self.RAMP_DISTANCE, (remaining - self.SLOW_DISTANCE) / self.RAMP_DISTANCE)
+        return self.SPEED + (self.FAST_SPEED - self.SPEED) * max(0.0, ramp)
+
+    def explore_path(self, direction: Direction, ports: Iterable[Direction] = None,
+                     expected_length: float = None) -> Node:
+        """
+        Turns to the path in the given direction and follows it to the next node
+        :param direction: Direction
+        :param ports: Iterable, directions with a line at the node, see plan_turn
+        :param expected_length: float, cm of a known path, see cruise_speed
+        :return: Node, INVALID if the path is blocked
+        """
+        logger.info(f"explore: init dir: {int(self.odometry.get_direction())}, new dir: {int(direction)}")
+        self.rotate(self.plan_turn(direction, ports), speed=self.TURN_SPEED)
         self.wait_for_stop([self.left_motor, self.right_motor])
 
         self.align_line()
@@ -137,32 +261,104 @@ class Robot:
             self.odometry.set_direction(Direction((int(self.odometry.get_direction()) - 180) % 360))
             return Node.INVALID
 
-        return self.follow_line()
+        return self.follow_line(expected_length=expected_length)
+
+    def scan_directions(self, directions: List[Direction] = None) -> Dict[Direction, bool]:
+        """
+        Looks for lines in the given directions by sweeping only over their sectors, see plan_scan
+        :param directions: List, all directions by default
+        :return: Dict, line found per scanned direction
+        """
+        if directions is None:
+            directions = list(Direction)
+        if not directions:
+            return {}
+
+        heading = int(self.odometry.get_direction())
+        start, step, count, end = plan_scan([(heading - int(direction)) % 360 for direction in directions])
 
-    def scan_directions(self):
         # prevent scanning of current line
-        self.rotate(-45)
+        self.rotate(start)
         self.wait_for_stop([self.left_motor, self.right_motor])
 
         direction_data = {}
 
-        for i in range(len(Direction)):
-            current_direction = Direction((int(self.odometry.get_direction()) - i * 90) % 360)
-            direction_data[current_direction] = self.scan_line(90)
+        if self.CONTINUOUS_SCAN:
+            self.line_crossings = self.sweep_lines(heading, start, count * step)
+            found = {crossing.direction for crossing in self.line_crossings}
+            logger.info(f"lines: {self.line_crossings}, heading drift: {heading_drift(self.line_crossings):.1f}")
 
-        # undo setup rotation
-        self.rotate(45)
+        for i in range(count):
+            current_direction = Direction((heading - start - step // 2 - i * step) % 360)
+            if self.CONTINUOUS_SCAN:
+                direction_data[current_direction] = current_direction in found
+            else:
+                direction_data[current_direction] = self.scan_line(step)
+
+        # undo setup rotation, the shortest way to a direction
+        self.rotate(end - start - count * step)
         self.wait_for_stop([self.left_motor, self.right_motor])
+        self.odometry.set_direction(Direction((heading - end) % 360))
+
+        (x, y), _ = self.odometry.position
+        self.recorder.record(Record.SCAN, x, y, scan_bits(direction_data))
 
         return direction_data
 
+    def sweep_lines(self, heading: int, start: int, degrees: int) -> List[LineCrossing]:
+        """
+        Rotates without stopping and samples the colour sensor at full rate,
+        the lines are mapped to directions by the tacho positions where they were crossed
+        :param heading: int, direction before the scan
+        :param start: int, degrees the robot is already rotated away from heading
+        :param degrees: int, rotation of the sweep
+        :return: List, best crossing per direction
+        """
+        origin = self.left_motor.position
+        self.rotate(degrees)
+
+        self.sleep(0.1)
+
+        crossings = []
+        entry = None
+        while True:
+            dark = grayscale(self.scan_color()) <= 100
+            tacho = self.left_motor.position - origin
+
+            if dark and entry is None:
+                entry = tacho
+            elif not dark and entry is not None:
+                crossings.append((entry, tacho))
+                entry = None
+
+            if self.left_motor.speed == 0 or self.right_motor.speed == 0:
+                break
+
+        if entry is not None:
+            crossings.append((entry, tacho))
+
+        best = {}
+        for entry, exit in crossings:
+            offset = start + (entry + exit) / 2 / self.TACHO_PER_DEGREE
+            nearest = round(offset / 90) * 90
+            crossing = LineCrossing(Direction((heading - nearest) % 360), (heading - offset) % 360,
+                                    max(0.0, 1 - abs(offset - nearest) / 45))
+            self.recorder.record(Record.CROSSING, entry, exit, crossing.angle, crossing.confidence)
+
+            if crossing.direction not in best or crossing.confidence > best[crossing.direction].confidence:
+                best[crossing.direction] = crossing
+
+        return list(best.values())
+
     def scan_color(self) -> Tuple[int, int, int]:
-        return self.color_sensor.bin_data("hhh")
+        color = self.color_sensor.bin_data("hhh")
+        self.recorder.record(Record.COLOR, *color)
+        return color
 
     def scan_line(self, range_in_degrees: int):
         self.rotate(range_in_degrees)
 
-        sleep(0.1)
+        self.sleep(0.1)
 
         while True:
             if grayscale(self.scan_color()) <= 100:
@@ -215,11 +411,13 @@ class Robot:
         self.align_line()
         self.odometry.add_motor_data(self.left_motor, self.right_motor)
 
-    def follow_line(self, collect_data: bool = True) -> Node:
+    def follow_line(self, collect_data: bool = True, expected_length: float = None) -> Node:
         """
         Follows the current line, returns RED or BLUE if successful,
         returns INVALID and returns to last node if path was blocked.
+        :param expected_length: float, cm of a known path to drive faster, needs collect_data
         """
+        speed = self.SPEED
 
         last_error = 0
         last_errors = [0]*50
@@ -230,6 +428,7 @@ class Robot:
         while True:
             if collect_data:
                 self.odometry.add_motor_data(self.left_motor, self.right_motor)
+                speed = self.cruise_speed(self.odometry.driven_distance(), expected_length)
 
             color = self.scan_color()
 
@@ -242,8 +441,8 @@ class Robot:
             last_errors.append(error)
 
             turn = error * self.K_PROPORTIONAL + derivate * self.K_DERIVATIVE + integral * self.K_INTEGRAL
-            speed_left = -self.SPEED + turn
-            speed_right = -self.SPEED - turn
+            speed_left = -speed + turn
+            speed_right = -speed - turn
 
             self.left_motor.run_forever(speed_sp=speed_left)
             self.right_motor.run_forever(speed_sp=speed_right)
@@ -279,6 +478,7 @@ class Robot:
             if node != Node.INVALID:
                 self.left_motor.stop()
                 self.right_motor.stop()
+                self.last_path_length = self.odometry.driven_distance()
 
                 if node == Node.RED:
                     self.axis_correction(1.8, collect_data)
@@ -304,7 +504,7 @@ class Robot:
 
             count += 1
 
-            sleep(0.2)
+            self.sleep(0.2)
 
         self.led_brightness("0:green", 0)
         self.led_brightness("1:green", 0)
@@ -328,17 +528,11 @@ class Robot:
 
             count += 1
 
-            sleep(0.2)
+            self.sleep(0.2)
 
         self.wings.stop()
         self.left_motor.stop()
         self.right_motor.stop()
 
     def led_brightness(self, name: str, brightness: int):
-        try:
-            handle = os.open(os.path.join(f"/sys/class/leds/led{name}:brick-status/brightness"), os.O_RDWR)
-            os.write(handle, str(brightness).encode())
-            os.lseek(handle, 0, os.SEEK_SET)
-        except OSError as e:
-            #print(e.strerror)
-            return
+        self.hardware.led_brightness(name, brightness)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import struct
+import threading
+import time
+from enum import IntEnum, unique
+from typing import BinaryIO, Callable, Dict, Iterator, Tuple, Union
+
+from planet import Direction
+
+# Structured run log: an append-only binary file of length-prefixed records.
+#
+# The file starts with MAGIC, every record is a header (payload length, record type,
+# monotonic timestamp in seconds) followed by the payload. Samples are packed with struct,
+# MQTT messages are stored as received. A truncated record at the end of the file (the robot
+# crashed or was switched off) is ignored by the reader. Version 2 added the route flag of DECISION.
+
+MAGIC = b"RLOG\x02"
+
+HEADER = struct.Struct("<IBd")
+
+
+@unique
+class Record(IntEnum):
+    ODOMETRY_CONFIG = 1
+    TACHO = 2
+    COLOR = 3
+    NODE = 4
+    POSITION = 5
+    FIRST_NODE = 6
+    SCAN = 7
+    DECISION = 8
+    MESSAGE_IN = 9
+    MESSAGE_OUT = 10
+    CROSSING = 11
+
+
+PAYLOADS = {
+    Record.ODOMETRY_CONFIG: struct.Struct("<ddii"),  # wheel diameter, axis length, counts per rotation
+    Record.TACHO: struct.Struct("<ii"),  # left and right position as used by the odometry
+    Record.COLOR: struct.Struct("<hhh"),  # raw RGB
+    Record.NODE: struct.Struct("<b"),  # node colour the odometry calculated with
+    Record.POSITION: struct.Struct("<iih"),  # x, y, direction
+    Record.FIRST_NODE: struct.Struct("<iib"),  # x, y, node colour
+    Record.SCAN: struct.Struct("<iiB"),  # x, y, bit per found direction (NORTH, EAST, SOUTH, WEST)
+    Record.DECISION: struct.Struct("<iih?"),  # x, y, direction, -1 if none, following a planned route
+    Record.CROSSING: struct.Struct("<iiff"),  # left tacho entering and leaving a line in a sweep, angle, confidence
+}
+
+
+class Recorder:
+    """
+    Disabled recorder, every event is dropped
+    """
+
+    def record(self, record: Record, *values):
+        pass
+
+    def record_bytes(self, record: Record, payload: bytes):
+        pass
+
+    def close(self):
+        pass
+
+
+class RunRecorder(Recorder):
+    """
+    Records the events of a run to a file, safe to use from the network thread
+    """
+
+    # bytes collected before one write to the file, about a second of samples in the control loop
+    BUFFER_SIZE = 32768
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic):
+        """
+        :param path: String, run log to append to
+        :param clock: Callable, monotonic time in seconds, the simulation time in the simulator
+        """
+        self.clock = clock
+        self.lock = threading.Lock()
+        # unbuffered, the records are collected here and written in one go
+        self.file = open(path, 'ab', buffering=0)
+        self.buffer = bytearray()
+        if self.file.tell() == 0:
+            self.buffer += MAGIC
+
+    def record(self, record: Record, *values):
+        self.record_bytes(record, PAYLOADS[record].pack(*values))
+
+    def record_bytes(self, record: Record, payload: bytes):
+        with self.lock:
+            self.buffer += HEADER.pack(len(payload), record, self.clock())
+            self.buffer += payload
+            if len(self.buffer) >= self.BUFFER_SIZE:
+                self.flush()
+
+    def flush(self):
+        """
+        Writes the collected records, the caller holds the lock
+        """
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.file.close()
+
+
+def read_records(file: BinaryIO) -> Iterator[Tuple[float, Record, Union[tuple, bytes]]]:
+    """
+    Reads the records of a run log
+    :param file: binary file
+    :return: Iterator of timestamp, record type and the unpacked values, bytes for messages
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a run log")
+
+    while True:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, record, timestamp = HEADER.unpack(header)
+
+        payload = file.read(length)
+        if len(payload) < length:
+            return
+
+        record = Record(record)
+        if record in PAYLOADS:
+            yield timestamp, record, PAYLOADS[record].unpack(payload)
+        else:
+            yield timestamp, record, payload
+
+
+def scan_bits(directions: Dict[Direction, bool]) -> int:
+    return sum(1 << index for index, direction in enumerate(Direction) if directions.get(direction))
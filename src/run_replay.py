@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Replays a run log of the robot through Odometry and Planet
+
+Run from src: python -m run_replay <run log>
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import sys
+from typing import List, Tuple
+
+import codec
+from messages import PathMessage, PathUnveiledMessage, PlanetMessage, TargetMessage
+from odometry import Node, Odometry
+from planet import Direction, Planet
+from run_log import Record, read_records
+
+
+class RunReplay:
+    """
+    Replays a run log through a fresh Odometry and Planet, for offline analysis of a run
+    """
+
+    def __init__(self):
+        self.odometry: Odometry = None
+        self.planet = Planet()
+        # positions calculated by the odometry at every node: timestamp, position
+        self.positions: List[Tuple[float, Tuple[Tuple[int, int], Direction]]] = []
+        # decisions of the run the replayed planet decides differently: timestamp, coords, recorded, replayed
+        self.mismatches: List[Tuple[float, Tuple[int, int], Direction, Direction]] = []
+        self.colors: List[Tuple[float, Tuple[int, int, int]]] = []
+        self.start = None
+        # paths left of the route planned at the last node that was not on a route, like in main.explore
+        self.route: List[Tuple[Tuple[int, int], Direction]] = []
+
+    def replay(self, path: str) -> 'RunReplay':
+        with open(path, 'rb') as file:
+            for timestamp, record, values in read_records(file):
+                self.apply(timestamp, record, values)
+        return self
+
+    def apply(self, timestamp: float, record: Record, values):
+        if record == Record.ODOMETRY_CONFIG:
+            self.odometry = Odometry(*values)
+        elif record == Record.TACHO:
+            self.odometry.data.append(values)
+        elif record == Record.COLOR:
+            self.colors.append((timestamp, values))
+        elif record == Record.NODE:
+            self.odometry.calculate(Node(values[0]))
+            self.positions.append((timestamp, self.odometry.position))
+        elif record == Record.POSITION:
+            x, y, direction = values
+            self.odometry.position = (x, y), Direction(direction)
+        elif record == Record.FIRST_NODE:
+            x, y, node = values
+            self.odometry.first_node = (x, y), Node(node)
+        elif record == Record.SCAN:
+            self.apply_scan(*values)
+        elif record == Record.DECISION:
+            x, y, direction, follows_route = values
+            recorded = None if direction == -1 else Direction(direction)
+            replayed = self.decide((x, y), follows_route)
+            if replayed != recorded:
+                self.mismatches.append((timestamp, (x, y), recorded, replayed))
+        elif record == Record.MESSAGE_IN:
+            self.apply_message(codec.decode(values))
+
+    def decide(self, coords: Tuple[int, int], follows_route: bool) -> Direction:
+        """
+        The direction main.explore chooses at a node, on a route it drives on without planning again
+        """
+        if follows_route:
+            if not self.route or self.route[0][0] != coords:
+                return None
+            return self.route.pop(0)[1]
+
+        self.route = self.planet.smartest_route(coords)
+        return self.route.pop(0)[1] if self.route else None
+
+    def apply_scan(self, x: int, y: int, bits: int):
+        coords = x, y
+        self.planet.add_node_scan(coords, {direction: bool(bits & (1 << index))
+                                           for index, direction in enumerate(Direction)})
+        self.planet.add_explored_node(coords)
+
+        # the start line is no path
+        if self.start is not None and self.start[0] == coords:
+            start_coords, direction = self.start
+            self.planet.remove_direct(start_coords, Direction((int(direction) - 180) % 360))
+
+    def apply_message(self, data: dict):
+        if data.get("from") != "server":
+            return
+
+        msg_type = data["type"]
+        payload = data["payload"]
+
+        if msg_type == "planet":
+            self.start = PlanetMessage(payload).start
+        elif msg_type == "path":
+            path = PathMessage(payload)
+            self.planet.add_path(path.start, path.end, path.weight)
+            self.planet.add_explored_node(path.end[0])
+            self.planet.remove_unexplored_path(path.start, path.end)
+        elif msg_type == "pathUnveiled":
+            path = PathUnveiledMessage(payload)
+            self.planet.add_unveiled_paths([(path.start, path.end, path.weight)])
+        elif msg_type == "target":
+            self.planet.target = TargetMessage(payload).target
+
+
+if __name__ == '__main__':
+    replay = RunReplay().replay(sys.argv[1])
+
+    print(f"{len(replay.positions)} nodes driven, {len(replay.planet.explored_nodes)} explored, "
+          f"{len(replay.colors)} colour samples")
+    for timestamp, position in replay.positions:
+        print(f"{timestamp:10.3f} s: {position}")
+    for timestamp, coords, recorded, replayed in replay.mismatches:
+        print(f"{timestamp:10.3f} s: decided {recorded} at {coords}, the replay decides {replayed}")
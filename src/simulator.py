@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import json
+import math
+import os
+from typing import Dict, List, Tuple
+
+from hardware import Hardware
+from planet import Direction, Planet
+
+# cm between two neighbouring nodes, the odometry uses the same grid
+GRID_SIZE = 50
+
+# geometry of the planet in cm
+LINE_WIDTH = 1.5
+NODE_RADIUS = 2
+OBSTACLE_RADIUS = 3
+START_LINE_LENGTH = 25
+
+# simulated seconds every access of a motor or sensor takes, the control loop on the brick
+# runs at a similar rate
+IO_TIME = 0.003
+
+# local description of a robot, not in git, see SimulatorConfig.load
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'simulator_config.json')
+
+Color = Tuple[int, int, int]
+
+
+class SimulationTimeout(Exception):
+    """
+    Raised if the simulated time exceeds the limit, e.g. because the robot lost the planet
+    """
+    pass
+
+
+class SimulatorConfig:
+    """
+    Wheel and sensor geometry of the robot, read from a file in the format of simulator_config.example.json
+    """
+
+    def __init__(self, wheel_distance: float, distance_per_tick: float, color_sensor_forward: float,
+                 ultrasonic_forward: float, colors: Dict[str, Color], spot_diameter: float):
+        self.wheel_distance = wheel_distance
+        self.distance_per_tick = distance_per_tick
+        self.color_sensor_forward = color_sensor_forward
+        self.ultrasonic_forward = ultrasonic_forward
+        self.colors = colors
+        self.spot_diameter = spot_diameter
+
+    @classmethod
+    def robot(cls) -> 'SimulatorConfig':
+        """
+        Our robot: 56 mm wheels driving forward with negative motor speeds, colours matching robot.py
+        """
+        colors = {"red": (126, 29, 55), "blue": (28, 100, 212), "white": (255, 280, 290), "black": (30, 45, 11)}
+        return cls(11.6, -0.04887, 6, 4, colors, 1)
+
+    @classmethod
+    def load(cls, path: str = CONFIG_FILE) -> 'SimulatorConfig':
+        with open(path) as file:
+            data = json.load(file)
+
+        color_sensor = ultrasonic = None
+        for name, sensor in data["inputs"].items():
+            if name.startswith('#'):
+                continue
+            if sensor["type"] == "lego-sensor/lego-ev3-color":
+                color_sensor = sensor
+            elif sensor["type"] == "lego-sensor/lego-ev3-us":
+                ultrasonic = sensor
+
+        colors = {name: (color["red"], color["green"], color["blue"]) for name, color in color_sensor["colors"].items()}
+
+        return cls(data["wheels"]["wheeldistance_cm"], data["wheels"]["distance_per_tick_cm"],
+                   color_sensor["location"]["forward_cm"], ultrasonic["location"]["forward_cm"], colors,
+                   color_sensor.get("test_circle_diameter_cm", 0.5))
+
+
+def direction_vector(direction: float) -> Tuple[float, float]:
+    """
+    Unit vector of a heading in degrees, clockwise from north
+    """
+    angle = math.radians(direction)
+    return math.sin(angle), math.cos(angle)
+
+
+def segment_distance(px: float, py: float, segment: Tuple[float, float, float, float]) -> float:
+    ax, ay, bx, by = segment
+    dx = bx - ax
+    dy = by - ay
+    length = dx * dx + dy * dy
+    t = 0 if length == 0 else max(0, min(1, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+class World:
+    """
+    Lines, nodes and obstacles of a planet in cm
+    Every path is drawn as a cubic curve leaving its nodes in the direction of the path,
+    blocked paths (weight -1) have an obstacle in their middle.
+    """
+
+    CELL_SIZE = 5
+    CURVE_SEGMENTS = 20
+
+    def __init__(self, planet: Planet, start: Tuple[Tuple[int, int], Direction]):
+        self.segments: List[Tuple[float, float, float, float]] = []
+        self.obstacles: List[Tuple[float, float]] = []
+        self.nodes: Dict[Tuple[int, int], str] = {}
+
+        # segments near every cell, so a sensor reading only looks at a few of them
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        drawn = set()
+        for coords, directions in planet.get_paths().items():
+            self.add_node(coords)
+            for direction, (target_coords, target_direction, weight) in directions.items():
+                key = frozenset([(coords, direction), (target_coords, target_direction)])
+                if key in drawn:
+                    continue
+                drawn.add(key)
+                self.add_node(target_coords)
+                self.add_path((coords, direction), (target_coords, target_direction), weight)
+
+        # the start line ends behind the start node
+        start_coords, orientation = start
+        self.add_node(start_coords)
+        x, y = self.node_position(start_coords)
+        ux, uy = direction_vector(int(orientation) + 180)
+        self.add_segment((x, y, x + ux * START_LINE_LENGTH, y + uy * START_LINE_LENGTH))
+
+    @staticmethod
+    def node_position(coords: Tuple[int, int]) -> Tuple[float, float]:
+        return coords[0] * GRID_SIZE, coords[1] * GRID_SIZE
+
+    def add_node(self, coords: Tuple[int, int]):
+        # node colors alternate like a chess board
+        self.nodes[coords] = "red" if (coords[0] + coords[1]) % 2 == 0 else "blue"
+
+    def add_path(self, start: Tuple[Tuple[int, int], Direction], target: Tuple[Tuple[int, int], Direction], weight: int):
+        start_coords, start_direction = start
+        target_coords, target_direction = target
+
+        x0, y0 = self.node_position(start_coords)
+        x3, y3 = self.node_position(target_coords)
+        u0x, u0y = direction_vector(int(start_direction))
+        u3x, u3y = direction_vector(int(target_direction))
+
+        reach = max(20, 0.5 * math.hypot(x3 - x0, y3 - y0))
+        x1, y1 = x0 + u0x * reach, y0 + u0y * reach
+        x2, y2 = x3 + u3x * reach, y3 + u3y * reach
+
+        # a loop leaving to opposite sides would run through its own node, bend it to the side
+        if start_coords == target_coords and u0x == -u3x and u0y == -u3y:
+            x1, y1 = x1 + u0y * reach, y1 - u0x * reach
+            x2, y2 = x2 + u0y * reach, y2 - u0x * reach
+
+        points = []
+        for i in range(self.CURVE_SEGMENTS + 1):
+            t = i / self.CURVE_SEGMENTS
+            a, b, c, d = (1 - t) ** 3, 3 * (1 - t) ** 2 * t, 3 * (1 - t) * t ** 2, t ** 3
+            points.append((a * x0 + b * x1 + c * x2 + d * x3, a * y0 + b * y1 + c * y2 + d * y3))
+
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            self.add_segment((ax, ay, bx, by))
+
+        if weight == -1:
+            self.obstacles.append(points[self.CURVE_SEGMENTS // 2])
+
+    def add_segment(self, segment: Tuple[float, float, float, float]):
+        index = len(self.segments)
+        self.segments.append(segment)
+
+        ax, ay, bx, by = segment
+        margin = LINE_WIDTH + 1
+        for cell_x in range(math.floor((min(ax, bx) - margin) / self.CELL_SIZE),
+                            math.floor((max(ax, bx) + margin) / self.CELL_SIZE) + 1):
+            for cell_y in range(math.floor((min(ay, by) - margin) / self.CELL_SIZE),
+                                math.floor((max(ay, by) + margin) / self.CELL_SIZE) + 1):
+                self.cells.setdefault((cell_x, cell_y), []).append(index)
+
+    def line_distance(self, x: float, y: float) -> float:
+        """
+        Distance to the center of the nearest line, inf if there is none nearby
+        """
+        cell = math.floor(x / self.CELL_SIZE), math.floor(y / self.CELL_SIZE)
+        return min((segment_distance(x, y, self.segments[index]) for index in self.cells.get(cell, [])),
+                   default=float('inf'))
+
+    def node_at(self, x: float, y: float):
+        coords = round(x / GRID_SIZE), round(y / GRID_SIZE)
+        if coords not in self.nodes:
+            return None
+
+        node_x, node_y = self.node_position(coords)
+        return self.nodes[coords] if math.hypot(x - node_x, y - node_y) <= NODE_RADIUS else None
+
+
+class SimMotor:
+    """
+    Tacho motor without inertia, implements the part of ev3dev.ev3.Motor the robot uses
+    """
+
+    MAX_SPEED = 1050
+    STOP_ACTION_HOLD = 'hold'
+
+    def __init__(self, simulator: 'Simulator'):
+        self.simulator = simulator
+        self.count_per_rot = 360
+        self.stop_action = 'coast'
+        self.exact_position = 0.0
+        self.exact_speed = 0.0
+        self.target = None
+
+    @property
+    def position(self) -> int:
+        self.simulator.tick()
+        return round(self.exact_position)
+
+    @property
+    def speed(self) -> int:
+        self.simulator.tick()
+        return int(self.exact_speed)
+
+    def reset(self):
+        self.exact_position = 0.0
+        self.stop()
+
+    def run_forever(self, speed_sp: float):
+        self.target = None
+        self.exact_speed = max(-self.MAX_SPEED, min(self.MAX_SPEED, speed_sp))
+
+    def run_to_rel_pos(self, speed_sp: float, position_sp: float):
+        if position_sp == 0:
+            self.stop()
+            return
+
+        self.target = self.exact_position + position_sp
+        self.exact_speed = math.copysign(min(abs(speed_sp), self.MAX_SPEED), position_sp)
+
+    def stop(self):
+        self.target = None
+        self.exact_speed = 0.0
+
+    def update(self, dt: float) -> float:
+        """
+        Turns the motor for dt seconds
+        :return: float, degrees turned
+        """
+        if self.exact_speed == 0:
+            return 0
+
+        delta = self.exact_speed * dt
+        if self.target is not None and abs(self.target - self.exact_position) <= abs(delta):
+            delta = self.target - self.exact_position
+            self.stop()
+
+        self.exact_position += delta
+        return delta
+
+
+class SimColorSensor:
+    MODE_RGB_RAW = 'RGB-RAW'
+
+    def __init__(self, simulator: 'Simulator'):
+        self.simulator = simulator
+        self.mode = self.MODE_RGB_RAW
+
+    def bin_data(self, fmt: str = "hhh") -> Color:
+        self.simulator.tick()
+        return self.simulator.color()
+
+
+class SimUltrasonicSensor:
+    MODE_US_DIST_CM = 'US-DIST-CM'
+
+    def __init__(self, simulator: 'Simulator'):
+        self.simulator = simulator
+        self.mode = self.MODE_US_DIST_CM
+
+    @property
+    def distance_centimeters(self) -> float:
+        self.simulator.tick()
+        return self.simulator.obstacle_distance()
+
+
+class Simulator(Hardware):
+    """
+    Kinematic simulation of the robot on a planet
+    Time only advances when the robot accesses a device or sleeps, so the simulation runs as fast
+    as the control code allows, typically a few hundred times faster than real time.
+    """
+
+    # opening angle of the ultrasonic beam in degrees
+    BEAM_ANGLE = 15
+
+    def __init__(self, planet: Planet, start: Tuple[Tuple[int, int], Direction], config: SimulatorConfig = None,
+                 max_time: float = 3600):
+        """
+        Places the robot on the start line of the planet
+        :param planet: Planet, all paths of the planet with their weights
+        :param start: Tuple, start node and orientation like the planet message of the server
+        :param config: SimulatorConfig, our robot by default
+        :param max_time: float, simulated seconds until SimulationTimeout is raised
+        """
+        self.config = config if config is not None else SimulatorConfig.robot()
+        self.world = World(planet, start)
+        self.max_time = max_time
+        self.clock = 0.0
+        self.leds: Dict[str, int] = {}
+
+        super().__init__(SimMotor(self), SimMotor(self), SimMotor(self), SimUltrasonicSensor(self), SimColorSensor(self))
+
+        # pose of the center between the wheels in cm, heading in radians clockwise from north
+        start_coords, orientation = start
+        node_x, node_y = World.node_position(start_coords)
+        ux, uy = direction_vector(int(orientation))
+        self.heading = math.radians(int(orientation))
+        # the robot follows the right edge of the line
+        self.x = node_x - ux * START_LINE_LENGTH * 0.6 + uy * LINE_WIDTH / 2
+        self.y = node_y - uy * START_LINE_LENGTH * 0.6 - ux * LINE_WIDTH / 2
+
+    def tick(self, dt: float = IO_TIME):
+        """
+        Advances the simulated time and moves the robot
+        """
+        self.clock += dt
+        if self.clock > self.max_time:
+            raise SimulationTimeout(f"simulation exceeded {self.max_time} s")
+
+        self.wings.update(dt)
+
+        distance_left = self.left_motor.update(dt) * self.config.distance_per_tick
+        distance_right = self.right_motor.update(dt) * self.config.distance_per_tick
+        if distance_left == 0 and distance_right == 0:
+            return
+
+        distance = (distance_left + distance_right) / 2
+        # counterclockwise rotation, the heading is clockwise
+        rotation = (distance_right - distance_left) / self.config.wheel_distance
+
+        heading = self.heading - rotation / 2
+        self.x += math.sin(heading) * distance
+        self.y += math.cos(heading) * distance
+        self.heading -= rotation
+
+    def sleep(self, seconds: float):
+        steps = max(1, round(seconds / IO_TIME))
+        for _ in range(steps):
+            self.tick(seconds / steps)
+
+    def time(self) -> float:
+        return self.clock
+
+    def led_brightness(self, name: str, brightness: int):
+        self.leds[name] = brightness
+
+    def sensor_position(self, forward: float) -> Tuple[float, float]:
+        return self.x + math.sin(self.heading) * forward, self.y + math.cos(self.heading) * forward
+
+    def color(self) -> Color:
+        """
+        Raw RGB value under the color sensor, the line edge is blurred by the size of the light spot
+        """
+        x, y = self.sensor_position(self.config.color_sensor_forward)
+        colors = self.config.colors
+
+        node = self.world.node_at(x, y)
+        if node is not None:
+            return colors[node]
+
+        spot_radius = self.config.spot_diameter / 2
+        coverage = (LINE_WIDTH / 2 + spot_radius - self.world.line_distance(x, y)) / (2 * spot_radius)
+        coverage = max(0, min(1, coverage))
+
+        white = colors["white"]
+        black = colors["black"]
+        return tuple(round(white[i] + (black[i] - white[i]) * coverage) for i in range(3))
+
+    def obstacle_distance(self) -> float:
+        """
+        Distance in cm to the nearest obstacle in the ultrasonic beam, 255 if there is none
+        """
+        x, y = self.sensor_position(self.config.ultrasonic_forward)
+        ux, uy = math.sin(self.heading), math.cos(self.heading)
+        spread = math.tan(math.radians(self.BEAM_ANGLE))
+
+        distance = 255
+        for obstacle_x, obstacle_y in self.world.obstacles:
+            dx, dy = obstacle_x - x, obstacle_y - y
+            along = dx * ux + dy * uy
+            if along <= 0:
+                continue
+            if abs(dx * uy - dy * ux) <= OBSTACLE_RADIUS + along * spread:
+                distance = min(distance, max(0, along - OBSTACLE_RADIUS))
+
+        return distance
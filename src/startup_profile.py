@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Startup profile of the robot program: import time of every module, like python -X importtime
+
+Run from src on a desktop Python 3.7 or newer: python3 -m startup_profile [modules]
+The brick runs Python 3.5 without -X importtime, the times on the desktop are smaller but show
+which imports are worth deferring. The report is written to logs/import-profile.txt
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+REPORT_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'logs', 'import-profile.txt')
+
+
+def profile(modules: List[str]) -> List[Tuple[int, int, str]]:
+    """
+    Imports the modules in a fresh interpreter and collects the import times
+    :param modules: List, module names
+    :return: List, self and cumulative microseconds and the (indented) name per imported module, in import order
+    """
+    if sys.version_info < (3, 7):
+        raise RuntimeError("python -X importtime needs Python 3.7 or newer")
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', '; '.join('import ' + m for m in modules)],
+                            cwd=os.path.dirname(os.path.realpath(__file__)), stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(self_time), int(cumulative), name.rstrip()[1:]))
+
+    return imports
+
+
+def report(modules: List[str], imports: List[Tuple[int, int, str]], top: int = 30) -> str:
+    total = sum(cumulative for _, cumulative, name in imports if not name.startswith(' '))
+
+    lines = [f"python {sys.version.split()[0]}, import {', '.join(modules)}: {total / 1000:.1f} ms, "
+             f"{len(imports)} modules", "", f"slowest {top} by cumulative time:",
+             "      self [ms] | cumulative [ms] | module"]
+    for self_time, cumulative, name in sorted(imports, key=lambda i: -i[1])[:top]:
+        lines.append(f"{self_time / 1000:15.1f} | {cumulative / 1000:15.1f} | {name.strip()}")
+
+    lines += ["", "import tree:", "      self [ms] | cumulative [ms] | module"]
+    for self_time, cumulative, name in imports:
+        lines.append(f"{self_time / 1000:15.1f} | {cumulative / 1000:15.1f} | {name}")
+
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == '__main__':
+    modules = sys.argv[1:] or ['main']
+    text = report(modules, profile(modules))
+
+    with open(REPORT_FILE, 'w') as f:
+        f.write(text)
+    print('\n'.join(text.splitlines()[:8]))
+    print(f"... written to {os.path.normpath(REPORT_FILE)}")
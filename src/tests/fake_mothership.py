@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the mothership, used by tests and benchmarks
+
+FakeBroker is a minimal MQTT 3.1.1 broker (CONNECT, SUBSCRIBE, PUBLISH with QoS 0-2, PING) listening
+on localhost, so paho and Communication run unchanged against it without TLS.
+FakeMothership is attached to a broker and answers the client messages of the exploration protocol
+from a planet description the way the real server does.
+"""
+
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from planet import Direction, Planet
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    Checks a topic against a subscription filter with + and # wildcards
+    """
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[i]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return struct.pack('!H', len(data)) + data
+
+
+def encode_packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    header = bytearray([(packet_type << 4) | flags])
+
+    # remaining length, 7 bit per byte
+    length = len(body)
+    while True:
+        byte = length % 128
+        length //= 128
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+
+    return bytes(header) + body
+
+
+class Connection:
+    """
+    One connected MQTT client of the broker
+    """
+
+    def __init__(self, broker: 'FakeBroker', sock: socket.socket):
+        self.broker = broker
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.subscriptions: List[str] = []
+        self.reader = sock.makefile('rb')
+
+    def send(self, packet: bytes):
+        with self.lock:
+            try:
+                self.sock.sendall(packet)
+            except OSError:
+                pass
+
+    def read_packet(self) -> Optional[Tuple[int, int, bytes]]:
+        header = self.reader.read(1)
+        if not header:
+            return None
+
+        length = 0
+        multiplier = 1
+        while True:
+            byte = self.reader.read(1)
+            if not byte:
+                return None
+            length += (byte[0] & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte[0] & 0x80:
+                break
+
+        body = self.reader.read(length)
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    def run(self):
+        try:
+            while True:
+                packet = self.read_packet()
+                if packet is None:
+                    break
+                if not self.handle(*packet):
+                    break
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.broker.remove(self)
+            self.sock.close()
+
+    def handle(self, packet_type: int, flags: int, body: bytes) -> bool:
+        if packet_type == CONNECT:
+            self.send(encode_packet(CONNACK, 0, b'\x00\x00'))
+
+        elif packet_type == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            self.broker.qos_counts[qos] += 1
+            topic_length, = struct.unpack('!H', body[:2])
+            topic = body[2:2 + topic_length].decode('utf-8')
+            offset = 2 + topic_length
+
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+                if qos == 1:
+                    self.send(encode_packet(PUBACK, 0, packet_id))
+                else:
+                    self.send(encode_packet(PUBREC, 0, packet_id))
+
+            self.broker.publish(topic, body[offset:])
+
+        elif packet_type == PUBREL:
+            self.send(encode_packet(PUBCOMP, 0, body[:2]))
+
+        elif packet_type == SUBSCRIBE:
+            packet_id = body[:2]
+            offset = 2
+            granted = bytearray()
+
+            while offset < len(body):
+                topic_length, = struct.unpack('!H', body[offset:offset + 2])
+                self.subscriptions.append(body[offset + 2:offset + 2 + topic_length].decode('utf-8'))
+                offset += 2 + topic_length + 1
+                # messages are always delivered with QoS 0, TCP on localhost does not lose them
+                granted.append(0)
+
+            self.send(encode_packet(SUBACK, 0, packet_id + bytes(granted)))
+
+        elif packet_type == UNSUBSCRIBE:
+            packet_id = body[:2]
+            offset = 2
+
+            while offset < len(body):
+                topic_length, = struct.unpack('!H', body[offset:offset + 2])
+                topic_filter = body[offset + 2:offset + 2 + topic_length].decode('utf-8')
+                if topic_filter in self.subscriptions:
+                    self.subscriptions.remove(topic_filter)
+                offset += 2 + topic_length
+
+            self.send(encode_packet(UNSUBACK, 0, packet_id))
+
+        elif packet_type == PINGREQ:
+            self.send(encode_packet(PINGRESP, 0, b''))
+
+        elif packet_type == DISCONNECT:
+            return False
+
+        # PUBACK, PUBREC and PUBCOMP of clients are not expected, everything is delivered with QoS 0
+        return True
+
+
+class FakeBroker:
+    """
+    Minimal MQTT broker on localhost, every connection is served by its own thread
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Starts listening, port 0 picks a free port
+        :param host: String
+        :param port: int
+        """
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+
+        self.host, self.port = self.server.getsockname()
+
+        self.lock = threading.Lock()
+        self.connections: List[Connection] = []
+
+        # subscribers inside the process, e.g. the scripted server
+        self.listeners: List[Tuple[str, Callable[[str, bytes], None]]] = []
+
+        self.published = 0
+        # received publishes per QoS level
+        self.qos_counts = [0, 0, 0]
+
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+
+    def accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = Connection(self, sock)
+            with self.lock:
+                self.connections.append(connection)
+            threading.Thread(target=connection.run, daemon=True).start()
+
+    def remove(self, connection: Connection):
+        with self.lock:
+            if connection in self.connections:
+                self.connections.remove(connection)
+
+    def subscribe(self, topic_filter: str, callback: Callable[[str, bytes], None]):
+        """
+        Subscribes a callback inside the process, it runs on the thread of the publishing connection
+        :param topic_filter: String
+        :param callback: Callable(topic, payload)
+        :return: void
+        """
+        self.listeners.append((topic_filter, callback))
+
+    def publish(self, topic: str, payload: bytes):
+        """
+        Delivers a message to all matching subscribers
+        :param topic: String
+        :param payload: bytes
+        :return: void
+        """
+        self.published += 1
+        packet = encode_packet(PUBLISH, 0, encode_string(topic) + payload)
+
+        with self.lock:
+            connections = list(self.connections)
+
+        for connection in connections:
+            if any(topic_matches(topic_filter, topic) for topic_filter in connection.subscriptions):
+                connection.send(packet)
+
+        for topic_filter, callback in self.listeners:
+            if topic_matches(topic_filter, topic):
+                callback(topic, payload)
+
+    def stop(self):
+        self.server.close()
+
+        with self.lock:
+            connections = list(self.connections)
+
+        for connection in connections:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# required payload fields of the client messages
+REQUIRED_FIELDS = {
+    "testplanet": ["planetName"],
+    "ready": [],
+    "path": ["startX", "startY", "startDirection", "endX", "endY", "endDirection", "pathStatus"],
+    "pathSelect": ["startX", "startY", "startDirection"],
+    "targetReached": ["message"],
+    "explorationCompleted": ["message"],
+}
+
+
+class FakeMothership:
+    """
+    Scripted server answering the exploration protocol from a planet description
+    """
+
+    def __init__(self, broker: FakeBroker, planet: Planet, start: Tuple[Tuple[int, int], Direction],
+                 planet_name: str = "Local", group: str = "022"):
+        """
+        Attaches the server to a broker
+        :param broker: FakeBroker
+        :param planet: Planet, the paths of the whole planet with their weights
+        :param start: Tuple, start node and orientation of the robot
+        :param planet_name: String
+        :param group: String
+        """
+        self.broker = broker
+        self.planet = planet
+        self.start = start
+        self.planet_name = planet_name
+        self.group = group
+
+        # paths unveiled as soon as the robot reaches a node
+        self.unveil: Dict[Tuple[int, int], List[Tuple[Tuple[Tuple[int, int], Direction], Tuple[Tuple[int, int], Direction], int]]] = {}
+        # target sent together with the answer to this number of paths
+        self.target: Optional[Tuple[int, int]] = None
+        self.target_after = 1
+        # seconds between the answer to that path and the target
+        self.target_delay = 0
+        # directions forced by the server on pathSelect, keyed by node
+        self.path_select_overrides: Dict[Tuple[int, int], Direction] = {}
+        # answer every pathSelect, not only overrides (useful to measure round trips)
+        self.echo_path_select = False
+
+        # client messages as (topic, data) in order of arrival
+        self.messages: List[Tuple[str, dict]] = []
+        self.errors: List[str] = []
+        self.paths_sent = 0
+
+        broker.subscribe('explorer/{}'.format(group), self.on_message)
+        broker.subscribe('planet/+/{}'.format(group), self.on_message)
+
+    def send(self, topic: str, msg_type: str, payload: dict, **extra):
+        message = {"from": "server", "type": msg_type, "payload": payload}
+        message.update(extra)
+        self.broker.publish(topic, json.dumps(message).encode('utf-8'))
+
+    def on_message(self, topic: str, payload: bytes):
+        data = json.loads(payload.decode('utf-8'))
+
+        # ignore our own answers
+        if data.get("from") != "client":
+            return
+
+        self.messages.append((topic, data))
+
+        msg_type = data.get("type")
+        if msg_type not in REQUIRED_FIELDS:
+            self.error(topic, "unknown message type {}".format(msg_type))
+            return
+
+        payload = data.get("payload", {})
+        missing = [field for field in REQUIRED_FIELDS[msg_type] if field not in payload]
+        if missing:
+            self.error(topic, "missing fields {} in {}".format(missing, msg_type))
+            return
+
+        getattr(self, "on_" + msg_type)(topic, payload)
+
+    def error(self, topic: str, error: str):
+        self.errors.append(error)
+        self.send(topic, "error", {"errors": [error]}, debug=error)
+
+    def planet_topic(self) -> str:
+        return 'planet/{}/{}'.format(self.planet_name, self.group)
+
+    def on_testplanet(self, topic: str, payload: dict):
+        self.planet_name = payload["planetName"]
+
+    def on_ready(self, topic: str, payload: dict):
+        (start_x, start_y), orientation = self.start
+        self.send(topic, "planet", {"planetName": self.planet_name, "startX": start_x, "startY": start_y,
+                                    "startOrientation": int(orientation)})
+
+    def on_path(self, topic: str, payload: dict):
+        start = (payload["startX"], payload["startY"]), Direction(payload["startDirection"])
+        start_coords, start_direction = start
+
+        paths = self.planet.get_paths()
+        if start_coords in paths and start_direction in paths[start_coords]:
+            end_coords, end_direction, weight = paths[start_coords][start_direction]
+            end = end_coords, end_direction
+        else:
+            # not part of the description, believe the robot
+            end = (payload["endX"], payload["endY"]), Direction(payload["endDirection"])
+            weight = 1
+
+        if payload["pathStatus"] == "blocked" or weight == -1:
+            end = start
+            weight = -1
+
+        (end_x, end_y), end_direction = end
+        self.send(topic, "path", {"startX": start_coords[0], "startY": start_coords[1],
+                                  "startDirection": int(start_direction), "endX": end_x, "endY": end_y,
+                                  "endDirection": int(end_direction), "pathStatus": "blocked" if weight == -1 else "free",
+                                  "pathWeight": weight})
+
+        for unveiled_start, unveiled_end, unveiled_weight in self.unveil.pop(end[0], []):
+            (unveiled_start_x, unveiled_start_y), unveiled_start_direction = unveiled_start
+            (unveiled_end_x, unveiled_end_y), unveiled_end_direction = unveiled_end
+            self.send(topic, "pathUnveiled", {"startX": unveiled_start_x, "startY": unveiled_start_y,
+                                              "startDirection": int(unveiled_start_direction), "endX": unveiled_end_x,
+                                              "endY": unveiled_end_y, "endDirection": int(unveiled_end_direction),
+                                              "pathStatus": "blocked" if unveiled_weight == -1 else "free",
+                                              "pathWeight": unveiled_weight})
+
+        self.paths_sent += 1
+        if self.target is not None and self.paths_sent == self.target_after:
+            target = {"targetX": self.target[0], "targetY": self.target[1]}
+            if self.target_delay:
+                threading.Timer(self.target_delay, self.send, (topic, "target", target)).start()
+            else:
+                self.send(topic, "target", target)
+
+    def on_pathSelect(self, topic: str, payload: dict):
+        coords = payload["startX"], payload["startY"]
+
+        direction = self.path_select_overrides.pop(coords, None)
+        if direction is None:
+            if not self.echo_path_select:
+                return
+            direction = payload["startDirection"]
+
+        # like the real server, only the direction
+        self.send(topic, "pathSelect", {"startDirection": int(direction)})
+
+    def on_targetReached(self, topic: str, payload: dict):
+        self.send(topic, "done", {"message": "Target reached!"})
+
+    def on_explorationCompleted(self, topic: str, payload: dict):
+        self.send(topic, "done", {"message": "Exploration completed!"})
+
+
+def wait_connected(client, timeout: float = 2) -> bool:
+    """
+    Waits until a paho client (with a running loop) got its CONNACK
+    """
+    deadline = time.monotonic() + timeout
+    while not client.is_connected():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import threading
+import unittest.mock
+import uuid
+
+import paho.mqtt.client as mqtt
+
+from async_communication import AsyncCommunication
+from communication import Communication
+from planet import Direction, Planet
+from tests.fake_mothership import FakeBroker, FakeMothership, wait_connected
+
+
+class TestAsyncCommunication(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """
+        Instantiates the asyncio front-end with a mocked client, answers of the server are
+        delivered from a separate thread like paho does
+        """
+        self.communication = Communication(unittest.mock.MagicMock(), unittest.mock.MagicMock())
+        self.communication.client.publish.side_effect = self.answer
+        self.com = AsyncCommunication(self.communication)
+
+        self.answers = {}
+
+    def answer(self, topic, payload, qos):
+        messages = []
+        for msg_type, answer_payload in self.answers.get(json.loads(payload)["type"], []):
+            message = unittest.mock.Mock()
+            message.payload = json.dumps({"from": "server", "type": msg_type, "payload": answer_payload}).encode()
+            messages.append(message)
+
+        def deliver():
+            for message in messages:
+                self.communication.on_message(None, None, message)
+
+        threading.Thread(target=deliver).start()
+        return unittest.mock.MagicMock()
+
+    async def test_request_ready(self):
+        """
+        This test should check that the planet message is the answer to ready
+        """
+        self.answers["ready"] = [("planet", {"planetName": "Test", "startX": 1, "startY": 2, "startOrientation": 90})]
+
+        planet = await self.com.request_ready(timeout=1)
+
+        self.assertEqual(planet.planet_name, "Test")
+        self.assertEqual(planet.start, ((1, 2), Direction.EAST))
+        self.assertEqual(self.communication.planet_name, "Test")
+
+    async def test_request_path_and_events(self):
+        """
+        This test should check that request_path returns the path answer and the whole burst shows up in events()
+        """
+        self.answers["path"] = [
+            ("path", {"startX": 0, "startY": 0, "startDirection": 0, "endX": 0, "endY": 1, "endDirection": 180,
+                      "pathStatus": "free", "pathWeight": 3}),
+            ("target", {"targetX": 5, "targetY": 5}),
+        ]
+
+        path = await self.com.request_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), "free", timeout=1)
+        self.assertEqual(path.weight, 3)
+
+        events = self.com.events()
+        first = await asyncio.wait_for(events.__anext__(), 1)
+        second = await asyncio.wait_for(events.__anext__(), 1)
+        self.assertEqual((first.type, second.type), ("path", "target"))
+
+    async def test_select_path_without_answer(self):
+        """
+        This test should check that an accepted path selection (no answer of the server) returns None after the timeout
+        """
+        self.assertIsNone(await self.com.select_path(((0, 0), Direction.NORTH), timeout=0.05))
+
+    async def test_request_timeout(self):
+        """
+        This test should check that a missing answer raises a timeout
+        """
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.com.request_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), "free", timeout=0.05)
+
+    async def test_retransmit(self):
+        """
+        This test should check that waiting for an answer publishes unacknowledged QoS 1 messages again
+        """
+        mids = iter(range(1, 10))
+        self.communication.client.publish.side_effect = lambda *args, **kwargs: unittest.mock.Mock(mid=next(mids))
+        self.communication.PUBLISH_TIMEOUT = 0.02
+
+        self.assertIsNone(await self.com.select_path(((0, 0), Direction.NORTH), timeout=0.2))
+
+        self.assertEqual(self.communication.client.publish.call_count, 1 + Communication.MAX_RETRIES)
+        self.assertEqual(self.communication.retransmits, Communication.MAX_RETRIES)
+
+
+class TestAsyncCommunicationBroker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """
+        Instantiates the asyncio front-end connected to a local mothership
+        """
+        planet = Planet()
+        planet.add_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 2)
+
+        self.broker = FakeBroker()
+        self.mothership = FakeMothership(self.broker, planet, ((0, 0), Direction.NORTH))
+        self.mothership.target = (0, 1)
+
+        client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        self.communication = Communication(client, unittest.mock.MagicMock(), host=self.broker.host,
+                                           port=self.broker.port, tls=False)
+        self.assertTrue(wait_connected(client))
+        self.com = AsyncCommunication(self.communication)
+
+    async def asyncTearDown(self):
+        self.communication.client.disconnect()
+        self.communication.client.loop_stop()
+        self.broker.stop()
+
+    async def test_exploration(self):
+        """
+        This test should check a short exploration against the local mothership
+        """
+        planet = await self.com.request_ready(timeout=1)
+        path = await self.com.request_path((planet.start[0], Direction.NORTH), ((0, 1), Direction.SOUTH), "free", timeout=1)
+        self.assertEqual(path.weight, 2)
+
+        events = self.com.events()
+        types = [(await asyncio.wait_for(events.__anext__(), 1)).type for _ in range(3)]
+        self.assertEqual(types, ["planet", "path", "target"])
+
+        done = await self.com.target_reached(timeout=1)
+        self.assertEqual(done.message, "Target reached!")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import csv
+import os
+import tempfile
+import unittest
+
+from batch_simulation import STRATEGIES, make_tasks, run_batch
+from exploration_replay import replay_exploration
+from planet_generator import generate_planet
+
+
+class TestBatchSimulation(unittest.TestCase):
+    def test_strategies(self):
+        """
+        This test should check that every strategy explores the whole planet
+        """
+        planet, start = generate_planet(6, 6, seed=4)
+
+        for name, strategy in STRATEGIES.items():
+            with self.subTest(strategy=name):
+                result = replay_exploration(planet, start, strategy=strategy)
+                self.assertTrue(result.completed)
+                self.assertEqual(len(result.visited), 36)
+
+    def test_run_batch(self):
+        """
+        This test should check that the results of all runs end up in the results file
+        """
+        tasks = make_tasks(3, list(STRATEGIES), 4, 4, targets=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.csv")
+            self.assertEqual(run_batch(tasks, output, processes=2), 3 * len(STRATEGIES))
+
+            with open(output, newline='') as results:
+                rows = list(csv.DictReader(results))
+
+        self.assertEqual(sorted((int(row["run"]), row["strategy"]) for row in rows),
+                         sorted((run, strategy) for run, strategy, *_ in tasks))
+        self.assertTrue(all(row["reached_target"] == "1" for row in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+
+import codec
+from planet import Direction
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        This test should check that every backend encodes compact JSON which decodes to the same message
+        """
+        message = {"from": "client", "type": "path",
+                   "payload": {"startX": 1, "startY": -2, "startDirection": Direction.WEST, "pathStatus": "free"}}
+
+        for name, (encode, decode) in codec.BACKENDS.items():
+            with self.subTest(backend=name):
+                encoded = encode(message)
+
+                self.assertIsInstance(encoded, str)
+                self.assertNotIn(" ", encoded)
+                self.assertEqual(json.loads(encoded)["payload"]["startDirection"], 270)
+                self.assertEqual(decode(encoded.encode('utf-8')), json.loads(encoded))
+
+    def test_pretty(self):
+        """
+        This test should check that pretty printing accepts encoded and decoded messages
+        """
+        message = {"from": "client", "type": "ready"}
+
+        self.assertEqual(codec.pretty(codec.encode(message)), json.dumps(message, indent=2))
+        self.assertEqual(codec.pretty(message), json.dumps(message, indent=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,18 +1,37 @@
 #!/usr/bin/env python3
 
+import json
+import threading
+import time
 import unittest.mock
 import paho.mqtt.client as mqtt
 import uuid
 
 from communication import Communication
+from planet import Direction, Planet
+from tests.fake_mothership import FakeBroker, FakeMothership, wait_connected
 
 
 class TestRoboLabCommunication(unittest.TestCase):
     @unittest.mock.patch('logging.Logger')
     def setUp(self, mock_logger):
         """
-        Instantiates the communication class
+        Instantiates the communication class, connected to a local mothership
+        NORTH
+           |
+          0,1
+           |
+          0,0-----1,0
+           |
+        (start)
         """
+        planet = Planet()
+        planet.add_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 2)
+        planet.add_path(((0, 0), Direction.EAST), ((1, 0), Direction.WEST), -1)
+
+        self.broker = FakeBroker()
+        self.mothership = FakeMothership(self.broker, planet, ((0, 0), Direction.NORTH))
+
         client_id = '022-' + str(uuid.uuid4())  # Replace YOURGROUPID with your group ID
         client = mqtt.Client(client_id=client_id,  # Unique Client-ID to recognize our program
                              clean_session=False,  # We want to be remembered
@@ -20,54 +39,277 @@ class TestRoboLabCommunication(unittest.TestCase):
                              )
 
         # Initialize your data structure here
-        self.communication = Communication(client, mock_logger)
+        self.communication = Communication(client, mock_logger, host=self.broker.host, port=self.broker.port, tls=False)
+        self.assertTrue(wait_connected(client))
+
+    def tearDown(self):
+        self.communication.client.disconnect()
+        self.communication.client.loop_stop()
+        self.broker.stop()
+
+    def ready(self):
+        self.communication.send_ready()
+        self.assertTrue(self.communication.wait_for("planet"))
+        return self.communication.drain_events()[0]
 
     def test_message_ready(self):
         """
         This test should check the syntax of the message type "ready"
         """
-        self.communication.send_ready()
+        planet = self.ready()
+
+        self.assertEqual(self.mothership.messages[0], ("explorer/022", {"from": "client", "type": "ready"}))
+        self.assertEqual(planet.planet_name, "Local")
+        self.assertEqual(planet.start, ((0, 0), Direction.NORTH))
 
     def test_message_path(self):
         """
         This test should check the syntax of the message type "path"
         """
-        # set example positions
-        self.communication.start_pos.x = 1
-        self.communication.start_pos.y = 1
-        self.communication.start_pos.direction = 0
-        self.communication.end_pos.x = 2
-        self.communication.end_pos.y = 2
-        self.communication.end_pos.direction = 90
-        self.communication.path_status = "free"
-        self.communication.send_path(start_pos = self.communication.start_pos, end_pos = self.communication.end_pos, path_status =self.communication.path_status)
+        self.ready()
+
+        # the server corrects the end of the path
+        self.communication.send_path(((0, 0), Direction.NORTH), ((0, 2), Direction.SOUTH), "free")
+        self.assertTrue(self.communication.wait_for("path"))
+
+        path, = self.communication.drain_events()
+        self.assertEqual(path.end, ((0, 1), Direction.SOUTH))
+        self.assertEqual(path.weight, 2)
+        self.assertEqual(self.mothership.errors, [])
 
+        # blocked paths end where they start
+        self.communication.send_path(((0, 0), Direction.EAST), ((1, 0), Direction.WEST), "free")
+        self.assertTrue(self.communication.wait_for("path"))
+
+        path, = self.communication.drain_events()
+        self.assertEqual((path.end, path.status, path.weight), (((0, 0), Direction.EAST), "blocked", -1))
 
     def test_message_path_invalid(self):
         """
         This test should check the syntax of the message type "path" with errors/invalid data
         """
-        self.communication.send_path(start_pos = self.communication.start_pos, end_pos = self.communication.end_pos, path_status =self.communication.path_status)
+        self.ready()
+
+        self.communication.send_message("planet/Local/022", self.communication.create_message("path",
+            self.communication.create_payload(startX=0, startY=0, startDirection=0)))
+        self.assertFalse(self.communication.wait_for("path", timeout=0.2))
 
+        self.assertEqual(len(self.mothership.errors), 1)
 
     def test_message_select(self):
         """
         This test should check the syntax of the message type "pathSelect"
         """
-        self.communication.start_pos.x = 1
-        self.communication.start_pos.y = 1
-        self.communication.start_pos.direction = 0
-        self.communication.send_pathSelect(start_pos = self.communication.start_pos)
+        self.ready()
+
+        # accepted selections are not answered
+        self.communication.send_pathSelect(((0, 0), Direction.NORTH))
+        self.assertFalse(self.communication.wait_for("pathSelect", timeout=0.2))
+
+        self.mothership.path_select_overrides[(0, 0)] = Direction.WEST
+        self.communication.send_pathSelect(((0, 0), Direction.NORTH))
+        self.assertTrue(self.communication.wait_for("pathSelect"))
 
+        path_select, = self.communication.drain_events()
+        self.assertEqual(path_select.start, ((0, 0), Direction.WEST))
 
     def test_message_complete(self):
         """
         This test should check the syntax of the message type "explorationCompleted" or "targetReached"
         """
         self.communication.send_targetReached()
+        self.assertTrue(self.communication.wait_for("done"))
         self.communication.send_explorationCompleted()
+        self.assertTrue(self.communication.wait_for("done"))
+
+        self.assertEqual([data["type"] for _, data in self.mothership.messages], ["targetReached", "explorationCompleted"])
+
+    def test_unveiled_and_target(self):
+        """
+        This test should check that unveiled paths and the target follow the path answer
+        """
+        self.mothership.unveil[(0, 1)] = [(((0, 1), Direction.NORTH), ((0, 2), Direction.SOUTH), 4)]
+        self.mothership.target = (0, 2)
+        self.ready()
+
+        self.communication.send_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), "free")
+        self.assertTrue(self.communication.wait_for("path"))
+        self.communication.wait_idle(0.1)
+
+        events = self.communication.drain_events()
+        self.assertEqual([event.type for event in events], ["path", "pathUnveiled", "target"])
+        self.assertEqual(events[1].paths(), [(((0, 1), Direction.NORTH), ((0, 2), Direction.SOUTH), 4)])
+        self.assertEqual(events[2].target, (0, 2))
+        self.assertEqual(len(self.communication.round_trips["path"]), 1)
+
+    def test_publish_pipeline(self):
+        """
+        This test should check that published messages are acknowledged with the QoS of their type
+        """
+        self.ready()
+        self.communication.send_pathSelect(((0, 0), Direction.NORTH))
+        self.communication.send_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), "free")
+        self.assertTrue(self.communication.wait_for("path"))
+
+        # ready and path with QoS 2, pathSelect with QoS 1
+        self.assertEqual(self.broker.qos_counts, [0, 1, 2])
+
+        # the server answers before the QoS 2 handshake of the path is complete
+        deadline = time.monotonic() + 1
+        while self.communication.in_flight and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+        stats = self.communication.publish_stats()
+        self.assertEqual((stats["in_flight"], stats["delivered"], stats["retransmits"]), (0, 3, 0))
+        self.assertGreater(stats["qos2_p50"], 0)
+
+
+class TestCommunicationWaits(unittest.TestCase):
+    def setUp(self):
+        """
+        Instantiates the communication class with a mocked client, no server needed
+        """
+        self.communication = Communication(unittest.mock.MagicMock(), unittest.mock.MagicMock())
+
+    def receive(self, msg_type, payload):
+        message = unittest.mock.Mock()
+        message.payload = json.dumps({"from": "server", "type": msg_type, "payload": payload}).encode('utf-8')
+        self.communication.on_message(None, None, message)
+
+    def test_message_on_connect(self):
+        """
+        This test should check that a message arriving as soon as the network loop starts is handled
+        """
+        client = unittest.mock.MagicMock()
+        message = unittest.mock.Mock()
+        message.payload = json.dumps({"from": "server", "type": "target", "payload": {"targetX": 1, "targetY": 2}}).encode()
+        client.loop_start.side_effect = lambda: client.on_message(client, None, message)
+
+        communication = Communication(client, unittest.mock.MagicMock())
+        self.assertEqual(communication.drain_events()[0].target, (1, 2))
+
+    def test_wait_for_timeout(self):
+        """
+        This test should check that wait_for returns False if the server did not answer
+        """
+        self.assertFalse(self.communication.wait_for("pathSelect", timeout=0.05))
+
+    def test_wait_for_answer(self):
+        """
+        This test should check that wait_for returns as soon as the answer arrived and records the latency
+        """
+        self.receive("planet", {"planetName": "Test", "startX": 0, "startY": 0, "startOrientation": 0})
+        self.communication.send_pathSelect(((0, 0), 90))
+
+        # the server only sends the direction, the node is the one we selected on
+        answer = threading.Timer(0.05, self.receive, ("pathSelect", {"startDirection": 180}))
+        answer.start()
+
+        start = time.monotonic()
+        self.assertTrue(self.communication.wait_for("pathSelect", timeout=2))
+        self.assertLess(time.monotonic() - start, 1)
+        answer.join()
+
+        planet, path_select = self.communication.drain_events()
+        self.assertEqual(path_select.start, ((0, 0), 180))
+        self.assertEqual(len(self.communication.round_trips["pathSelect"]), 1)
+
+        # the event is consumed by the wait
+        self.assertFalse(self.communication.wait_for("pathSelect", timeout=0))
+
+    def test_events_in_order(self):
+        """
+        This test should check that a burst of server messages is drained in order of arrival
+        """
+        path = {"startX": 0, "startY": 0, "startDirection": 0, "endX": 0, "endY": 1, "endDirection": 180,
+                "pathStatus": "free", "pathWeight": 1}
+        unveiled = {"startX": 0, "startY": 1, "startDirection": 90, "endX": 1, "endY": 1, "endDirection": 270,
+                    "pathStatus": "blocked", "pathWeight": -1}
+
+        self.receive("path", path)
+        self.receive("pathUnveiled", unveiled)
+        self.receive("pathUnveiled", unveiled)
+        self.receive("target", {"targetX": 1, "targetY": 1})
+
+        events = self.communication.drain_events()
+        self.assertEqual([event.type for event in events], ["path", "pathUnveiled", "target"])
+        self.assertEqual(events[0].end, ((0, 1), 180))
+        self.assertEqual([weight for _, _, weight in events[1].paths()], [-1, -1])
+        self.assertEqual(events[2].target, (1, 1))
+
+        self.assertEqual(self.communication.drain_events(), [])
+        self.assertEqual(self.communication.parse_stats["path"][0], 1)
+
+    def test_retransmit(self):
+        """
+        This test should check that unacknowledged QoS 1 messages are published again until MAX_RETRIES
+        and QoS 2 messages are left to paho
+        """
+        mids = iter(range(1, 10))
+        self.communication.client.publish.side_effect = lambda *args, **kwargs: unittest.mock.Mock(mid=next(mids))
+        self.communication.PUBLISH_TIMEOUT = 0.02
+
+        self.communication.send_path(((0, 0), 0), ((0, 1), 180), "free")
+        self.communication.send_pathSelect(((0, 1), 0))
+        self.assertFalse(self.communication.wait_for("path", timeout=0.2))
+
+        # the path once, the pathSelect again and again
+        qos = [call.kwargs["qos"] for call in self.communication.client.publish.call_args_list]
+        self.assertEqual(qos, [2] + [1] * (1 + Communication.MAX_RETRIES))
+        self.assertEqual(self.communication.retransmits, Communication.MAX_RETRIES)
+        self.assertEqual(list(self.communication.in_flight), [1])
+
+        # late acknowledgements of messages given up on are ignored and not kept
+        for mid in range(2, 5):
+            self.communication.on_publish(None, None, mid)
+        self.assertEqual(self.communication.delivered, 0)
+        self.assertEqual(self.communication.early_acks, set())
+
+        self.communication.on_publish(None, None, 1)
+        self.assertEqual(self.communication.delivered, 1)
+        self.assertEqual(self.communication.publish_stats()["in_flight"], 0)
+
+    def test_early_ack(self):
+        """
+        This test should check that an acknowledgement arriving before publish returned delivers the message
+        """
+        def publish(*args, **kwargs):
+            self.communication.on_publish(None, None, 7)
+            return unittest.mock.Mock(mid=7)
+
+        self.communication.client.publish.side_effect = publish
+        self.communication.send_pathSelect(((0, 0), 0))
+
+        self.assertEqual(self.communication.delivered, 1)
+        self.assertEqual((self.communication.in_flight, self.communication.early_acks), ({}, set()))
+
+    def test_ack_during_publish(self):
+        """
+        This test should check that an acknowledgement arriving right after publish counted down is not lost
+        """
+        communication = self.communication
+        lock = communication.publish_lock
+        releases = []
+
+        class AckAfterRelease:
+            """
+            The lock of the publish pipeline, the network thread acknowledges after its second release
+            """
+            def __enter__(self):
+                lock.acquire()
+
+            def __exit__(self, *args):
+                lock.release()
+                releases.append(1)
+                if len(releases) == 2:
+                    communication.on_publish(None, None, 7)
 
+        communication.publish_lock = AckAfterRelease()
+        communication.client.publish.side_effect = lambda *args, **kwargs: unittest.mock.Mock(mid=7)
+        communication.send_pathSelect(((0, 0), 0))
 
+        self.assertEqual(communication.delivered, 1)
+        self.assertEqual((communication.in_flight, communication.early_acks), ({}, set()))
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import queue
+import tempfile
+import unittest
+import unittest.mock
+
+import main
+from log_queue import BoundedQueueHandler, QueueLogging
+
+
+class TestLogQueue(unittest.TestCase):
+    def setUp(self):
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        logging.getLogger().setLevel(self.root_level)
+
+    def test_write(self):
+        """
+        This test should check that records end up in the log file once the logging is stopped
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, "project.log")
+
+            log = QueueLogging(log_file, console=False)
+            logging.getLogger('RoboLab.planet').info("path explored")
+            logging.getLogger('RoboLab').debug("round trips")
+            log.stop()
+
+            with open(log_file) as file:
+                lines = file.read().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(": path explored"))
+        self.assertTrue(lines[1].endswith(": round trips"))
+        self.assertNotIn(log.handler, logging.getLogger().handlers)
+
+    def test_overload(self):
+        """
+        This test should check that a full queue samples and drops records instead of blocking,
+        warnings are not sampled
+        """
+        handler = BoundedQueueHandler(queue.Queue(10), sample_rate=5)
+        logger = logging.getLogger('RoboLab.test_overload')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+
+        try:
+            for i in range(5):
+                logger.debug(f"sample {i}")
+            logger.warning("obstacle")
+            for i in range(100):
+                logger.debug(f"sample {i}")
+        finally:
+            logger.removeHandler(handler)
+
+        messages = []
+        while not handler.queue.empty():
+            messages.append(handler.queue.get_nowait().getMessage())
+
+        self.assertEqual(len(messages), 10)
+        self.assertIn("obstacle", messages)
+        self.assertGreater(handler.sampled, 0)
+        self.assertGreater(handler.dropped, 0)
+        self.assertEqual(handler.sampled + handler.dropped + len(messages), 106)
+
+    @unittest.mock.patch('main.RunRecorder')
+    @unittest.mock.patch('main.QueueLogging')
+    @unittest.mock.patch('main.Robot')
+    def test_stop_on_error(self, robot, queue_logging, recorder):
+        """
+        This test should check that the log is stopped and the run log closed when the calibration fails
+        """
+        robot.return_value.calibrate.side_effect = OSError("no color sensor")
+
+        with self.assertRaises(OSError):
+            main.run()
+
+        recorder.return_value.close.assert_called_once_with()
+        queue_logging.return_value.stop.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
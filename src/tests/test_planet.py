@@ -186,6 +186,69 @@ class TestRoboLabPlanet(unittest.TestCase):
 
         self.assertEqual(any_planet.shortest_path((1,3), (1,1)), correct_path)
 
+    def test_add_paths_batch(self):
+        """
+        This test should check that adding a batch of paths equals adding them one by one
+        """
+        paths = [(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 1),
+                 (((0, 1), Direction.EAST), ((1, 1), Direction.WEST), -1),
+                 (((1, 1), Direction.NORTH), ((1, 1), Direction.EAST), 2)]
+
+        single_planet = Planet()
+        for start, target, weight in paths:
+            single_planet.add_path(start, target, weight)
+
+        batch_planet = Planet()
+        batch_planet.add_paths(paths)
+
+        self.assertEqual(batch_planet.get_paths(), single_planet.get_paths())
+
+    def test_add_unveiled_paths(self):
+        """
+        This test should check that unveiled paths mark their nodes as unveiled and remove explored directions
+        """
+        any_planet = Planet()
+        any_planet.add_node_scan((0, 0), {Direction.NORTH: True, Direction.EAST: True, Direction.SOUTH: False,
+                                          Direction.WEST: False})
+        any_planet.add_explored_node((0, 0))
+
+        any_planet.add_unveiled_paths([(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 1),
+                                       (((0, 1), Direction.NORTH), ((0, 2), Direction.SOUTH), 1)])
+
+        self.assertEqual(any_planet.unveiled_nodes, [(0, 1), (0, 2)])
+        self.assertEqual(any_planet.unexplored_directions[(0, 0)], [Direction.EAST])
+        self.assertEqual(any_planet.shortest_path((0, 0), (0, 2)), [((0, 0), Direction.NORTH), ((0, 1), Direction.NORTH)])
+
+    def test_unknown_directions(self):
+        """
+        This test should check that only directions without a known path are left to scan
+        """
+        self.assertEqual(self.planet.unknown_directions((0, 1)), [Direction.EAST])
+        self.assertEqual(self.planet.unknown_directions((2, 2)), [Direction.EAST])
+        self.assertEqual(self.planet.unknown_directions((5, 5)), list(Direction))
+
+    def test_smartest_route(self):
+        """
+        This test should check that the whole route to the target is planned and smartest_direction takes its first path
+        """
+        self.planet.target = (2, 2)
+        route = self.planet.smartest_route((0, 0))
+
+        self.assertEqual(route, [((0, 0), Direction.WEST), ((0, 1), Direction.NORTH), ((0, 2), Direction.NORTH),
+                                 ((0, 3), Direction.EAST)])
+        self.assertEqual(self.planet.smartest_direction((0, 0)), Direction.WEST)
+        self.assertEqual(self.planet.smartest_route((2, 2)), [])
+
+    def test_ports(self):
+        """
+        This test should check that known paths and scanned directions are lines at a node
+        """
+        self.planet.add_node_scan((0, 1), {Direction.NORTH: True, Direction.EAST: True, Direction.SOUTH: True,
+                                           Direction.WEST: True})
+        self.assertEqual(self.planet.ports((0, 1)), list(Direction))
+        self.assertEqual(self.planet.ports((1, 0)), [Direction.NORTH, Direction.WEST])
+        self.assertEqual(self.planet.ports((5, 5)), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from exploration_replay import replay_exploration
+from planet import Direction
+from planet_generator import generate_planet
+
+
+class TestPlanetGenerator(unittest.TestCase):
+    def test_seed(self):
+        """
+        This test should check that the same seed gives the same planet and another seed another one
+        """
+        first, start = generate_planet(6, 5, seed=7)
+        second, _ = generate_planet(6, 5, seed=7)
+        third, _ = generate_planet(6, 5, seed=8)
+
+        self.assertEqual(start, ((0, 0), Direction.NORTH))
+        self.assertEqual(first.get_paths(), second.get_paths())
+        self.assertNotEqual(first.get_paths(), third.get_paths())
+
+    def test_connected(self):
+        """
+        This test should check that every node can be reached from the start without blocked paths
+        """
+        planet, (start, _) = generate_planet(8, 8, seed=1, blocked=0.5)
+
+        self.assertEqual(len(planet.get_paths()), 64)
+        costs, _ = planet.dijkstra(start)
+        self.assertTrue(all(cost < float('inf') for cost in costs.values()))
+
+    def test_features(self):
+        """
+        This test should check that loops, blocked paths, self-loops and parallel edges are generated
+        and the start line keeps its port
+        """
+        planet, (start, direction) = generate_planet(10, 10, seed=3, loop_density=0.5, blocked=0.3,
+                                                     self_loops=0.2, parallel_edges=0.2)
+        paths = planet.get_paths()
+
+        self.assertNotIn(Direction.SOUTH, paths[start])
+
+        ends = [(coords, end_coords, weight) for coords, directions in paths.items()
+                for end_coords, _, weight in directions.values()]
+        self.assertIn(-1, [weight for _, _, weight in ends])
+        self.assertTrue(any(coords == end_coords for coords, end_coords, _ in ends))
+
+        neighbours = [(coords, end_coords) for coords, end_coords, _ in ends if coords != end_coords]
+        self.assertGreater(len(neighbours), len(set(neighbours)))
+
+    def test_replay(self):
+        """
+        This test should check that a replayed exploration visits every node of a generated planet
+        """
+        planet, start = generate_planet(5, 5, seed=2)
+
+        result = replay_exploration(planet, start)
+
+        self.assertTrue(result.completed)
+        self.assertEqual(sorted(result.visited), sorted(planet.get_paths().keys()))
+        self.assertGreater(result.path_cost, 0)
+        self.assertEqual(len(result.decision_times), result.decisions + 1)
+
+    def test_replay_target(self):
+        """
+        This test should check that the replay stops on the target
+        """
+        planet, start = generate_planet(5, 5, seed=2)
+
+        result = replay_exploration(planet, start, target=(4, 4))
+
+        self.assertTrue(result.reached_target)
+        self.assertEqual(result.visited[-1], (4, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import math
+import unittest
+import unittest.mock
+
+from odometry import Node, Odometry
+from planet import Direction
+from pose_estimator import GRID_SIZE, PoseEstimator
+
+
+class TestPoseEstimator(unittest.TestCase):
+    def setUp(self):
+        """
+        Places the estimator on node (0, 0) facing north, wheels of 360 counts and 10 cm circumference
+        """
+        self.estimator = PoseEstimator(10 / math.pi, 10, 360, 360)
+        self.estimator.observe_node((0, 0))
+        self.estimator.observe_heading(0)
+
+    def drive(self, distance: float, steps: int = 100, turn: float = 0):
+        """
+        Feeds tacho samples of driving distance cm, turn cm more on the left wheel in total
+        """
+        self.estimator.predict(0, 0)
+        for i in range(1, steps + 1):
+            left = (distance + turn / 2) * i / steps * 36
+            right = (distance - turn / 2) * i / steps * 36
+            self.estimator.predict(round(left), round(right))
+
+    def test_predict(self):
+        """
+        This test should check that driving north moves the pose and grows mostly the uncertainty across the path
+        """
+        position_std = self.estimator.position_std()
+        self.drive(GRID_SIZE)
+
+        self.assertAlmostEqual(self.estimator.x, 0, places=3)
+        self.assertAlmostEqual(self.estimator.y, GRID_SIZE, places=3)
+        self.assertGreater(self.estimator.position_std(), position_std)
+
+        xx, _, _, yy, _, _ = self.estimator.p
+        self.assertGreater(xx, yy)
+
+    def test_turn(self):
+        """
+        This test should check that more distance on the left wheel turns clockwise like the odometry
+        """
+        self.drive(0, turn=10 * math.pi / 2)
+        self.assertAlmostEqual(math.degrees(self.estimator.theta), 90, delta=1)
+
+    def test_observe(self):
+        """
+        This test should check that node and heading observations shrink the uncertainty and correct the pose
+        """
+        self.drive(GRID_SIZE)
+        self.estimator.x += 5
+        position_std, heading_std = self.estimator.position_std(), self.estimator.heading_std()
+
+        self.estimator.observe_node((0, 1))
+        self.assertLess(abs(self.estimator.x), 5)
+        self.assertLess(self.estimator.position_std(), position_std)
+
+        self.estimator.observe_heading(math.radians(-1))
+        self.assertLess(self.estimator.heading_std(), heading_std)
+        self.assertLess(self.estimator.theta, 0)
+
+    def test_turned(self):
+        """
+        This test should check that after an unsampled turn the observed heading replaces the old one
+        """
+        self.estimator.turned()
+        self.estimator.observe_heading(math.radians(270))
+        self.assertAlmostEqual(math.degrees(self.estimator.theta) % 360, 270, places=3)
+
+    def test_nearest_node(self):
+        """
+        This test should check that the node colour and the uncertainty along the path pick the node
+        """
+        self.drive(GRID_SIZE * 0.6)
+        self.assertEqual(self.estimator.nearest_node(), (0, 1))
+        self.assertEqual(self.estimator.nearest_node(0), (0, 0))
+        self.assertEqual(self.estimator.nearest_node(1), (0, 1))
+
+    def test_odometry(self):
+        """
+        This test should check that the odometry feeds the estimator at the node, not with every sample
+        """
+        odometry = Odometry(10 / math.pi, 10, 360, 360)
+        odometry.set_first_node((0, 0), Node.RED)
+        odometry.set_position(((0, 0), Direction.NORTH))
+
+        motor = unittest.mock.Mock()
+        for i in range(101):
+            motor.position = -round(i * GRID_SIZE * 36 / 100)
+            odometry.add_motor_data(motor, motor)
+        self.assertIsNone(odometry.estimator.last_sample)
+
+        odometry.calculate(Node.BLUE)
+        self.assertEqual(odometry.position, ((0, 1), Direction.NORTH))
+        self.assertAlmostEqual(odometry.estimator.y, GRID_SIZE, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+from process_start import seconds_since_start
+
+
+class TestProcessStart(unittest.TestCase):
+    @unittest.skipUnless(sys.platform.startswith('linux'), "process start time is read from /proc")
+    def test_seconds_since_start(self):
+        """
+        This test should check the age of the running process
+        """
+        self.assertGreater(seconds_since_start(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import tempfile
+import unittest.mock
+import uuid
+
+import paho.mqtt.client as mqtt
+
+import main
+from communication import Communication
+from planet import Direction, Planet
+from robot import Robot
+from run_log import MAGIC, Record, RunRecorder, read_records
+from run_replay import RunReplay
+from simulator import Simulator
+from tests.fake_mothership import FakeBroker, FakeMothership, wait_connected
+
+
+class TestRunLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "run.rlog")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records(self):
+        """
+        This test should check that records are read back in order with their timestamps,
+        a truncated last record is ignored
+        """
+        clock = iter([1.0, 2.0, 3.0])
+        recorder = RunRecorder(self.path, clock=lambda: next(clock))
+        recorder.record(Record.TACHO, -12, 30)
+        recorder.record_bytes(Record.MESSAGE_OUT, b'{"type":"ready"}')
+        recorder.record(Record.DECISION, 1, -2, 90, True)
+        recorder.close()
+
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        self.assertTrue(data.startswith(MAGIC))
+
+        with open(self.path, 'wb') as file:
+            file.write(data[:-1])
+
+        with open(self.path, 'rb') as file:
+            records = list(read_records(file))
+
+        self.assertEqual(records, [(1.0, Record.TACHO, (-12, 30)),
+                                   (2.0, Record.MESSAGE_OUT, b'{"type":"ready"}')])
+
+    def test_replay(self):
+        """
+        This test should check that a recorded exploration in the simulator replays to the same planet and positions
+        """
+        planet = Planet()
+        planet.add_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 1)
+        planet.add_path(((0, 1), Direction.EAST), ((1, 1), Direction.WEST), 2)
+        planet.add_path(((0, 0), Direction.EAST), ((1, 0), Direction.WEST), 1)
+        planet.add_path(((1, 0), Direction.NORTH), ((1, 1), Direction.SOUTH), 1)
+        planet.add_path(((1, 1), Direction.NORTH), ((1, 2), Direction.SOUTH), -1)
+        start = ((0, 0), Direction.NORTH)
+
+        simulator = Simulator(planet, start, max_time=600)
+        recorder = RunRecorder(self.path, clock=simulator.time)
+        robot = Robot(simulator, recorder)
+
+        broker = FakeBroker()
+        mothership = FakeMothership(broker, planet, start)
+        mothership.unveil = {(1, 0): [(((0, 1), Direction.EAST), ((1, 1), Direction.WEST), 2)]}
+
+        client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        com = Communication(client, unittest.mock.MagicMock(), host=broker.host, port=broker.port, tls=False,
+                            recorder=recorder)
+        self.assertTrue(wait_connected(client))
+        com.TIMEOUT = 1
+
+        explored = Planet()
+        try:
+            self.assertTrue(main.explore(robot, explored, com, logging.getLogger('RoboLab')))
+        finally:
+            client.disconnect()
+            client.loop_stop()
+            broker.stop()
+            recorder.close()
+
+        replay = RunReplay().replay(self.path)
+
+        self.assertEqual(replay.planet.get_paths(), explored.get_paths())
+        self.assertEqual(sorted(replay.planet.explored_nodes), sorted(explored.explored_nodes))
+        self.assertEqual(replay.mismatches, [])
+        self.assertGreaterEqual(len(replay.positions), 4)
+        self.assertTrue(all(coords in explored.explored_nodes for _, (coords, _) in replay.positions))
+        self.assertGreater(len(replay.colors), 100)
+
+        timestamps = [timestamp for timestamp, _, _ in read_records(open(self.path, 'rb'))]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_replay_route(self):
+        """
+        This test should check that a decision on a planned route is replayed from the route,
+        not planned again with paths the robot learned after selecting it
+        """
+        replay = RunReplay()
+        planet = replay.planet
+        planet.add_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 1)
+        planet.add_path(((0, 1), Direction.EAST), ((1, 1), Direction.WEST), 1)
+        planet.add_path(((1, 1), Direction.EAST), ((2, 1), Direction.WEST), 3)
+        planet.target = (2, 1)
+
+        replay.apply(1.0, Record.DECISION, (0, 0, Direction.NORTH, False))
+        replay.apply(2.0, Record.DECISION, (0, 1, Direction.EAST, True))
+        # a shortcut unveiled after the path at (1, 1) was selected
+        planet.add_path(((0, 1), Direction.NORTH), ((2, 1), Direction.NORTH), 1)
+        replay.apply(3.0, Record.DECISION, (1, 1, Direction.EAST, True))
+        self.assertEqual(replay.mismatches, [])
+
+        # the route ends at the target, planned again from there
+        replay.apply(4.0, Record.DECISION, (2, 1, -1, False))
+        replay.apply(5.0, Record.DECISION, (2, 1, Direction.SOUTH, True))
+        self.assertEqual(replay.mismatches, [(5.0, (2, 1), Direction.SOUTH, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
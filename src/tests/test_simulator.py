@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+import logging
+import math
+import time
+import unittest.mock
+import uuid
+
+import paho.mqtt.client as mqtt
+
+import main
+from communication import Communication
+from odometry import Node
+from planet import Direction, Planet
+from planet_generator import generate_planet
+from robot import Robot, heading_drift, plan_scan
+from simulator import Simulator, SimulationTimeout
+from tests.fake_mothership import FakeBroker, FakeMothership, wait_connected
+
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        """
+        Instantiates the simulated robot on a planet
+        NORTH
+                 +-X-1,2
+           +--+     |
+           |  |     X (blocked)
+           +-0,1---1,1
+              |     |
+        +----0,0---1,0
+        | (start)
+        SOUTH
+        """
+        self.planet = Planet()
+        self.planet.add_path(((0, 0), Direction.NORTH), ((0, 1), Direction.SOUTH), 1)
+        self.planet.add_path(((0, 1), Direction.EAST), ((1, 1), Direction.WEST), 2)
+        self.planet.add_path(((0, 0), Direction.EAST), ((1, 0), Direction.WEST), 1)
+        self.planet.add_path(((1, 0), Direction.NORTH), ((1, 1), Direction.SOUTH), 1)
+        self.planet.add_path(((1, 1), Direction.NORTH), ((1, 2), Direction.SOUTH), -1)
+        self.planet.add_path(((0, 1), Direction.WEST), ((0, 1), Direction.NORTH), 3)
+
+        self.start = ((0, 0), Direction.NORTH)
+        self.simulator = Simulator(self.planet, self.start, max_time=600)
+        self.robot = Robot(self.simulator)
+
+    def test_drive_straight(self):
+        """
+        This test should check the kinematics of driving forward with negative motor speeds
+        """
+        x, y = self.simulator.x, self.simulator.y
+
+        self.robot.left_motor.run_forever(speed_sp=-200)
+        self.robot.right_motor.run_forever(speed_sp=-200)
+        self.simulator.sleep(1)
+
+        self.assertAlmostEqual(self.simulator.x, x)
+        self.assertAlmostEqual(self.simulator.y - y, 200 * 0.04887, places=3)
+        self.assertAlmostEqual(self.simulator.time(), 1)
+
+    def test_first_node(self):
+        """
+        This test should check that the robot follows the start line to the start node and sees all its paths
+        """
+        node = self.robot.follow_line(False)
+        self.assertEqual(node, Node.RED)
+
+        self.robot.set_position(self.start)
+        self.robot.set_first_node((0, 0), node)
+
+        directions = self.robot.scan_directions()
+        self.assertEqual(directions, {Direction.NORTH: True, Direction.EAST: True, Direction.SOUTH: True,
+                                      Direction.WEST: False})
+
+    def test_continuous_scan(self):
+        """
+        This test should check that one smooth rotation finds the same paths as the scan with stops
+        and reports where the lines were crossed
+        """
+        self.robot.follow_line(False)
+        self.robot.set_position(self.start)
+        self.robot.set_first_node((0, 0), Node.RED)
+        self.robot.CONTINUOUS_SCAN = True
+
+        directions = self.robot.scan_directions()
+        self.assertEqual(directions, {Direction.NORTH: True, Direction.EAST: True, Direction.SOUTH: True,
+                                      Direction.WEST: False})
+
+        crossings = {crossing.direction: crossing for crossing in self.robot.line_crossings}
+        self.assertEqual(set(crossings), {Direction.NORTH, Direction.EAST, Direction.SOUTH})
+        for direction, crossing in crossings.items():
+            self.assertLess(abs((crossing.angle - int(direction) + 180) % 360 - 180), 15)
+            self.assertGreater(crossing.confidence, 0.6)
+        self.assertLess(abs(heading_drift(self.robot.line_crossings)), 15)
+
+    def test_partial_scan(self):
+        """
+        This test should check that only the requested directions are scanned with less rotation
+        and that the robot ends up facing the direction the odometry reports
+        """
+        self.robot.follow_line(False)
+        self.robot.set_position(self.start)
+        self.robot.set_first_node((0, 0), Node.RED)
+
+        tacho = self.robot.left_motor.position
+        directions = self.robot.scan_directions([Direction.WEST])
+        self.assertEqual(directions, {Direction.WEST: False})
+
+        _, direction = self.robot.get_position()
+        heading = math.degrees(self.simulator.heading) % 360
+        self.assertLess(abs((heading - int(direction) + 180) % 360 - 180), 15)
+        # a quarter of the full scan (450 degrees)
+        self.assertLess(abs(self.robot.left_motor.position - tacho), 200 * self.robot.TACHO_PER_DEGREE)
+
+    def test_plan_scan(self):
+        """
+        This test should check the rotations of full and partial scans
+        """
+        self.assertEqual(plan_scan([0, 90, 180, 270]), (-45, 90, 4, 360))
+        self.assertEqual(plan_scan([0]), (-45, 90, 1, 0))
+        self.assertEqual(plan_scan([270]), (-45, -90, 1, -90))
+        self.assertEqual(plan_scan([90, 270]), (45, 90, 3, 360))
+
+    def test_explore_path(self):
+        """
+        This test should check that the odometry finds the end of a path
+        """
+        self.robot.follow_line(False)
+        self.robot.set_position(self.start)
+        self.robot.set_first_node((0, 0), Node.RED)
+
+        self.assertEqual(self.robot.explore_path(Direction.EAST), Node.BLUE)
+        self.assertEqual(self.robot.get_position(), ((1, 0), Direction.EAST))
+
+    def test_plan_turn(self):
+        """
+        This test should check that turns take the short way and end on the side of the line align_line expects
+        """
+        self.robot.set_position(self.start)
+
+        self.assertAlmostEqual(self.robot.plan_turn(Direction.WEST), 90 * 0.85)
+        self.assertAlmostEqual(self.robot.plan_turn(Direction.SOUTH), 180 * 0.85)
+        self.assertEqual(self.robot.plan_turn(Direction.EAST), -90 - self.robot.TURN_OVERSHOOT)
+        self.assertEqual(self.robot.plan_turn(Direction.EAST, [Direction.NORTH, Direction.EAST]),
+                         -90 - 2 * self.robot.TURN_OVERSHOOT)
+
+    def test_known_path_faster(self):
+        """
+        This test should check that a known path is driven faster and its node is still found
+        """
+        times = []
+        for expected_length in (None, 50):
+            simulator = Simulator(self.planet, self.start)
+            robot = Robot(simulator)
+            robot.follow_line(False)
+            robot.set_position(self.start)
+            robot.set_first_node((0, 0), Node.RED)
+
+            start_time = simulator.time()
+            self.assertEqual(robot.explore_path(Direction.EAST, expected_length=expected_length), Node.BLUE)
+            self.assertEqual(robot.get_position(), ((1, 0), Direction.EAST))
+            self.assertGreater(robot.last_path_length, 30)
+            times.append(simulator.time() - start_time)
+
+        self.assertLess(times[1], times[0])
+
+    def test_cruise_speed(self):
+        """
+        This test should check the speed profile on unknown and known paths
+        """
+        self.assertEqual(self.robot.cruise_speed(25), self.robot.SPEED)
+        self.assertEqual(self.robot.cruise_speed(0, 100), self.robot.SPEED)
+        self.assertEqual(self.robot.cruise_speed(50, 100), self.robot.FAST_SPEED)
+        self.assertEqual(self.robot.cruise_speed(90, 100), self.robot.SPEED)
+        self.assertEqual(self.robot.cruise_speed(120, 100), self.robot.SPEED)
+
+    def test_timeout(self):
+        """
+        This test should check that a robot without a line does not run forever
+        """
+        self.simulator.max_time = 5
+        self.simulator.x = 1000
+
+        with self.assertRaises(SimulationTimeout):
+            self.robot.follow_line(False)
+
+    def test_exploration(self):
+        """
+        This test should check a whole exploration of main against the simulator and the local mothership
+        """
+        broker = FakeBroker()
+        mothership = FakeMothership(broker, self.planet, self.start)
+        mothership.echo_path_select = True
+
+        client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        com = Communication(client, unittest.mock.MagicMock(), host=broker.host, port=broker.port, tls=False)
+        self.assertTrue(wait_connected(client))
+        com.TIMEOUT = 1
+
+        planet = Planet()
+        start_time = time.monotonic()
+        try:
+            self.assertTrue(main.explore(self.robot, planet, com, logging.getLogger('RoboLab')))
+        finally:
+            client.disconnect()
+            client.loop_stop()
+            broker.stop()
+
+        self.assertEqual(sorted(planet.explored_nodes), [(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertEqual(planet.get_paths()[(1, 1)][Direction.NORTH], ((1, 1), Direction.NORTH, -1))
+        self.assertEqual(mothership.errors, [])
+
+        # a minute on the planet takes a few seconds at most
+        self.assertGreater(self.simulator.time(), 60)
+        self.assertLess(time.monotonic() - start_time, 15)
+
+    def test_route(self):
+        """
+        This test should check that known routes are driven without the stop at the nodes in between
+        and the server still gets every path and selection
+        """
+        truth, start = generate_planet(4, 4, seed=2)
+        simulator = Simulator(truth, start)
+        robot = Robot(simulator)
+        robot.com_end_signal = unittest.mock.MagicMock()
+
+        broker = FakeBroker()
+        mothership = FakeMothership(broker, truth, start)
+        mothership.echo_path_select = True
+
+        client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        com = Communication(client, unittest.mock.MagicMock(), host=broker.host, port=broker.port, tls=False)
+        self.assertTrue(wait_connected(client))
+        com.TIMEOUT = 1
+
+        planet = Planet()
+        try:
+            self.assertTrue(main.explore(robot, planet, com, logging.getLogger('RoboLab')))
+        finally:
+            client.disconnect()
+            client.loop_stop()
+            broker.stop()
+
+        self.assertEqual(len(planet.explored_nodes), 16)
+        self.assertEqual(mothership.errors, [])
+        self.assertLess(robot.com_end_signal.call_count, mothership.paths_sent)
+
+    def test_target_during_route(self):
+        """
+        This test should check that a target arriving while driving a known route ends the route at the next node
+        """
+        truth, start = generate_planet(4, 4, seed=2)
+        simulator = Simulator(truth, start)
+        robot = Robot(simulator)
+        robot.com_end_signal = unittest.mock.MagicMock()
+
+        # the 20th path ends on (0, 2) of the route (0, 1) -> (0, 2) -> (1, 2) -> (1, 3) -> (2, 3)
+        broker = FakeBroker()
+        mothership = FakeMothership(broker, truth, start)
+        mothership.target = (0, 1)
+        mothership.target_after = 20
+        # after the answer, while the robot waits for a pathSelect that does not come
+        mothership.target_delay = 0.05
+
+        client = mqtt.Client(client_id='022-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        com = Communication(client, unittest.mock.MagicMock(), host=broker.host, port=broker.port, tls=False)
+        self.assertTrue(wait_connected(client))
+        com.TIMEOUT = 0.2
+
+        planet = Planet()
+        try:
+            self.assertTrue(main.explore(robot, planet, com, logging.getLogger('RoboLab')))
+        finally:
+            client.disconnect()
+            client.loop_stop()
+            broker.stop()
+
+        # (0, 2) -> (1, 2) was already selected, from there the robot heads back west instead of north
+        selections = [(data["payload"]["startX"], data["payload"]["startY"], data["payload"]["startDirection"])
+                      for _, data in mothership.messages if data["type"] == "pathSelect"]
+        self.assertEqual(selections[-3:], [(0, 2, Direction.EAST), (1, 2, Direction.WEST), (0, 2, Direction.SOUTH)])
+        self.assertEqual(mothership.messages[-1][1]["type"], "targetReached")
+        self.assertEqual(mothership.errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+from startup_profile import profile, report
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_profile(self):
+        """
+        This test should check that the import times of a module and its imports are collected
+        """
+        imports = profile(['planet'])
+        names = [name.strip() for _, _, name in imports]
+
+        self.assertIn('planet', names)
+        self.assertTrue(all(cumulative >= self_time >= 0 for self_time, cumulative, _ in imports))
+
+        text = report(['planet'], imports)
+        self.assertTrue(text.startswith(f"python {sys.version.split()[0]}, import planet: "))
+        self.assertIn('| planet', text)
+
+    def test_main_without_ev3dev(self):
+        """
+        This test should check that importing main does not load ev3dev, it is only needed once the robot starts
+        """
+        names = [name.strip() for _, _, name in profile(['main'])]
+        self.assertIn('communication', names)
+        self.assertNotIn('ev3dev.ev3', names)
+        self.assertNotIn('xmlrpc.client', names)
+        self.assertNotIn('dataclasses', names)
+        self.assertNotIn('subprocess', names)
+        self.assertNotIn('startup_profile', names)
+
+
+if __name__ == "__main__":
+    unittest.main()
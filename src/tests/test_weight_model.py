@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import math
+import os
+import tempfile
+import unittest
+
+import codec
+from run_log import Record, RunRecorder
+from weight_model import WeightModel, evaluate, paths_from_run_log
+
+
+class TestWeightModel(unittest.TestCase):
+    def test_fit(self):
+        """
+        This test should check that the weight follows the length once there are paths to learn from
+        and blocked paths are ignored
+        """
+        model = WeightModel()
+        self.assertEqual(model.predict(), 0)
+
+        model.record(50, 3)
+        self.assertEqual(model.predict(120), 3)
+
+        model.record(100, 5)
+        model.record(80, -1)
+        model.record(150, 7)
+        self.assertEqual(model.count, 3)
+        self.assertAlmostEqual(model.predict(200), 9)
+        self.assertAlmostEqual(model.predict(), 5)
+
+    def test_evaluate(self):
+        """
+        This test should check that a weight proportional to the length is predicted better than by the mean weight
+        """
+        paths = [(length, round(length / 25)) for length in [50, 100, 50, 150, 200, 75, 125, 50, 250]]
+        result = evaluate(paths)
+
+        self.assertEqual(result["predicted"], len(paths) - WeightModel.MIN_SAMPLES)
+        self.assertLess(result["mae"], 1)
+        self.assertLess(result["mae"], result["baseline_mae"])
+
+    def test_run_log(self):
+        """
+        This test should check that the length of every path is read from the tacho samples of a run log
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.rlog")
+            recorder = RunRecorder(path, clock=lambda: 0.0)
+            recorder.record(Record.ODOMETRY_CONFIG, 360 / math.pi, 11.6, 360, 360)
+
+            for (start, end), weight in [((0, 100), 4), ((100, 150), 2)]:
+                for tacho in range(start, end + 1, 10):
+                    recorder.record(Record.TACHO, tacho, tacho)
+                # axis correction at the node
+                recorder.record(Record.TACHO, end - 5, end - 5)
+                message = {"from": "server", "type": "path",
+                           "payload": {"startX": 0, "startY": 0, "startDirection": 0, "endX": 0, "endY": 1,
+                                       "endDirection": 180, "pathStatus": "free", "pathWeight": weight}}
+                recorder.record_bytes(Record.MESSAGE_IN, codec.encode(message).encode())
+            recorder.close()
+
+            self.assertEqual(paths_from_run_log(path), [(100, 4), (50, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
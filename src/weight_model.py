@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Learns the server weight of a path from its length measured by the odometry and predicts the weight
+of paths nobody drove yet
+
+Offline only: the planner does not use it until recorded runs show the length predicts the weight better
+than the mean weight does. Run from src to evaluate: python -m weight_model logs/*.rlog
+"""
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import math
+import sys
+from typing import Dict, List, Tuple
+
+import codec
+from messages import PathMessage
+from run_log import Record, read_records
+
+
+class WeightModel:
+    """
+    Least squares line from path length to weight, updated in O(1) per driven path
+    """
+
+    # paths needed before the length is taken into account
+    MIN_SAMPLES = 2
+
+    def __init__(self):
+        self.count = 0
+        self.sum_length = 0.0
+        self.sum_weight = 0.0
+        self.sum_length_squared = 0.0
+        self.sum_length_weight = 0.0
+
+    def record(self, length: float, weight: int):
+        """
+        Learns from a driven path, blocked paths (weight -1) tell nothing about the length
+        :param length: float, cm driven by the odometry
+        :param weight: int, weight of the server
+        """
+        if weight < 0 or length <= 0:
+            return
+
+        self.count += 1
+        self.sum_length += length
+        self.sum_weight += weight
+        self.sum_length_squared += length * length
+        self.sum_length_weight += length * weight
+
+    def fit(self) -> Tuple[float, float]:
+        """
+        :return: Tuple, weight per cm and weight at length 0, the mean weight while there is no trend to fit
+        """
+        if self.count == 0:
+            return 0.0, 0.0
+
+        variance = self.count * self.sum_length_squared - self.sum_length ** 2
+        if self.count < self.MIN_SAMPLES or variance <= 1e-9 * self.sum_length_squared:
+            return 0.0, self.sum_weight / self.count
+
+        slope = (self.count * self.sum_length_weight - self.sum_length * self.sum_weight) / variance
+        return slope, (self.sum_weight - slope * self.sum_length) / self.count
+
+    def predict(self, length: float = None) -> float:
+        """
+        Expected weight of a path, 0 before any path was driven
+        :param length: float, cm, a path of average length if None (e.g. an unexplored direction)
+        """
+        if self.count == 0:
+            return 0.0
+        if length is None:
+            length = self.sum_length / self.count
+
+        slope, intercept = self.fit()
+        return max(0.0, slope * length + intercept)
+
+
+def paths_from_run_log(path: str) -> List[Tuple[float, int]]:
+    """
+    Length and weight of every driven path of a run log, the length is the farthest the robot got from the
+    last node (the axis correction at the node drives back a little)
+    :param path: String, run log
+    :return: List, cm and weight per path in driving order
+    """
+    paths = []
+    cm_per_count = None
+    first = None
+    length = 0.0
+
+    with open(path, 'rb') as file:
+        for _, record, values in read_records(file):
+            if record == Record.ODOMETRY_CONFIG:
+                wheel_diameter, _, _, _ = values
+                # delta_motor_pos * deg * cm/deg as in Odometry.calculate
+                cm_per_count = wheel_diameter * math.pi / 360
+            elif record == Record.TACHO and cm_per_count is not None:
+                if first is None:
+                    first = values
+                driven = ((values[0] - first[0]) + (values[1] - first[1])) / 2 * cm_per_count
+                length = max(length, driven)
+            elif record == Record.MESSAGE_IN:
+                data = codec.decode(values)
+                if data.get("from") != "server" or data.get("type") != "path":
+                    continue
+                paths.append((length, PathMessage(data["payload"]).weight))
+                first = None
+                length = 0.0
+
+    return paths
+
+
+def evaluate(paths: List[Tuple[float, int]]) -> Dict[str, float]:
+    """
+    Predicts every path from the paths driven before it, like during a run
+    :param paths: List, see paths_from_run_log
+    :return: Dict, mean absolute and root mean square error, and the mean absolute error of
+             predicting the mean weight so far (what the model falls back to without a length)
+    """
+    model = WeightModel()
+    errors = []
+    baseline_errors = []
+
+    for length, weight in paths:
+        if weight >= 0 and model.count >= WeightModel.MIN_SAMPLES:
+            errors.append(model.predict(length) - weight)
+            baseline_errors.append(model.predict() - weight)
+        model.record(length, weight)
+
+    if not errors:
+        return {"paths": len(paths), "predicted": 0}
+
+    slope, intercept = model.fit()
+    return {
+        "paths": len(paths),
+        "predicted": len(errors),
+        "mae": sum(abs(error) for error in errors) / len(errors),
+        "rmse": math.sqrt(sum(error * error for error in errors) / len(errors)),
+        "baseline_mae": sum(abs(error) for error in baseline_errors) / len(baseline_errors),
+        "weight_per_cm": slope,
+        "intercept": intercept,
+    }
+
+
+if __name__ == '__main__':
+    every_path = []
+    for run_log in sys.argv[1:]:
+        paths = paths_from_run_log(run_log)
+        every_path += paths
+        print(f"{run_log}: {evaluate(paths)}")
+
+    print(f"all runs: {evaluate(every_path)}")